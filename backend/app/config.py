@@ -1,6 +1,11 @@
 """Application configuration from environment variables."""
+import os
 from pydantic_settings import BaseSettings
-from typing import Literal
+from typing import List, Literal, Optional
+
+# Local state files (snapshots, metrics) live next to the app, not in
+# whatever directory the server happens to be started from
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
 
 
 class Settings(BaseSettings):
@@ -8,7 +13,9 @@ class Settings(BaseSettings):
     
     # Gemini API
     google_api_key: str
+    google_api_keys: str = ""  # extra comma-separated keys, optionally `key@model`, pooled with google_api_key
     gemini_model: str = "gemini-2.5-flash"
+    gemini_base_url: str = "https://generativelanguage.googleapis.com"
     
     # Server
     host: str = "0.0.0.0"
@@ -20,13 +27,93 @@ class Settings(BaseSettings):
     
     # API Configuration
     max_retries: int = 3
-    request_timeout: int = 30
-    rate_limit_per_minute: int = 15
+    retry_base_delay: float = 1.0  # full-jitter backoff: uniform(0, min(max, base * 2**n))
+    retry_max_delay: float = 20.0
+    retry_max_hint_seconds: float = 30.0  # fail fast instead of honouring longer Retry-After hints
+    retry_budget_ratio: float = 0.2  # retries allowed as a fraction of first attempts
+    retry_budget_window_seconds: float = 10.0
+    retry_budget_min_retries: int = 5  # per window, so low traffic can still retry
+    request_timeout: int = 30  # seconds to connect and to wait for a free pooled connection
+    gemini_read_timeout_seconds: float = 180.0  # longest wait for response bytes (between stream chunks)
+    rate_limit_per_minute: int = 0  # per API key; opt-in, 0 lets every call through
+    key_rate_limited_cooldown_seconds: float = 60.0  # key ejection after 429 without a retry hint
+    key_forbidden_cooldown_seconds: float = 600.0  # key ejection after 401/403
+    disconnect_poll_interval: float = 0.5  # seconds between client disconnect checks
+    review_debounce_seconds: float = 0.75  # wait before a review that supersedes another; isolated reviews start at once
+    review_cache_size: int = 1024
+    review_cache_ttl_seconds: int = 3600
+    max_review_sessions: int = 2048
+    review_session_ttl_seconds: int = 7200
+    incremental_review_max_diff_ratio: float = 0.6  # fall back to a full review above this diff/code size
+    max_project_solutions: int = 2048
+    project_solution_ttl_seconds: int = 86400
+    prefetch_task_hints: bool = True  # generate each task's hint in the background after /init and /plan
+    hint_prefetch_concurrency: int = 1  # prefetches running at once per worker
+    hint_prefetch_min_spare_calls: float = 3.0  # skip the prefetch when the API keys have less to spare (with RATE_LIMIT_PER_MINUTE)
+    hint_prefetch_max_calls_per_key: float = 2.0  # skip while the worker has this many Gemini calls per key in flight
+    hint_prefetch_rate_limit_backoff_seconds: float = 60.0  # skip for this long after any 429
+    hint_prefetch_max_queued: int = 8  # prefetches waiting for a slot; more are skipped
+    hint_prefetch_wait_seconds: float = 5.0  # wait for a running prefetch before generating a hint cold
+    challenge_index_size: int = 5000  # issued challenges remembered per language/difficulty
+    challenge_duplicate_threshold: float = 0.5  # estimated Jaccard similarity of title+description
+    challenge_title_duplicate_threshold: float = 0.7
+    challenge_prompt_titles: int = 20  # recent titles listed in the prompt
+    challenge_catalog_path: Optional[str] = os.path.join(DATA_DIR, "challenges.sqlite3")  # empty disables the catalog
+    serve_challenges_from_catalog: bool = True  # fill requests from the catalog before calling the model
+    derive_challenge_languages: bool = True  # catalog locally validated conversions to the other languages
+    challenge_batch_concurrency: int = 4  # generation calls in flight per batch request, within the rate budget
+    static_analysis_timeout: float = 5.0  # seconds per node/g++ syntax check
+    static_analysis_concurrency: int = 4
+    
+    # IDE WebSocket channel (/api/project/session/{session_id})
+    ws_max_sessions: int = 256  # open channels per worker; more are closed with 1013
+    ws_max_inflight: int = 4  # chat/review messages running at once per channel
+    ws_send_queue_size: int = 64  # outgoing frames buffered before producers wait for the client
+    ws_keepalive_seconds: float = 20.0  # ping a quiet client this often
+    ws_idle_timeout_seconds: float = 90.0  # close after this long without any client frame
+    
+    # Logging
+    log_format: Literal["text", "json"] = "text"
+    log_request_sample_rate: float = 1.0  # share of successful requests logged; errors and slow ones always are
+    log_slow_request_seconds: float = 5.0
+    log_queue_size: int = 10000  # records are dropped (and counted) beyond this backlog
+    
+    # Diagnostics
+    admin_token: Optional[str] = None  # enables /admin endpoints, sent as X-Admin-Token
+    profile_max_seconds: float = 60.0
+    loop_stall_threshold_seconds: float = 0.25  # log the loop's stack when it is blocked this long; 0 disables
+    loop_lag_interval_seconds: float = 0.05
+    
+    # Responses
+    compression_minimum_size: int = 1024  # bytes; smaller bodies are sent uncompressed
+    gzip_level: int = 6
+    brotli_quality: int = 4  # brotli is preferred when installed and accepted by the client
+    
+    # Multi-worker production mode (run.py)
+    workers: int = 0  # 0 = one per available CPU core
+    graceful_shutdown_timeout: int = 30  # seconds to drain in-flight requests
+    shutdown_drain_seconds: float = 20.0  # then wait this long for background Gemini calls; keep under the above
+    shutdown_readiness_delay_seconds: float = 0.0  # production: /ready is 503 this long before the socket closes
+    state_snapshot_path: Optional[str] = os.path.join(DATA_DIR, "cobuild-state.pickle")  # caches saved at shutdown, restored at startup; empty disables
+    metrics_log_path: Optional[str] = os.path.join(DATA_DIR, "metrics.jsonl")  # final metrics appended per worker at shutdown; empty disables
+    shared_state_path: Optional[str] = None  # SQLite file shared by workers; set by run.py
+    shared_state_busy_timeout_seconds: float = 0.05  # wait this long for another worker's lock, then use per-process state
+    singleflight_wait_seconds: float = 60.0
     
     # Limits
-    max_chat_history: int = 10
+    max_chat_history: int = 10  # verbatim turns sent to the model at most
+    chat_recent_turns: int = 6  # latest turns always sent verbatim; older ones are summarised
+    chat_summary_batch: int = 4  # uncovered older turns that trigger the next background summary
+    chat_summary_max_turns: int = 40  # turns folded into one background summary at most
+    chat_summary_cache_size: int = 4096
+    chat_summary_ttl_seconds: int = 86400
+    chat_answer_cache_size: int = 2000  # answers to standalone conceptual questions per language; 0 disables
+    chat_answer_min_similarity: float = 0.8  # TF-IDF cosine needed to serve a stored answer
+    chat_answer_min_terms: int = 2  # shorter questions are too vague to match
     max_code_length: int = 10000
-    max_tokens_estimate: int = 30000
+    max_tokens_estimate: int = 30000  # hard cap on any assembled prompt (estimated tokens)
+    chat_prompt_tokens: int = 2500  # chat prompt budget; code is excerpted and old turns dropped to fit
+    review_prompt_tokens: int = 5000  # full-review prompt budget
     
     class Config:
         env_file = ".env"
@@ -35,6 +122,19 @@ class Settings(BaseSettings):
     @property
     def is_production(self) -> bool:
         return self.environment == "production"
+    
+    @property
+    def cors_origins(self) -> List[str]:
+        """Browser origins allowed to call the API (CORS) and open the IDE channel."""
+        # Allow both common frontend ports in development
+        return [
+            self.frontend_url,
+            "http://localhost:8080",
+            "http://127.0.0.1:8080",
+            "http://localhost:5173",
+            "http://127.0.0.1:5173",
+            "http://[::1]:8080",  # IPv6 localhost
+        ]
 
 
 settings = Settings()
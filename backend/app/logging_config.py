@@ -0,0 +1,94 @@
+"""Logging set-up: the event loop only enqueues records, a listener thread writes them."""
+import atexit
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import orjson
+from app.config import settings
+from app.services.metrics import metrics
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: "logging.handlers.QueueListener | None" = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener without blocking: when the queue is full
+    the record is dropped and counted in `logging.dropped`.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the args now (they may change later), but leave formatting,
+        # tracebacks included, to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.increment("logging.dropped")
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including fields passed with `extra=`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+def _start_listener() -> None:
+    global _listener
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JSONFormatter() if settings.log_format == "json" else logging.Formatter(TEXT_FORMAT))
+    log_queue: queue.Queue = queue.Queue(settings.log_queue_size)
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    logging.getLogger().handlers = [DroppingQueueHandler(log_queue)]
+
+
+def configure_logging() -> None:
+    """
+    Route every logger through one bounded queue. Uvicorn's loggers are
+    re-pointed at the root logger so its lines go the same way. A forked
+    worker starts its own listener, as threads do not survive fork.
+    """
+    if _listener is not None:
+        return
+    root = logging.getLogger()
+    root.setLevel(logging.INFO if settings.is_production else logging.DEBUG)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+    _start_listener()
+    os.register_at_fork(after_in_child=_start_listener)
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Write out whatever is still queued and stop the listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
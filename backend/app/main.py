@@ -1,20 +1,25 @@
 """Main FastAPI application setup."""
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
+from fastapi.encoders import jsonable_encoder
 from contextlib import asynccontextmanager
 import logging
+import os
 
 from app.config import settings
-from app.routers import project, challenges
+from app.logging_config import configure_logging
+from app.middleware import CompressionMiddleware, DrainMiddleware, ETagMiddleware, RequestLoggingMiddleware
+from app.responses import ORJSONResponse
+from app.routers import project, challenges, admin
 from app.services.gemini_service import GeminiService
+from app.services.metrics import metrics
+from app.services.key_pool import key_pool
+from app.services.profiler import LoopLagMonitor
+from app.services.shutdown import shutdown, save_snapshot, load_snapshot, append_metrics
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO if settings.is_production else logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging (queued; written by a listener thread)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -29,16 +34,45 @@ async def lifespan(app: FastAPI):
     # Initialize Gemini service (validate API key)
     try:
         gemini = GeminiService()
-        await gemini.health_check()
+        try:
+            await gemini.health_check()
+        finally:
+            await gemini.aclose()
         logger.info("✅ Gemini API connection established")
     except Exception as e:
         logger.error(f"❌ Failed to connect to Gemini API: {e}")
         raise
     
+    if settings.state_snapshot_path:
+        load_snapshot(settings.state_snapshot_path)
+    
+    # Readiness drops on SIGTERM, before the server stops listening
+    shutdown.install_signal_handlers(
+        settings.shutdown_readiness_delay_seconds if settings.is_production else 0.0
+    )
+    
+    # Runs in each worker: logs the stack whenever the event loop stalls
+    lag_monitor = None
+    if settings.loop_stall_threshold_seconds > 0:
+        lag_monitor = LoopLagMonitor(settings.loop_stall_threshold_seconds, settings.loop_lag_interval_seconds)
+        lag_monitor.start()
+    
     yield
     
-    # Shutdown
+    # Shutdown: open requests have finished; background generations may not have
     logger.info("Shutting down Cobuild AI Backend...")
+    await shutdown.drain(settings.shutdown_drain_seconds)
+    # Solutions still generating are abandoned: snapshot them as failed, not pending
+    await project.solution_store.cancel()
+    try:
+        if settings.state_snapshot_path:
+            save_snapshot(settings.state_snapshot_path)
+        if settings.metrics_log_path:
+            append_metrics(settings.metrics_log_path)
+    except OSError as e:
+        logger.error(f"❌ Failed to save state at shutdown: {e}")
+    if lag_monitor is not None:
+        await lag_monitor.stop()
 
 
 # Create FastAPI app
@@ -46,33 +80,24 @@ app = FastAPI(
     title="Cobuild AI API",
     description="Backend API for Cobuild AI - Teaching programming through AI-guided projects",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# Add middleware to log all requests (before CORS)
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.info(f"📥 {request.method} {request.url.path} from {request.client.host if request.client else 'unknown'}")
-    if request.method == "OPTIONS":
-        logger.info(f"   CORS preflight request")
-    response = await call_next(request)
-    logger.info(f"📤 Response: {response.status_code}")
-    return response
+# Innermost, so refused requests are still logged and get CORS headers
+app.add_middleware(DrainMiddleware)
 
-# CORS Configuration
-# Allow both common frontend ports in development
-allowed_origins = [
-    settings.frontend_url,
-    "http://localhost:8080",
-    "http://127.0.0.1:8080",
-    "http://localhost:5173",
-    "http://127.0.0.1:5173",
-    "http://[::1]:8080",  # IPv6 localhost
-]
+# ETags are computed on the uncompressed body, so compression wraps them
+app.add_middleware(ETagMiddleware)
+app.add_middleware(CompressionMiddleware)
 
+# Log all requests, including CORS preflights (before CORS)
+app.add_middleware(RequestLoggingMiddleware)
+
+# CORS Configuration
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=allowed_origins,
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
@@ -82,6 +107,7 @@ app.add_middleware(
 # Include Routers
 app.include_router(project.router, prefix="/api/project", tags=["Project"])
 app.include_router(challenges.router, prefix="/api/challenges", tags=["Challenges"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"], include_in_schema=False)
 
 
 # Exception Handlers
@@ -89,12 +115,12 @@ app.include_router(challenges.router, prefix="/api/challenges", tags=["Challenge
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle Pydantic validation errors (422)."""
     logger.error(f"Validation error for {request.method} {request.url.path}: {exc.errors()}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content={
             "error": "validation_error",
             "message": "البيانات المرسلة غير صحيحة",
-            "detail": exc.errors(),
+            "detail": jsonable_encoder(exc.errors()),
             "retryable": False
         }
     )
@@ -104,7 +130,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 async def general_exception_handler(request: Request, exc: Exception):
     """Handle all other exceptions."""
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": "internal_server_error",
@@ -125,6 +151,20 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 once the worker is draining, so the load balancer stops routing to it."""
+    if shutdown.draining:
+        return ORJSONResponse(status_code=503, content={"status": "draining", "inflight_calls": shutdown.inflight})
+    return {"status": "ready"}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """In-process counters (cancellations, tokens/seconds saved, latencies)."""
+    return {"worker_pid": os.getpid(), "api_keys": key_pool.snapshot(), **metrics.snapshot()}
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -0,0 +1,222 @@
+"""Pure ASGI middleware: request logging, draining, response ETags and compression."""
+import gzip
+import hashlib
+import logging
+import random
+import time
+from typing import Optional
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.shutdown import shutdown
+
+try:
+    import brotli
+except ImportError:  # optional; responses are gzip-only without it
+    brotli = None
+
+logger = logging.getLogger("app.requests")
+
+_COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Codings from an Accept-Encoding header, minus the ones with q=0."""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class BufferedResponseMiddleware:
+    """
+    Base for middleware that rewrites a complete response body.
+
+    Responses sent in one body message (every JSON endpoint) are handed to
+    `process`; streamed responses pass through untouched so their chunks are
+    not held back.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    def process(self, scope: Scope, start: Message, body: bytes) -> bytes:
+        """Return the body to send; may edit the status and headers in `start`."""
+        raise NotImplementedError
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start: Optional[Message] = None
+
+        async def buffered_send(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            pending, start = start, None
+            if message.get("more_body", False):
+                await send(pending)
+                await send(message)
+                return
+            body = self.process(scope, pending, message.get("body", b""))
+            await send(pending)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, buffered_send)
+
+
+class ETagMiddleware(BufferedResponseMiddleware):
+    """
+    Weak ETags on successful GET responses, answering a matching
+    If-None-Match with 304 and no body. The tag is a hash of the
+    uncompressed body, so it holds for every content coding.
+    """
+
+    def process(self, scope: Scope, start: Message, body: bytes) -> bytes:
+        if scope["method"] not in ("GET", "HEAD") or start["status"] != 200:
+            return body
+        headers = MutableHeaders(scope=start)
+        if "etag" in headers or "no-store" in headers.get("cache-control", ""):
+            return body
+        etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        headers["etag"] = etag
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match is None:
+            return body
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" not in tags and etag.removeprefix("W/") not in tags:
+            return body
+        metrics.increment("http.not_modified")
+        start["status"] = 304
+        for name in ("content-length", "content-type"):
+            if name in headers:
+                del headers[name]
+        return b""
+
+
+class CompressionMiddleware(BufferedResponseMiddleware):
+    """
+    Brotli (when installed) or gzip for JSON and text bodies of at least
+    `compression_minimum_size` bytes, as the client's Accept-Encoding allows.
+    """
+
+    def process(self, scope: Scope, start: Message, body: bytes) -> bytes:
+        if len(body) < settings.compression_minimum_size or start["status"] in (204, 304):
+            return body
+        headers = MutableHeaders(scope=start)
+        if "content-encoding" in headers or not headers.get("content-type", "").startswith(_COMPRESSIBLE_TYPES):
+            return body
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            encoding, compressed = "br", brotli.compress(body, quality=settings.brotli_quality)
+        elif "gzip" in accepted:
+            encoding, compressed = "gzip", gzip.compress(body, compresslevel=settings.gzip_level, mtime=0)
+        else:
+            return body
+        headers.add_vary_header("Accept-Encoding")
+        if len(compressed) >= len(body):
+            return body
+        headers["content-encoding"] = encoding
+        headers["content-length"] = str(len(compressed))
+        metrics.increment(f"http.compressed.{encoding}")
+        metrics.increment("http.compression_bytes_saved", len(body) - len(compressed))
+        return compressed
+
+
+class RequestLoggingMiddleware:
+    """
+    One access-log record per HTTP request, once the response has been sent.
+
+    Successful requests are sampled at `log_request_sample_rate`; errors
+    and requests slower than `log_slow_request_seconds` are always logged.
+    Fields are passed as `extra` so JSON output keeps them structured.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def status_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, status_send)
+        finally:
+            duration = time.perf_counter() - started
+            if (status >= 400
+                    or duration >= settings.log_slow_request_seconds
+                    or random.random() < settings.log_request_sample_rate):
+                client = scope.get("client")
+                logger.info(
+                    "📤 %s %s %d in %.0fms from %s",
+                    scope["method"],
+                    scope["path"],
+                    status,
+                    duration * 1000,
+                    client[0] if client else "unknown",
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "duration_ms": round(duration * 1000, 1),
+                        "client": client[0] if client else None
+                    }
+                )
+
+
+class DrainMiddleware:
+    """
+    Refuses new API requests with a retryable 503 once the worker is
+    draining, so clients retry on another worker instead of waiting for one
+    that is going away. Health, readiness and diagnostics stay available.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not shutdown.draining or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        metrics.increment("shutdown.rejected_requests")
+        body = orjson.dumps({
+            "error": "shutting_down",
+            "message": "الخادم يعيد التشغيل. حاول مرة أخرى بعد لحظات.",
+            "retryable": True
+        })
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", b"1"),
+                (b"connection", b"close")
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -3,13 +3,21 @@ from .requests import (
     ProjectInitRequest,
     CodeReviewRequest,
     ChatRequest,
-    ChallengeGenerateRequest
+    ChannelChatRequest,
+    ChallengeGenerateRequest,
+    ChallengeBatchSpec,
+    ChallengeBatchRequest
 )
 from .responses import (
     ProjectInitResponse,
+    ProjectPlanResponse,
+    ProjectSolutionResponse,
+    TaskHintResponse,
     CodeReviewResponse,
     ChatResponse,
     ChallengeGenerateResponse,
+    CatalogChallenge,
+    ChallengeCatalogPage,
     ErrorResponse
 )
 
@@ -17,10 +25,18 @@ __all__ = [
     "ProjectInitRequest",
     "CodeReviewRequest",
     "ChatRequest",
+    "ChannelChatRequest",
     "ChallengeGenerateRequest",
+    "ChallengeBatchSpec",
+    "ChallengeBatchRequest",
     "ProjectInitResponse",
+    "ProjectPlanResponse",
+    "ProjectSolutionResponse",
+    "TaskHintResponse",
     "CodeReviewResponse",
     "ChatResponse",
     "ChallengeGenerateResponse",
+    "CatalogChallenge",
+    "ChallengeCatalogPage",
     "ErrorResponse"
 ]
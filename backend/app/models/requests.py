@@ -1,5 +1,5 @@
 """Request models for all API endpoints."""
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import Literal, List, Optional
 
 
@@ -26,6 +26,20 @@ class ProjectInitRequest(BaseModel):
         return v
 
 
+class ProjectSolutionRequest(BaseModel):
+    """POST /api/project/{project_id}/solution - Generate a failed or lost solution again
+    
+    Carries the plan the client saved, so the solution can be generated
+    even after the server has forgotten the project.
+    """
+    idea: Optional[str] = Field(None, max_length=200, description="Original idea; the title is used without it")
+    language: Literal["python", "javascript", "cpp"]
+    level: Literal["beginner", "intermediate", "advanced"] = "beginner"
+    project_title: str = Field(..., min_length=1, max_length=200)
+    tasks: List[str] = Field(..., min_length=1, max_length=30)
+    starter_filename: str = Field(..., min_length=1, max_length=100)
+
+
 class ProjectContext(BaseModel):
     """Project context for code review."""
     title: str
@@ -33,12 +47,48 @@ class ProjectContext(BaseModel):
     current_task_index: int = Field(..., ge=0)
 
 
+class CodeEdit(BaseModel):
+    """Replace lines start_line..end_line (1-based, inclusive) with `text`.
+    
+    end_line = start_line - 1 inserts before start_line without deleting.
+    `text` is split on "\n", so "" is one blank line; null deletes the range.
+    """
+    start_line: int = Field(..., ge=1)
+    end_line: int = Field(..., ge=0)
+    text: Optional[str] = Field(..., max_length=10000)
+
+
 class CodeReviewRequest(BaseModel):
-    """POST /api/project/review - Comprehensive code review with direct feedback"""
-    code: str = Field(..., min_length=1, max_length=10000)
+    """POST /api/project/review - Comprehensive code review with direct feedback
+    
+    Either the full `code` or, for an existing session, `code_edits` against
+    the session's code at `base_version`. `project_context` may be omitted
+    once the session holds it.
+    """
+    code: Optional[str] = Field(None, min_length=1, max_length=10000)
+    code_edits: Optional[List[CodeEdit]] = Field(None, max_length=200)
+    base_version: Optional[int] = Field(None, ge=0)
     language: Literal["python", "javascript", "cpp"]
-    project_context: ProjectContext
+    project_context: Optional[ProjectContext] = None
+    current_task_index: Optional[int] = Field(None, ge=0, description="Progress update for delta requests")
     previous_review: Optional[str] = None
+    session_id: Optional[str] = Field(
+        None,
+        max_length=100,
+        description="IDE session key; a newer review for the same session supersedes in-flight ones"
+    )
+    
+    @model_validator(mode="after")
+    def validate_code_source(self) -> "CodeReviewRequest":
+        if self.code is None and self.code_edits is None:
+            raise ValueError("Either code or code_edits is required")
+        if self.code is not None and self.code_edits is not None:
+            raise ValueError("Send either code or code_edits, not both")
+        if self.code_edits is not None and (not self.session_id or self.base_version is None):
+            raise ValueError("code_edits require session_id and base_version")
+        if self.project_context is None and not self.session_id:
+            raise ValueError("project_context is required without session_id")
+        return self
 
 
 class ChatMessage(BaseModel):
@@ -52,8 +102,28 @@ class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1, max_length=500)
     language: Literal["python", "javascript", "cpp"]
     project_title: str
-    history: List[ChatMessage] = Field(default_factory=list, max_length=10)
+    history: List[ChatMessage] = Field(default_factory=list, max_length=200)
     current_code: Optional[str] = Field(None, max_length=10000)
+    # A summary from an earlier ChatResponse, standing in for the turns before `history`
+    summary_hash: Optional[str] = Field(None, max_length=64)
+    summary: Optional[str] = Field(None, max_length=8000)
+
+
+class ChannelChatRequest(BaseModel):
+    """`chat` message on the IDE WebSocket channel
+    
+    History is kept by the channel; `history` (and the summary of the turns
+    before it) only seeds it on the first chat of a connection that
+    succeeds. Chats on one channel are answered in order. Language, title
+    and code default to the session's review context when omitted.
+    """
+    message: str = Field(..., min_length=1, max_length=500)
+    language: Optional[Literal["python", "javascript", "cpp"]] = None
+    project_title: Optional[str] = None
+    history: List[ChatMessage] = Field(default_factory=list, max_length=200)
+    current_code: Optional[str] = Field(None, max_length=10000)
+    summary_hash: Optional[str] = Field(None, max_length=64)
+    summary: Optional[str] = Field(None, max_length=8000)
 
 
 # ===== CHALLENGES ENDPOINTS =====
@@ -64,3 +134,23 @@ class ChallengeGenerateRequest(BaseModel):
     difficulty: Literal["easy", "medium", "hard"]
     language: Literal["python", "javascript", "cpp"]
     existing_titles: List[str] = Field(default_factory=list)
+
+
+class ChallengeBatchSpec(BaseModel):
+    """One (difficulty, language, count) entry of a batch request."""
+    difficulty: Literal["easy", "medium", "hard"]
+    language: Literal["python", "javascript", "cpp"]
+    count: int = Field(..., ge=1, le=20)
+
+
+class ChallengeBatchRequest(BaseModel):
+    """POST /api/challenges/generate/batch - Generate challenges for several specs at once"""
+    specs: List[ChallengeBatchSpec] = Field(..., min_length=1, max_length=12)
+    existing_titles: List[str] = Field(default_factory=list)
+    
+    @model_validator(mode="after")
+    def validate_total(self) -> "ChallengeBatchRequest":
+        total = sum(spec.count for spec in self.specs)
+        if total > 50:
+            raise ValueError(f"A batch may request at most 50 challenges (got {total})")
+        return self
@@ -12,6 +12,31 @@ class ProjectInitResponse(BaseModel):
     tasks: List[str]
     starter_filename: str
     full_solution_code: str
+    project_id: Optional[str] = Field(None, description="Key for GET /api/project/{project_id}/hints/{task_index}")
+
+
+class ProjectPlanResponse(BaseModel):
+    """Response for POST /api/project/plan (solution is generated in the background)"""
+    project_id: str
+    project_title: str
+    mermaid_chart: str
+    tasks: List[str]
+    starter_filename: str
+
+
+class ProjectSolutionResponse(BaseModel):
+    """Response for GET /api/project/{project_id}/solution"""
+    project_id: str
+    status: Literal["pending", "ready", "failed"]
+    full_solution_code: Optional[str] = None
+    message: Optional[str] = None
+
+
+class TaskHintResponse(BaseModel):
+    """Response for GET /api/project/{project_id}/hints/{task_index}"""
+    project_id: str
+    task_index: int
+    hint: str
 
 
 class CodeReviewResponse(BaseModel):
@@ -19,12 +44,18 @@ class CodeReviewResponse(BaseModel):
     review_comment: str
     highlight_line: Optional[int] = None
     severity: Literal["info", "warning", "error"]
+    code_version: Optional[int] = None  # session code version this review is for
 
 
 class ChatResponse(BaseModel):
     """Response for POST /api/project/chat"""
     response: str
     suggested_reading: Optional[str] = None
+    # Set once older turns are summarised: the summary covers the first
+    # `summary_turns` turns of the history sent (on the channel: of the seed)
+    summary_hash: Optional[str] = None
+    summary: Optional[str] = None
+    summary_turns: Optional[int] = None
 
 
 # ===== CHALLENGES RESPONSES =====
@@ -49,6 +80,17 @@ class ChallengeGenerateResponse(BaseModel):
     challenges: List[Challenge]
 
 
+class CatalogChallenge(Challenge):
+    """Challenge stored in the server-side catalog."""
+    id: int
+
+
+class ChallengeCatalogPage(BaseModel):
+    """Response for GET /api/challenges/catalog and /catalog/search"""
+    challenges: List[CatalogChallenge]
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to get the next page; null on the last page")
+
+
 # ===== ERROR RESPONSES =====
 
 class ErrorResponse(BaseModel):
@@ -0,0 +1,269 @@
+"""Token estimates and budget fitting for the variable parts of prompts."""
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+_LINE_REFERENCE = re.compile(r"(?:line|السطر|سطر)\s*(\d+)", re.IGNORECASE)
+# Lines that continue the previous top-level statement rather than start one
+_CONTINUATION = re.compile(r"^(?:[}\])]|else\b|elif\b|except\b|finally\b|catch\b|while\b.*\);\s*$)")
+_PYTHON_HEADER = re.compile(r"(?:async\s+def|def|class)\s|@")
+# Triple quote, one-line string or comment, leftmost first
+_PYTHON_TOKEN = re.compile(r"\"\"\"|'''|\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|#")
+# Layouts of recently fitted files, by code digest: chat and review resend
+# the same file
+_LAYOUT_CACHE_SIZE = 256
+_layout_cache: "OrderedDict[Tuple[bytes, str], _Layout]" = OrderedDict()
+_layout_cache_lock = threading.Lock()
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Gemini tokens in `text`, estimated without a tokenizer: about 4 ASCII
+    characters per token and 2.5 per Arabic (multi-byte) character.
+    Errs slightly high, which keeps fitted prompts inside their budget.
+    """
+    if not text:
+        return 0
+    multibyte = len(text.encode("utf-8")) - len(text)
+    return math.ceil(max(0, len(text) - multibyte) / 4 + multibyte / 2.5)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """The start of `text`, cut at a word boundary, within `budget` tokens."""
+    if estimate_tokens(text) <= budget:
+        return text
+    chars = int(budget * 2.5)
+    while chars > 0 and estimate_tokens(text[:chars]) > budget - 1:
+        chars = int(chars * 0.9)
+    cut = text[:chars]
+    return (cut.rsplit(" ", 1)[0] if " " in cut else cut) + " …"
+
+
+class _Unit(NamedTuple):
+    start: int  # 1-based, inclusive
+    end: int
+    tokens: int
+    score: int
+
+
+class _Layout(NamedTuple):
+    """What fit_code needs from a file regardless of budget and focus."""
+    lines: List[str]
+    line_tokens: List[int]  # including the "NNNN| " prefix
+    blocks: List[List[int]]  # [start, end] line ranges
+    block_tokens: List[int]
+    block_words: List[frozenset]  # lower-cased identifiers per block
+
+
+def _python_code(line: str, quote: Optional[str]) -> Tuple[str, Optional[str]]:
+    """
+    `line` with strings blanked and comments dropped, and the triple quote
+    still open at its end (`quote` is the one open at its start).
+    """
+    code = []
+    pos = 0
+    while True:
+        if quote:
+            end = line.find(quote, pos)
+            if end < 0:
+                return "".join(code), quote
+            pos, quote = end + 3, None
+        match = _PYTHON_TOKEN.search(line, pos)
+        if not match:
+            code.append(line[pos:])
+            return "".join(code), None
+        code.append(line[pos:match.start()])
+        token = match.group(0)
+        if token == "#":
+            return "".join(code), None
+        code.append("''")
+        if token in ('"""', "'''"):
+            quote = token
+        pos = match.end()
+
+
+def _python_layout_blocks(lines: List[str]) -> List[List[int]]:
+    """
+    Top-level statements (with their decorators) as [start, end] line
+    ranges; blank and comment lines go with the statement before them.
+
+    Read from the layout, tracking brackets, triple-quoted strings,
+    backslash continuations and decorators, which gives the same blocks
+    as the AST for code that parses at a fraction of the cost, and a
+    reasonable split for code that does not.
+    """
+    starts: List[int] = [1]
+    has_code = False  # leading comments go with the first statement
+    depth = 0
+    quote: Optional[str] = None
+    continued = decorated = False
+    for number, line in enumerate(lines, start=1):
+        if quote is None and _PYTHON_HEADER.match(line):
+            depth, continued = 0, False  # an unclosed bracket above does not swallow the file
+        inside = depth > 0 or quote is not None or continued
+        code, quote = _python_code(line, quote) if quote is None or quote in line else ("", quote)
+        stripped = code.strip()
+        if not stripped:
+            continue
+        if not inside and not line[:1].isspace():
+            if not decorated and has_code and not _CONTINUATION.match(stripped):
+                starts.append(number)
+            decorated = stripped.startswith("@")
+        has_code = True
+        depth = max(0, depth + code.count("(") + code.count("[") + code.count("{")
+                    - code.count(")") - code.count("]") - code.count("}"))
+        continued = stripped.endswith("\\")
+    return [[start, end - 1] for start, end in zip(starts, starts[1:] + [len(lines) + 1])]
+
+
+def _brace_layout_blocks(lines: List[str]) -> List[List[int]]:
+    """
+    Top-level blocks of a brace language from layout alone: a block starts
+    at an unindented line outside any brace pair.
+    """
+    blocks: List[List[int]] = []
+    depth = 0
+    for number, line in enumerate(lines, start=1):
+        stripped = line.strip()
+        starts = (
+            stripped
+            and depth <= 0
+            and not line[:1].isspace()
+            and not _CONTINUATION.match(stripped)
+        )
+        if starts or not blocks:
+            blocks.append([number, number])
+        else:
+            blocks[-1][1] = number
+        # Strings and comments may hold braces; good enough for a layout guess
+        depth += line.count("{") - line.count("}")
+    return blocks
+
+
+def _code_layout(code: str, language: str) -> _Layout:
+    """The layout of `code`, computed once per distinct file (LRU by digest)."""
+    key = (hashlib.blake2b(code.encode("utf-8"), digest_size=16).digest(), language)
+    with _layout_cache_lock:
+        layout = _layout_cache.get(key)
+        if layout is not None:
+            _layout_cache.move_to_end(key)
+            return layout
+    lines = code.split("\n")
+    blocks = _python_layout_blocks(lines) if language == "python" else _brace_layout_blocks(lines)
+    line_tokens = [estimate_tokens(line) + 2 for line in lines]
+    layout = _Layout(
+        lines,
+        line_tokens,
+        blocks,
+        [sum(line_tokens[start - 1:end]) for start, end in blocks],
+        [_words("\n".join(lines[start - 1:end])) for start, end in blocks]
+    )
+    with _layout_cache_lock:
+        _layout_cache[key] = layout
+        if len(_layout_cache) > _LAYOUT_CACHE_SIZE:
+            _layout_cache.popitem(last=False)
+    return layout
+
+
+def _words(text: str) -> frozenset:
+    return frozenset(word.lower() for word in _IDENTIFIER.findall(text))
+
+
+def _focus(focus_text: str, anchor_lines: Iterable[int]):
+    words = {word.lower() for word in _IDENTIFIER.findall(focus_text or "")}
+    anchors = set(anchor_lines) | {int(n) for n in _LINE_REFERENCE.findall(focus_text or "")}
+    return words, anchors
+
+
+def _score(start: int, end: int, present: frozenset, words: Set[str], anchors: Set[int]) -> int:
+    return 10 * sum(1 for line in anchors if start <= line <= end) + 3 * len(words & present)
+
+
+def fit_code(
+    code: str,
+    language: str,
+    budget: int,
+    focus_text: str = "",
+    anchor_lines: Iterable[int] = ()
+) -> str:
+    """
+    `code` as is when it fits in `budget` tokens, otherwise an excerpt of
+    whole top-level blocks (functions, classes, statements, read from the
+    layout) around the region that matters. Blocks containing an
+    anchor line (a diagnostic, a line the student mentions) come first,
+    then blocks using identifiers named in `focus_text` (the question,
+    the active task), then their neighbours. Without any focus the end
+    of the file is kept, where students usually work. A block too large
+    for the budget is treated line by line.
+
+    Kept lines are numbered as in the full file and gaps are marked, so
+    line numbers in the model's answer stay valid.
+    """
+    if estimate_tokens(code) <= budget:
+        return code
+    lines, line_tokens, blocks, block_tokens, block_words = _code_layout(code, language)
+    words, anchors = _focus(focus_text, anchor_lines)
+
+    units: List[_Unit] = []
+    for (start, end), tokens, present in zip(blocks, block_tokens, block_words):
+        if tokens <= budget:
+            units.append(_Unit(start, end, tokens, _score(start, end, present, words, anchors)))
+        else:
+            units.extend(
+                _Unit(n, n, line_tokens[n - 1], _score(n, n, _words(lines[n - 1]), words, anchors))
+                for n in range(start, end + 1)
+            )
+
+    chosen: Set[int] = set()
+    used = 0
+
+    def take(index: int) -> None:
+        nonlocal used
+        if index not in chosen and used + units[index].tokens <= budget:
+            chosen.add(index)
+            used += units[index].tokens
+
+    for index in sorted(range(len(units)), key=lambda i: -units[i].score):
+        if units[index].score <= 0:
+            break
+        take(index)
+    if not chosen:
+        take(len(units) - 1)
+    # Grow outwards from what was chosen, nearest blocks first
+    seeds = sorted(chosen) or [len(units) - 1]
+    for index in sorted(range(len(units)), key=lambda i: (min(abs(i - s) for s in seeds), -i)):
+        take(index)
+
+    kept = sorted(n for index in chosen for n in range(units[index].start, units[index].end + 1))
+    out = [f"(excerpt: {len(kept)} of {len(lines)} lines, numbered as in the full file)"]
+    previous = 0
+    for number in kept:
+        if number > previous + 1:
+            out.append(f"    ⋮ lines {previous + 1}-{number - 1} omitted")
+        out.append(f"{number:>4}| {lines[number - 1]}")
+        previous = number
+    if previous < len(lines):
+        out.append(f"    ⋮ lines {previous + 1}-{len(lines)} omitted")
+    return "\n".join(out)
+
+
+def fit_history(history: Sequence[dict], budget: int, max_turns: int) -> List[dict]:
+    """
+    The most recent turns (at most `max_turns`) that fit in `budget`
+    tokens, oldest first. The latest turn is shortened rather than dropped.
+    """
+    fitted: List[dict] = []
+    used = 0
+    for message in reversed(history[-max_turns:] if max_turns > 0 else []):
+        tokens = estimate_tokens(message["content"]) + 3
+        if used + tokens > budget:
+            if not fitted and budget > 10:
+                fitted.append({**message, "content": truncate_to_tokens(message["content"], budget - 3)})
+            break
+        fitted.append(message)
+        used += tokens
+    return fitted[::-1]
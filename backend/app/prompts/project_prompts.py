@@ -1,12 +1,10 @@
 """Prompt templates for project-related endpoints."""
+from app.config import settings
+from app.prompts.budget import estimate_tokens, fit_code, fit_history
 
-
-def get_project_init_prompt(idea: str, language: str, level: str) -> str:
-    """Generate system prompt for project initialization."""
-    
-    # Define level-specific code requirements
-    level_requirements = {
-        "beginner": """BEGINNER LEVEL CODE REQUIREMENTS (CRITICAL - MUST FOLLOW):
+# Level-specific code requirements
+LEVEL_REQUIREMENTS = {
+    "beginner": """BEGINNER LEVEL CODE REQUIREMENTS (CRITICAL - MUST FOLLOW):
    - Keep code SIMPLE and STRAIGHTFORWARD - linear flow only
    - NO error handling (no try/except, no while loops for input validation)
    - NO complex logic or nested structures unless absolutely necessary
@@ -20,8 +18,8 @@ def get_project_init_prompt(idea: str, language: str, level: str) -> str:
      * NO loops, NO error handling, NO validation
    - Tasks should be 4-6 simple, sequential steps
    - Code should be readable by someone learning their first program""",
-        
-        "intermediate": """INTERMEDIATE LEVEL CODE REQUIREMENTS:
+    
+    "intermediate": """INTERMEDIATE LEVEL CODE REQUIREMENTS:
    - Include basic error handling (try/except for input validation)
    - Can use loops for input validation (while loops OK)
    - Can organize code with simple functions if appropriate
@@ -29,8 +27,8 @@ def get_project_init_prompt(idea: str, language: str, level: str) -> str:
    - More detailed comments explaining logic
    - Tasks should be 6-8 steps with some error handling tasks
    - Code should demonstrate good practices but remain educational""",
-        
-        "advanced": """ADVANCED LEVEL CODE REQUIREMENTS:
+    
+    "advanced": """ADVANCED LEVEL CODE REQUIREMENTS:
    - Full error handling with try/except blocks
    - Handle all edge cases gracefully
    - Well-structured code with functions if appropriate
@@ -38,9 +36,18 @@ def get_project_init_prompt(idea: str, language: str, level: str) -> str:
    - Follow best practices for the language
    - Tasks should be 6-10 steps including error handling and edge cases
    - Production-quality code that's still educational"""
-    }
+}
+
+
+def _task_range(level: str) -> str:
+    """Task count guidance for a skill level."""
+    return "4-6" if level.lower() == "beginner" else "6-8" if level.lower() == "intermediate" else "6-10"
+
+
+def get_project_init_prompt(idea: str, language: str, level: str) -> str:
+    """Generate system prompt for project initialization."""
     
-    code_requirements = level_requirements.get(level.lower(), level_requirements["beginner"])
+    code_requirements = LEVEL_REQUIREMENTS.get(level.lower(), LEVEL_REQUIREMENTS["beginner"])
     
     return f"""You are an expert software engineer and programming educator.
 
@@ -110,20 +117,194 @@ Respond ONLY with valid JSON (no markdown, no extra text):
 }}"""
 
 
+def get_project_plan_prompt(idea: str, language: str, level: str) -> str:
+    """Fast first stage of project initialization: everything except the solution code."""
+    is_beginner = level.lower() == "beginner"
+    
+    return f"""You are an expert software engineer and programming educator.
+
+The student wants to build: "{idea}"
+Their skill level: {level}
+Programming language: {language}
+
+Plan a single-file console application (standard library only) appropriate for {level} level.
+{"Beginner projects are simple linear programs: ask input, process with simple ifs, display output - NO loops, NO error handling." if is_beginner else ""}
+
+Generate:
+
+1. **Project Title:** A concise, descriptive name in Arabic (3-5 words)
+
+2. **Mermaid Flowchart:** A flowchart showing the program's logic flow
+   - Use Mermaid graph TD syntax (or flowchart TD)
+   - Include: Start, main logic steps, decisions, End
+   - Keep it simple but complete
+   - DO NOT include ```mermaid backticks
+   - CRITICAL: All node labels containing Arabic text OR special characters (like +, -, *, /, (, ), etc.) MUST be wrapped in double quotes
+   - Example: D["اطلب العملية (+,-,*,/)"] NOT D{{اطلب العملية (+,-,*,/)}}
+   - Use square brackets [] for regular nodes, curly braces {{}} for decision nodes, but ALWAYS quote the text inside
+
+3. **Task Checklist:** {_task_range(level)} actionable steps a student can follow (in Arabic)
+   - Each task should be a single, clear action
+   - Order them logically (imports → input → logic → output)
+   - Use simple, encouraging language
+   - {"Keep tasks VERY simple - no error handling, no loops, just sequential steps" if is_beginner else ""}
+
+4. **Filename:** A suitable filename (e.g., "game.py", "calculator.js")
+
+Respond ONLY with valid JSON (no markdown, no extra text):
+{{
+  "project_title": string (Arabic),
+  "mermaid_chart": string (no backticks),
+  "tasks": string[] (Arabic, {_task_range(level)} items),
+  "starter_filename": string
+}}"""
+
+
+def get_project_solution_prompt(
+    idea: str,
+    language: str,
+    level: str,
+    project_title: str,
+    tasks: list,
+    starter_filename: str
+) -> str:
+    """Second stage of project initialization: the reference solution for an existing plan."""
+    code_requirements = LEVEL_REQUIREMENTS.get(level.lower(), LEVEL_REQUIREMENTS["beginner"])
+    tasks_formatted = "\n".join([f"{i+1}. {task}" for i, task in enumerate(tasks)])
+    is_beginner = level.lower() == "beginner"
+    
+    return f"""You are an expert software engineer and programming educator.
+
+Write the complete reference solution for this student project.
+
+Project: {project_title} ("{idea}")
+File: {starter_filename}
+Skill level: {level}
+Programming language: {language}
+
+The student will implement it by following these tasks, so the code must follow them in order:
+{tasks_formatted}
+
+{code_requirements}
+
+Solution requirements:
+- Single-file console application
+- Use ONLY standard library (no external packages)
+- {"NO error handling - simple, linear code only" if is_beginner else "Include basic error handling" if level.lower() == "intermediate" else "Include proper error handling"}
+- {"Minimal comments" if is_beginner else "Helpful comments in English"}
+- Make it educational and appropriate for {level} level
+{"- Beginner code is simple and direct: ask input, process with separate simple if statements (not elif), display output. NO while loops, NO try/except, NO validation loops." if is_beginner else ""}
+
+Respond ONLY with valid JSON (no markdown, no extra text):
+{{
+  "full_solution_code": string (English code + comments)
+}}"""
+
+
+def get_task_hints_prompt(project_title: str, tasks: list, language: str, level: str) -> str:
+    """One short Socratic hint per task, prefetched in the background after planning."""
+    tasks_formatted = "\n".join([f"{i+1}. {task}" for i, task in enumerate(tasks)])
+    
+    return f"""You are a Socratic programming mentor for a {level} student writing a {language} console program.
+
+Project: {project_title}
+Tasks:
+{tasks_formatted}
+
+For EACH task, write the hint you would give a student asking "how do I start this task?":
+- Arabic, 2-3 sentences
+- Point to the concept or built-in to look at and end with one guiding question
+- Never give the code for the task
+
+Respond ONLY with valid JSON:
+{{
+  "hints": string[] (exactly {len(tasks)} items, in task order)
+}}"""
+
+
+def get_task_hint_prompt(project_title: str, tasks: list, task_index: int, language: str, level: str) -> str:
+    """A single task hint, when it was not prefetched."""
+    done = "\n".join([f"✓ {task}" for task in tasks[:task_index]]) or "None yet"
+    
+    return f"""You are a Socratic programming mentor for a {level} student writing a {language} console program.
+
+Project: {project_title}
+Tasks already done:
+{done}
+
+The student asks how to start this task: "{tasks[task_index]}"
+
+Answer in Arabic, 2-3 sentences: point to the concept or built-in to look at and end with one guiding question. Never give the code for the task.
+
+Hint (plain text):"""
+
+
+def get_mermaid_chart_prompt(project_title: str, tasks: list, language: str, error: str) -> str:
+    """Chart-only regeneration, used when a generated flowchart cannot be repaired."""
+    tasks_formatted = "\n".join([f"{i+1}. {task}" for i, task in enumerate(tasks)])
+
+    return f"""Draw a Mermaid flowchart of the logic of this {language} console program.
+
+Project: {project_title}
+Steps:
+{tasks_formatted}
+
+The previous chart was invalid ({error}).
+
+Rules:
+- First line: flowchart TD
+- Node ids are ASCII letters/digits only (A, B, C1...)
+- EVERY label in double quotes: A["ابدأ"], B{{"هل الرقم أكبر من 0؟"}}, B -->|"نعم"| C
+- No double quotes inside labels
+- Include Start, the main steps, decisions and End
+
+Respond ONLY with the chart (no backticks, no extra text)."""
+
+
+def get_chat_summary_prompt(previous_summary: str, turns: list) -> str:
+    """Fold older chat turns into the running summary of a conversation."""
+    turns_formatted = "\n".join(
+        f"{'المستخدم' if msg['role'] == 'user' else 'المساعد'}: {msg['content']}" for msg in turns
+    )
+    
+    return f"""Update the summary of a conversation between a programming student and their mentor.
+
+Summary so far:
+{previous_summary or "None (this is the start of the conversation)"}
+
+New turns:
+{turns_formatted}
+
+Write the updated summary in Arabic, at most 120 words, as plain text. Keep:
+- What the student asked about and which concepts were explained
+- What the student now understands and what they still struggle with
+- Any open question or next step the mentor suggested
+Do not include code."""
+
+
 def get_code_review_prompt(
     code: str,
     language: str,
     project_title: str,
     tasks: list,
     current_task_index: int,
-    previous_review: str = None
+    previous_review: str = None,
+    diagnostics: str = None,
+    focus_lines: list = ()
 ) -> str:
-    """Direct code review prompt - provides comprehensive feedback."""
+    """
+    Direct code review prompt - provides comprehensive feedback.
+    
+    Fitted to `review_prompt_tokens`: a file too large for it is sent as an
+    excerpt around `focus_lines` (diagnostics) and the current task.
+    """
     tasks_formatted = "\n".join([f"{i+1}. {task}" for i, task in enumerate(tasks)])
     completed_tasks = tasks[:current_task_index + 1] if current_task_index >= 0 else []
     remaining_tasks = tasks[current_task_index + 1:] if current_task_index < len(tasks) - 1 else []
+    current_task = tasks[current_task_index] if 0 <= current_task_index < len(tasks) else ""
     
-    return f"""You are an expert code reviewer providing comprehensive feedback to programming students.
+    def render(code_text: str) -> str:
+        return f"""You are an expert code reviewer providing comprehensive feedback to programming students.
 
 Student's Project: {project_title}
 Current Progress: Task {current_task_index + 1} of {len(tasks)}
@@ -139,12 +320,15 @@ Remaining Tasks:
 
 Student's Current Code:
 ```{language}
-{code}
+{code_text}
 ```
 
 Previous Review (if any):
 {previous_review or "None"}
 
+Local Compiler Diagnostics (already verified - rely on these, do not re-check syntax yourself):
+{diagnostics or "Not available"}
+
 Your mission: Provide a COMPREHENSIVE direct review in Arabic that includes:
 
 1. **What's Correct (✓):**
@@ -187,6 +371,73 @@ Respond ONLY with valid JSON:
   "severity": "info" | "warning" | "error"
 }}
 
+Severity levels:
+- "info": Code works but has improvements/suggestions
+- "warning": Code has logic issues or poor practices that should be fixed
+- "error": Critical bug that prevents functionality or breaks the program"""
+    
+    budget = min(settings.review_prompt_tokens, settings.max_tokens_estimate)
+    return render(fit_code(
+        code,
+        language,
+        budget - estimate_tokens(render("")),
+        focus_text=current_task,
+        anchor_lines=focus_lines
+    ))
+
+
+def get_incremental_review_prompt(
+    code_diff: str,
+    language: str,
+    project_title: str,
+    tasks: list,
+    current_task_index: int,
+    previous_review_summary: str,
+    total_lines: int,
+    diagnostics: str = None
+) -> str:
+    """Follow-up review prompt carrying only the diff since the last review."""
+    current_task = tasks[current_task_index] if 0 <= current_task_index < len(tasks) else "All tasks completed!"
+    next_task = tasks[current_task_index + 1] if current_task_index + 1 < len(tasks) else "None"
+    
+    return f"""You are an expert code reviewer giving FOLLOW-UP feedback to a programming student.
+
+Student's Project: {project_title}
+Current Progress: Task {current_task_index + 1} of {len(tasks)}
+Current Task: {current_task}
+Next Task: {next_task}
+
+Your Previous Review (summary):
+{previous_review_summary}
+
+Changes Since Your Previous Review ({language}, file now has {total_lines} lines):
+Lines starting with "+" were added, "-" were removed, others are unchanged context.
+The number before "|" is the line number in the CURRENT file.
+```
+{code_diff}
+```
+
+Local Compiler Diagnostics (already verified - rely on these, do not re-check syntax yourself):
+{diagnostics or "Not available"}
+
+Your mission: Review the CHANGES in Arabic, building on your previous review:
+
+1. **What's Correct (✓):** Which earlier issues were fixed, and what progress was made on the current task
+2. **What's Wrong (✗):** Problems the changes introduced, and earlier issues that are still not fixed
+3. **What Needs to be Done/Fixed:** The next concrete step toward finishing the current task
+
+IMPORTANT RULES:
+- Judge only what the diff and your previous review show; do not invent code you cannot see
+- Be direct, encouraging and honest; DO NOT ask questions
+- Write in Arabic, 2-4 paragraphs
+
+Respond ONLY with valid JSON:
+{{
+  "review_comment": string (Arabic, follow-up review with the three sections),
+  "highlight_line": number | null (line number in the CURRENT file of the most critical issue, if any),
+  "severity": "info" | "warning" | "error"
+}}
+
 Severity levels:
 - "info": Code works but has improvements/suggestions
 - "warning": Code has logic issues or poor practices that should be fixed
@@ -198,15 +449,27 @@ def get_chat_prompt(
     language: str,
     project_title: str,
     history: list,
-    current_code: str = None
+    current_code: str = None,
+    current_task: str = None,
+    summary: str = None
 ) -> str:
-    """General chat/question answering prompt."""
-    history_formatted = ""
-    for msg in history[-5:]:  # Last 5 messages only
-        role = "المستخدم" if msg["role"] == "user" else "المساعد"
-        history_formatted += f"{role}: {msg['content']}\n"
+    """
+    General chat/question answering prompt, fitted to `chat_prompt_tokens`.
+    
+    The question is always sent whole. The code is excerpted around what the
+    question and the active task refer to, and the oldest turns are dropped
+    first (a quarter of the budget is kept for the most recent ones).
+    `summary` stands in for the turns before `history`.
+    """
+    def format_history(messages: list) -> str:
+        return "".join(
+            f"{'المستخدم' if msg['role'] == 'user' else 'المساعد'}: {msg['content']}\n" for msg in messages
+        )
     
-    return f"""You are a Socratic Mentor (معلم سقراطي) - a friendly programming mentor who guides students through questions.
+    summary_section = f"Earlier Conversation (summary):\n{summary}\n\n" if summary else ""
+    
+    def render(code_text: str, history_formatted: str) -> str:
+        return f"""You are a Socratic Mentor (معلم سقراطي) - a friendly programming mentor who guides students through questions.
 
 Your teaching approach: Use the Socratic method - guide students to discover answers themselves through thoughtful questions rather than giving direct solutions.
 
@@ -224,10 +487,10 @@ Student's Question:
 
 Their Current Code (for context):
 ```{language}
-{current_code or "Not started yet"}
+{code_text}
 ```
 
-Previous Conversation:
+{summary_section}Previous Conversation:
 {history_formatted}
 
 Respond in Arabic with:
@@ -242,3 +505,17 @@ IMPORTANT:
 - Help them discover the answer through thought-provoking questions
 
 Response (plain markdown):"""
+    
+    budget = min(settings.chat_prompt_tokens, settings.max_tokens_estimate)
+    available = budget - estimate_tokens(render("", ""))
+    reserved = estimate_tokens(format_history(fit_history(history, available // 4, settings.max_chat_history)))
+    code_text = "Not started yet"
+    if current_code:
+        code_text = fit_code(
+            current_code,
+            language,
+            available - reserved,
+            focus_text=f"{message}\n{current_task or ''}"
+        )
+    recent = fit_history(history, available - estimate_tokens(code_text), settings.max_chat_history)
+    return render(code_text, format_history(recent))
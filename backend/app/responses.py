@@ -0,0 +1,25 @@
+"""HTTP response classes: orjson for plain content, Pydantic's own serializer for models."""
+from typing import Mapping, Optional
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from starlette.responses import Response
+
+__all__ = ["ORJSONResponse", "ModelResponse"]
+
+
+class ModelResponse(Response):
+    """
+    JSON response for a model that has already been validated.
+
+    FastAPI skips `response_model` validation and `jsonable_encoder` for a
+    returned Response, so the model is serialized exactly once, straight to
+    bytes by pydantic-core. Routes keep `response_model` for the OpenAPI
+    schema only.
+    """
+    media_type = "application/json"
+
+    def __init__(self, content: BaseModel, status_code: int = 200, headers: Optional[Mapping[str, str]] = None):
+        super().__init__(content, status_code=status_code, headers=headers)
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.__pydantic_serializer__.to_json(content)
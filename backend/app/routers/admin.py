@@ -0,0 +1,58 @@
+"""API router for operator-only diagnostics on the live worker."""
+import os
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.config import settings
+from app.services.profiler import profiler, ProfilerBusy
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Admin endpoints need ADMIN_TOKEN set and sent back as X-Admin-Token."""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(
+            status_code=401,
+            detail={"error": "unauthorized", "message": "Missing or invalid X-Admin-Token", "retryable": False}
+        )
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0, description="How long to sample"),
+    interval_ms: float = Query(10, ge=1, le=1000, description="Time between samples")
+):
+    """
+    GET /admin/profile
+    
+    Sample every thread of the worker that serves the request for `seconds`
+    and return collapsed stacks (`thread;root;...;leaf count` per line), as
+    read by flamegraph.pl, speedscope and inferno. The profile covers only
+    this worker; X-Worker-PID says which one.
+    """
+    if seconds > settings.profile_max_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": "profile_too_long",
+                "message": f"seconds must be at most {settings.profile_max_seconds:g}",
+                "retryable": False
+            }
+        )
+    logger.info(f"🔬 Profiling worker {os.getpid()} for {seconds:g}s")
+    try:
+        stacks = await profiler.profile(seconds, interval_ms / 1000)
+    except ProfilerBusy:
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "profiler_busy", "message": "A profile is already running in this worker", "retryable": True}
+        )
+    return PlainTextResponse(stacks, headers={"X-Worker-PID": str(os.getpid()), "Cache-Control": "no-store"})
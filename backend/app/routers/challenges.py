@@ -1,8 +1,21 @@
 """API router for challenges generation."""
-from fastapi import APIRouter, HTTPException
-from app.models.requests import ChallengeGenerateRequest
-from app.models.responses import ChallengeGenerateResponse, Challenge
+import asyncio
+import math
+from typing import Any, Dict, List, Literal, Optional, Set, Tuple
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.models.requests import ChallengeGenerateRequest, ChallengeBatchRequest
+from app.models.responses import ChallengeGenerateResponse, Challenge, ChallengeCatalogPage
+from app.responses import ModelResponse
 from app.services.gemini_service import GeminiService, GeminiServiceError
+from app.services.cancellation import run_until_disconnect, ClientDisconnected
+from app.services.key_pool import key_pool
+from app.services.metrics import metrics
+from app.services.challenge_index import challenge_index, find_duplicate, similar_title
+from app.services.challenge_catalog import challenge_catalog
+from app.services.challenge_converter import LANGUAGES, convert_challenge
 from app.prompts.challenge_prompts import get_challenges_prompt
 import logging
 
@@ -12,49 +25,148 @@ router = APIRouter()
 # Initialize Gemini service (singleton)
 gemini = GeminiService()
 
+# Largest count asked of the model in one call (the /generate limit)
+SUB_BATCH_SIZE = 5
 
-@router.post("/generate", response_model=ChallengeGenerateResponse)
-async def generate_challenges(request: ChallengeGenerateRequest):
+# Strong references so background derivations are not garbage collected
+_derivation_tasks: Set[asyncio.Task] = set()
+
+
+async def derive_other_languages(challenge: Challenge, language: str, difficulty: str) -> None:
+    """Catalog `challenge` in the other languages where it converts and validates locally."""
+    for target in LANGUAGES:
+        if target == language:
+            continue
+        derived = await convert_challenge(challenge, language, target)
+        if derived is not None:
+            challenge_catalog.add(derived, target, difficulty)
+
+
+def schedule_derivation(challenge: Challenge, language: str, difficulty: str) -> None:
+    """Run derive_other_languages without delaying the response."""
+    task = asyncio.create_task(derive_other_languages(challenge, language, difficulty))
+    _derivation_tasks.add(task)
+    task.add_done_callback(_derivation_tasks.discard)
+
+
+def recent_prompt_titles(request: ChallengeGenerateRequest, batch_titles: List[str]) -> List[str]:
     """
-    POST /api/challenges/generate
-    
-    Generate function-based coding challenges with test cases.
-    Avoids duplicating existing challenge titles.
+    Bounded title list for the prompt: this batch, the client's most recent
+    titles, then recently issued ones, capped at `challenge_prompt_titles`.
     """
-    try:
-        logger.info(f"Generating {request.count} {request.difficulty} challenges for {request.language}")
+    limit = settings.challenge_prompt_titles
+    titles = list(dict.fromkeys(
+        batch_titles
+        + request.existing_titles[::-1]
+        + challenge_index.recent_titles(request.language, request.difficulty, limit)[::-1]
+    ))
+    return titles[:max(limit, len(batch_titles))]
+
+
+async def fill_challenges(
+    request: ChallengeGenerateRequest,
+    batch_titles: List[str],
+    http_request: Optional[Request] = None
+) -> List[Challenge]:
+    """
+    Up to `request.count` new challenges, from the catalog first and then
+    the model. Titles already in `batch_titles` count as duplicates, and
+    accepted titles are appended to it, so callers sharing the list dedupe
+    across their whole batch.
+    """
+    challenges: List[Challenge] = []
+    
+    # Serve what the catalog already has; the model only fills the rest
+    if challenge_catalog is not None and settings.serve_challenges_from_catalog:
+        for challenge in challenge_catalog.pick(
+            request.language, request.difficulty, request.count, request.existing_titles + batch_titles
+        ):
+            if similar_title(challenge.title, request.existing_titles + batch_titles) is None:
+                challenges.append(challenge)
+                batch_titles.append(challenge.title)
+        metrics.increment("challenges.served_from_catalog", len(challenges))
+    
+    # A truncated array still yields its complete items; follow-up calls
+    # only ask for what is missing instead of regenerating the batch.
+    for attempt in range(settings.max_retries + 1):
+        missing = request.count - len(challenges)
+        if missing <= 0:
+            break
+        if attempt:
+            logger.warning(f"⏳ Requesting {missing} missing challenges (follow-up {attempt}/{settings.max_retries})")
+            metrics.increment("challenges.followup_calls")
         
-        # Generate prompt with duplicate avoidance
+        # Generate prompt with duplicate avoidance; only recent titles are
+        # listed, the client's older ones are filtered by find_duplicate
         prompt = get_challenges_prompt(
-            count=request.count,
+            count=missing,
             difficulty=request.difficulty,
             language=request.language,
-            existing_titles=request.existing_titles
+            existing_titles=recent_prompt_titles(request, batch_titles)
         )
         
         # Call Gemini API
-        result = await gemini.generate_json(
+        call = gemini.generate_json(
             prompt=prompt,
             temperature=0.9,  # Higher for creativity
-            max_output_tokens=16384  # Increased for multiple challenges
+            max_output_tokens=16384,  # Increased for multiple challenges
+            operation="challenges",
+            salvage_array=True
         )
+        result = await (run_until_disconnect(http_request, call) if http_request is not None else call)
         
         # Result should be an array of challenges
         if not isinstance(result, list):
             logger.error(f"❌ AI response is not an array. Type: {type(result)}, Value: {result}")
             raise ValueError(f"AI response is not an array. Got type: {type(result).__name__}")
         
-        # Parse challenges
-        try:
-            challenges = [Challenge(**challenge_data) for challenge_data in result]
-        except Exception as parse_error:
-            logger.error(f"❌ Failed to parse challenges: {parse_error}")
-            logger.error(f"Response data: {result}")
-            raise ValueError(f"Failed to parse challenge data: {parse_error}")
-        
+        # Parse challenges, keeping every valid one
+        for challenge_data in result[:missing]:
+            try:
+                challenge = Challenge.model_validate(challenge_data)
+            except Exception as parse_error:
+                logger.warning(f"⚠️ Dropping invalid challenge: {parse_error}")
+                continue
+            # Only what this client already has counts as a duplicate
+            duplicate_of = find_duplicate(challenge, request.existing_titles + batch_titles, challenges)
+            if duplicate_of is not None:
+                logger.warning(f"⚠️ Dropping near-duplicate challenge '{challenge.title}' (of '{duplicate_of}')")
+                metrics.increment("challenges.near_duplicates")
+                continue
+            challenges.append(challenge)
+            batch_titles.append(challenge.title)
+            # Something like it was issued to someone else: fine for this
+            # client, but the catalog already has it
+            if challenge_index.find_issued(challenge, request.language, request.difficulty) is not None:
+                metrics.increment("challenges.catalog_repeats")
+                continue
+            challenge_index.add(challenge, request.language, request.difficulty)
+            if challenge_catalog is not None:
+                challenge_catalog.add(challenge, request.language, request.difficulty)
+                if settings.derive_challenge_languages:
+                    schedule_derivation(challenge, request.language, request.difficulty)
+    
+    if not challenges:
+        raise ValueError("AI response contained no valid challenges")
+    return challenges
+
+
+@router.post("/generate", response_model=ChallengeGenerateResponse)
+async def generate_challenges(request: ChallengeGenerateRequest, http_request: Request):
+    """
+    POST /api/challenges/generate
+    
+    Generate function-based coding challenges with test cases.
+    Avoids duplicating existing challenge titles.
+    """
+    try:
+        logger.info(f"Generating {request.count} {request.difficulty} challenges for {request.language}")
+        challenges = await fill_challenges(request, [], http_request)
         logger.info(f"✅ Generated {len(challenges)} challenges")
-        return ChallengeGenerateResponse(challenges=challenges)
+        return ModelResponse(ChallengeGenerateResponse(challenges=challenges))
     
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail={"error": "client_closed_request", "retryable": False})
     except GeminiServiceError as e:
         raise HTTPException(
             status_code=503 if e.retryable else 500,
@@ -74,3 +186,144 @@ async def generate_challenges(request: ChallengeGenerateRequest):
                 "retryable": True
             }
         )
+
+
+def split_batch(request: ChallengeBatchRequest) -> List[ChallengeGenerateRequest]:
+    """
+    Sub-batches of at most SUB_BATCH_SIZE challenges. Specs for the same
+    language and difficulty are merged first, so their counts are split
+    evenly instead of leaving several small calls.
+    """
+    totals: Dict[Tuple[str, str], int] = {}
+    for spec in request.specs:
+        totals[(spec.language, spec.difficulty)] = totals.get((spec.language, spec.difficulty), 0) + spec.count
+    sub_batches = []
+    for (language, difficulty), total in totals.items():
+        calls = math.ceil(total / SUB_BATCH_SIZE)
+        for i in range(calls):
+            sub_batches.append(ChallengeGenerateRequest(
+                count=total // calls + (1 if i < total % calls else 0),
+                difficulty=difficulty,
+                language=language,
+                existing_titles=request.existing_titles
+            ))
+    return sub_batches
+
+
+@router.post("/generate/batch")
+async def generate_challenge_batch(request: ChallengeBatchRequest):
+    """
+    POST /api/challenges/generate/batch
+    
+    Generate challenges for several (difficulty, language, count) specs.
+    The specs are split into sub-batches that run concurrently, up to
+    `challenge_batch_concurrency` and no more than the API keys can take
+    right now. Titles are deduplicated across the whole batch.
+    
+    Streams newline-delimited JSON, one line per finished sub-batch:
+    `{"type": "challenges", "language", "difficulty", "challenges": [...]}`
+    or `{"type": "error", "language", "difficulty", "error", "message",
+    "retryable"}`, then `{"type": "done", "requested", "generated"}`.
+    """
+    sub_batches = split_batch(request)
+    requested = sum(sub.count for sub in sub_batches)
+    concurrency = max(1, int(min(settings.challenge_batch_concurrency, key_pool.available_calls())))
+    logger.info(f"Generating a batch of {requested} challenges in {len(sub_batches)} calls ({concurrency} at a time)")
+    metrics.increment("challenges.batch.requests")
+    metrics.increment("challenges.batch.sub_batches", len(sub_batches))
+    
+    async def run(sub: ChallengeGenerateRequest, slots: asyncio.Semaphore, titles: List[str]) -> Dict[str, Any]:
+        line: Dict[str, Any] = {"language": sub.language, "difficulty": sub.difficulty}
+        async with slots:
+            try:
+                challenges = await fill_challenges(sub, titles)
+            except GeminiServiceError as e:
+                metrics.increment("challenges.batch.failed_sub_batches")
+                return {"type": "error", **line, "error": "generation_failed", "message": e.message, "retryable": e.retryable}
+            except Exception as e:
+                logger.error(f"Error generating challenge sub-batch: {e}", exc_info=True)
+                metrics.increment("challenges.batch.failed_sub_batches")
+                return {"type": "error", **line, "error": "generation_failed",
+                        "message": "فشل توليد التحديات. حاول مرة أخرى.", "retryable": True}
+        return {"type": "challenges", **line, "challenges": [c.model_dump() for c in challenges]}
+    
+    async def stream():
+        slots = asyncio.Semaphore(concurrency)
+        # One title list per language/difficulty, shared by its sub-batches
+        titles: Dict[Tuple[str, str], List[str]] = {}
+        tasks = [
+            asyncio.create_task(run(sub, slots, titles.setdefault((sub.language, sub.difficulty), [])))
+            for sub in sub_batches
+        ]
+        generated = 0
+        try:
+            for finished in asyncio.as_completed(tasks):
+                line = await finished
+                generated += len(line.get("challenges", ()))
+                yield orjson.dumps(line) + b"\n"
+            logger.info(f"✅ Generated {generated}/{requested} batch challenges")
+            yield orjson.dumps({"type": "done", "requested": requested, "generated": generated}) + b"\n"
+        finally:
+            # The client went away (or the stream failed): stop the remaining calls
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def _require_catalog():
+    if challenge_catalog is None:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "catalog_disabled", "message": "Challenge catalog is not configured", "retryable": False}
+        )
+    return challenge_catalog
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail={"error": "invalid_cursor", "message": "Cursor is malformed; restart from the first page", "retryable": False}
+    )
+
+
+@router.get("/catalog", response_model=ChallengeCatalogPage)
+async def browse_catalog(
+    language: Literal["python", "javascript", "cpp"],
+    difficulty: Optional[Literal["easy", "medium", "hard"]] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, max_length=200)
+):
+    """
+    GET /api/challenges/catalog
+    
+    Newest-first, keyset-paginated list of catalogued challenges.
+    """
+    catalog = _require_catalog()
+    try:
+        challenges, next_cursor = catalog.browse(language, difficulty, limit, cursor)
+    except (ValueError, TypeError, IndexError):
+        raise _invalid_cursor()
+    return ModelResponse(ChallengeCatalogPage(challenges=challenges, next_cursor=next_cursor))
+
+
+@router.get("/catalog/search", response_model=ChallengeCatalogPage)
+async def search_catalog(
+    q: str = Query(..., min_length=1, max_length=200),
+    language: Optional[Literal["python", "javascript", "cpp"]] = None,
+    difficulty: Optional[Literal["easy", "medium", "hard"]] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, max_length=200)
+):
+    """
+    GET /api/challenges/catalog/search
+    
+    Full-text search (Arabic-normalized) over titles and descriptions,
+    title matches first, then newest first, keyset-paginated.
+    """
+    catalog = _require_catalog()
+    try:
+        challenges, next_cursor = catalog.search(q, language, difficulty, limit, cursor)
+    except (ValueError, TypeError, IndexError):
+        raise _invalid_cursor()
+    return ModelResponse(ChallengeCatalogPage(challenges=challenges, next_cursor=next_cursor))
@@ -1,14 +1,52 @@
 """API router for project-related endpoints."""
-from fastapi import APIRouter, HTTPException
-from app.models.requests import ProjectInitRequest, CodeReviewRequest, ChatRequest
-from app.models.responses import ProjectInitResponse, CodeReviewResponse, ChatResponse
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Request, Query, Path, WebSocket
+from app.models.requests import (
+    ProjectInitRequest,
+    ProjectSolutionRequest,
+    CodeReviewRequest,
+    ChatRequest,
+    ChannelChatRequest
+)
+from app.models.responses import (
+    ProjectInitResponse,
+    ProjectPlanResponse,
+    ProjectSolutionResponse,
+    TaskHintResponse,
+    CodeReviewResponse,
+    ChatResponse
+)
+from app.responses import ModelResponse
 from app.services.gemini_service import GeminiService, GeminiServiceError
+from app.services.cancellation import run_until_disconnect, ClientDisconnected
+from app.services.chat_answers import ChatAnswerCache
+from app.services.chat_summaries import ChatSummaries
+from app.services.ide_channel import IdeChannel, ChannelError, serve_channel
+from app.services.review_coalescer import LatestWinsCoalescer
+from app.services.review_cache import ReviewCache, review_cache_key
+from app.services.static_analysis import analyze_code, syntax_error_review
+from app.services.review_sessions import ReviewSessionStore, ReviewSessionError, build_review_diff
+from app.services.mermaid import ChartError, repair_flowchart
+from app.services.metrics import metrics
+from app.services.project_store import SolutionStore
+from app.services.task_hints import TaskHints
+from app.config import settings
 from app.prompts.project_prompts import (
     get_project_init_prompt,
+    get_project_plan_prompt,
+    get_project_solution_prompt,
+    get_mermaid_chart_prompt,
+    get_task_hints_prompt,
+    get_task_hint_prompt,
     get_code_review_prompt,
-    get_chat_prompt
+    get_incremental_review_prompt,
+    get_chat_prompt,
+    get_chat_summary_prompt
 )
+from app.prompts.budget import estimate_tokens
+import asyncio
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -16,9 +54,125 @@ router = APIRouter()
 # Initialize Gemini service (singleton)
 gemini = GeminiService()
 
+# Latest-wins review per IDE session
+review_coalescer = LatestWinsCoalescer(debounce_seconds=settings.review_debounce_seconds)
+
+# Reviews keyed by comment/whitespace-insensitive code fingerprint
+review_cache = ReviewCache(settings.review_cache_size, settings.review_cache_ttl_seconds)
+
+# Per-session code and last review for incremental reviews
+review_sessions = ReviewSessionStore(settings.max_review_sessions, settings.review_session_ttl_seconds)
+
+# Solutions generated in the background after /plan
+solution_store = SolutionStore(settings.max_project_solutions, settings.project_solution_ttl_seconds)
+
+# Per-task hints, prefetched after /init and /plan
+task_hints = TaskHints(
+    settings.max_project_solutions,
+    settings.project_solution_ttl_seconds,
+    concurrency=settings.hint_prefetch_concurrency,
+    min_spare_calls=settings.hint_prefetch_min_spare_calls,
+    max_calls_per_key=settings.hint_prefetch_max_calls_per_key,
+    rate_limit_backoff_seconds=settings.hint_prefetch_rate_limit_backoff_seconds,
+    max_queued=settings.hint_prefetch_max_queued
+)
+
+# Rolling summaries of older chat turns, keyed by history-prefix hash
+chat_summaries = ChatSummaries(
+    settings.chat_summary_cache_size,
+    settings.chat_summary_ttl_seconds,
+    keep=settings.chat_recent_turns,
+    batch=settings.chat_summary_batch,
+    max_fold=settings.chat_summary_max_turns
+)
+
+# Answers to standalone conceptual questions, shared across projects
+chat_answers = ChatAnswerCache(
+    settings.chat_answer_cache_size,
+    min_similarity=settings.chat_answer_min_similarity,
+    min_terms=settings.chat_answer_min_terms
+)
+
+
+async def summarize_turns(previous_summary: Optional[str], turns: List[dict]) -> str:
+    """Background call folding older chat turns into the conversation summary."""
+    return await gemini.generate_text(
+        prompt=get_chat_summary_prompt(previous_summary, turns),
+        temperature=0.3,
+        max_output_tokens=400,
+        operation="chat_summary"
+    )
+
+
+async def ensure_valid_chart(http_request: Request, chart: str, project_title: str, tasks: list, language: str) -> str:
+    """
+    Return `chart` repaired into a flowchart the frontend can render. Only
+    when the defects cannot be repaired deterministically is a new chart
+    (and nothing else) generated; if that fails too, the original is kept.
+    """
+    try:
+        repaired = repair_flowchart(chart)
+    except ChartError as e:
+        logger.warning(f"⚠️ Unrepairable Mermaid chart ({e}), regenerating the chart only")
+        try:
+            regenerated = await run_until_disconnect(http_request, gemini.generate_text(
+                prompt=get_mermaid_chart_prompt(project_title, tasks, language, str(e)),
+                temperature=0.3,
+                max_output_tokens=1024,
+                operation="mermaid_chart"
+            ))
+            repaired = repair_flowchart(regenerated)
+        except (ChartError, GeminiServiceError) as retry_error:
+            logger.error(f"❌ Mermaid chart regeneration failed: {retry_error}")
+            metrics.increment("mermaid.unrepaired")
+            return chart
+        metrics.increment("mermaid.regenerated")
+        return repaired.chart
+    if repaired.fixes:
+        metrics.increment("mermaid.repaired")
+        for fix in repaired.fixes:
+            metrics.increment(f"mermaid.fixes.{fix}")
+        logger.info(f"🔧 Repaired Mermaid chart: {', '.join(repaired.fixes)}")
+    else:
+        metrics.increment("mermaid.valid")
+    return repaired.chart
+
+
+async def prefetch_task_hints(project: dict) -> List[str]:
+    """Background call generating the hints of every task of a project."""
+    result = await gemini.generate_json(
+        prompt=get_task_hints_prompt(project["title"], project["tasks"], project["language"], project["level"]),
+        temperature=0.7,
+        max_output_tokens=256 + 160 * len(project["tasks"]),
+        operation="task_hints"
+    )
+    hints = result.get("hints") if isinstance(result, dict) else None
+    if not isinstance(hints, list):
+        raise ValueError("AI response has no hints list")
+    return hints
+
+
+async def generate_task_hint(project: dict, task_index: int) -> str:
+    """On-demand hint for one task that was not prefetched."""
+    return await gemini.generate_text(
+        prompt=get_task_hint_prompt(
+            project["title"], project["tasks"], task_index, project["language"], project["level"]
+        ),
+        temperature=0.7,
+        max_output_tokens=300,
+        operation="task_hint"
+    )
+
+
+def start_task_hints(project_id: str, title: str, tasks: List[str], language: str, level: str) -> None:
+    """Register a new project for hints and, if enabled, prefetch them in the background."""
+    task_hints.register(project_id, title, tasks, language, level)
+    if settings.prefetch_task_hints:
+        task_hints.prefetch(project_id, prefetch_task_hints)
+
 
 @router.post("/init", response_model=ProjectInitResponse)
-async def initialize_project(request: ProjectInitRequest):
+async def initialize_project(request: ProjectInitRequest, http_request: Request):
     """
     POST /api/project/init
     
@@ -36,11 +190,12 @@ async def initialize_project(request: ProjectInitRequest):
         prompt = get_project_init_prompt(request.idea, request.language, request.level)
         
         # Call Gemini API with high token limit for complete project generation
-        result = await gemini.generate_json(
+        result = await run_until_disconnect(http_request, gemini.generate_json(
             prompt=prompt,
             temperature=0.7,
-            max_output_tokens=30000  # High limit for complete project generation
-        )
+            max_output_tokens=30000,  # High limit for complete project generation
+            operation="project_init"
+        ))
         
         # Validate response structure
         required_keys = ["project_title", "mermaid_chart", "tasks", "full_solution_code", "starter_filename"]
@@ -60,16 +215,25 @@ async def initialize_project(request: ProjectInitRequest):
             logger.error("❌ Empty mermaid_chart")
             raise ValueError("Mermaid chart cannot be empty")
         
+        result["mermaid_chart"] = await ensure_valid_chart(
+            http_request, result["mermaid_chart"], result["project_title"], result["tasks"], request.language
+        )
+        
         if not result.get("full_solution_code") or not result.get("full_solution_code").strip():
             logger.error("❌ Empty full_solution_code")
             raise ValueError("Full solution code cannot be empty")
         
         logger.info(f"✅ Project initialized: {result['project_title']}")
-        logger.debug(f"Response keys: {list(result.keys())}")
-        logger.debug(f"Tasks count: {len(result.get('tasks', []))}")
+        logger.debug("Response keys: %s", list(result))
+        logger.debug("Tasks count: %d", len(result.get("tasks", [])))
         
-        return ProjectInitResponse(**result)
+        # Validated once here; ModelResponse skips FastAPI's re-validation
+        project = ProjectInitResponse.model_validate({**result, "project_id": uuid.uuid4().hex})
+        start_task_hints(project.project_id, project.project_title, project.tasks, request.language, request.level)
+        return ModelResponse(project)
     
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail={"error": "client_closed_request", "retryable": False})
     except GeminiServiceError as e:
         logger.error(f"Gemini service error: {e.message}")
         raise HTTPException(
@@ -92,36 +256,317 @@ async def initialize_project(request: ProjectInitRequest):
         )
 
 
-@router.post("/review", response_model=CodeReviewResponse)
-async def review_code(request: CodeReviewRequest):
+def start_solution(project_id: str, plan: ProjectSolutionRequest) -> None:
+    """Generate the solution for `plan` in the background under `project_id`."""
+    async def generate_solution() -> str:
+        solution = await gemini.generate_json(
+            prompt=get_project_solution_prompt(
+                idea=plan.idea or plan.project_title,
+                language=plan.language,
+                level=plan.level,
+                project_title=plan.project_title,
+                tasks=plan.tasks,
+                starter_filename=plan.starter_filename
+            ),
+            temperature=0.7,
+            max_output_tokens=16384,
+            operation="project_solution"
+        )
+        code = solution.get("full_solution_code") if isinstance(solution, dict) else None
+        if not code or not code.strip():
+            raise ValueError("Full solution code cannot be empty")
+        return code
+    
+    solution_store.start(project_id, generate_solution, "فشل في توليد الحل. حاول مرة أخرى.")
+
+
+def solution_response(project_id: str, record: dict) -> ModelResponse:
+    """A SolutionStore record as the /solution response."""
+    return ModelResponse(ProjectSolutionResponse(
+        project_id=project_id,
+        status=record["status"],
+        full_solution_code=record["code"],
+        message=record["message"]
+    ))
+
+
+@router.post("/plan", response_model=ProjectPlanResponse)
+async def plan_project(request: ProjectInitRequest, http_request: Request):
     """
-    POST /api/project/review
+    POST /api/project/plan
     
-    Comprehensive code review that provides direct feedback on
-    what's correct, what's wrong, and what needs to be done.
+    Staged alternative to /init. Returns the project title, Mermaid
+    flowchart, tasks and filename from a small, fast generation, then
+    generates the full solution in the background. Fetch it later from
+    GET /api/project/{project_id}/solution.
     """
     try:
-        logger.info(f"Reviewing code for: {request.project_context.title}")
+        logger.info(f"Planning project: {request.idea} ({request.language}, {request.level})")
         
+        prompt = get_project_plan_prompt(request.idea, request.language, request.level)
+        result = await run_until_disconnect(http_request, gemini.generate_json(
+            prompt=prompt,
+            temperature=0.7,
+            max_output_tokens=4096,
+            operation="project_plan"
+        ))
+        
+        # Validate response structure
+        required_keys = ["project_title", "mermaid_chart", "tasks", "starter_filename"]
+        missing_keys = [key for key in required_keys if key not in result]
+        if missing_keys:
+            logger.error(f"❌ Missing required keys in AI plan: {missing_keys}")
+            raise ValueError(f"Missing required keys in AI plan: {missing_keys}. Available: {list(result.keys())}")
+        
+        if not isinstance(result.get("tasks"), list) or len(result.get("tasks", [])) == 0:
+            logger.error(f"❌ Invalid tasks: {result.get('tasks')}")
+            raise ValueError("Tasks must be a non-empty list")
+        
+        if not result.get("mermaid_chart") or not result.get("mermaid_chart").strip():
+            logger.error("❌ Empty mermaid_chart")
+            raise ValueError("Mermaid chart cannot be empty")
+        
+        result["mermaid_chart"] = await ensure_valid_chart(
+            http_request, result["mermaid_chart"], result["project_title"], result["tasks"], request.language
+        )
+        
+        project_id = uuid.uuid4().hex
+        plan = ProjectPlanResponse.model_validate({"project_id": project_id, **{key: result[key] for key in required_keys}})
+        
+        start_solution(
+            project_id,
+            ProjectSolutionRequest(
+                idea=request.idea,
+                language=request.language,
+                level=request.level,
+                project_title=plan.project_title,
+                tasks=plan.tasks,
+                starter_filename=plan.starter_filename
+            )
+        )
+        start_task_hints(project_id, plan.project_title, plan.tasks, request.language, request.level)
+        logger.info(f"✅ Project planned: {plan.project_title} ({project_id}), solution generating")
+        return ModelResponse(plan)
+    
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail={"error": "client_closed_request", "retryable": False})
+    except GeminiServiceError as e:
+        logger.error(f"Gemini service error: {e.message}")
+        raise HTTPException(
+            status_code=503 if e.retryable else 500,
+            detail={
+                "error": "ai_generation_failed",
+                "message": e.message,
+                "retryable": e.retryable
+            }
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error in project plan: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "internal_error",
+                "message": "فشل في توليد المشروع. حاول مرة أخرى.",
+                "retryable": True
+            }
+        )
+
+
+@router.get("/{project_id}/solution", response_model=ProjectSolutionResponse)
+async def get_project_solution(
+    project_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Seconds to wait for a pending solution")
+):
+    """
+    GET /api/project/{project_id}/solution
+    
+    Serve the solution generated after /plan. With `wait`, a pending
+    solution is awaited for up to that many seconds before answering.
+    """
+    record = await solution_store.wait(project_id, wait) if wait else solution_store.get(project_id)
+    if record is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "error": "project_not_found",
+                "message": "المشروع غير موجود أو انتهت صلاحيته.",
+                "retryable": False
+            }
+        )
+    return solution_response(project_id, record)
+
+
+@router.post("/{project_id}/solution", response_model=ProjectSolutionResponse)
+async def regenerate_project_solution(
+    request: ProjectSolutionRequest,
+    project_id: str = Path(..., max_length=64)
+):
+    """
+    POST /api/project/{project_id}/solution
+    
+    Generate the solution again when it failed, or when the server no
+    longer knows the project (restart, expiry, eviction), from the plan
+    the client saved. A pending or ready solution is returned as is.
+    Poll GET /{project_id}/solution for the result.
+    """
+    record = solution_store.get(project_id)
+    if record is None or record["status"] == "failed":
+        logger.info(f"🔁 Regenerating solution for {project_id}")
+        metrics.increment("project.solution.regenerated")
+        start_solution(project_id, request)
+        record = solution_store.get(project_id)
+    return solution_response(project_id, record)
+
+
+@router.get("/{project_id}/hints/{task_index}", response_model=TaskHintResponse)
+async def get_task_hint(
+    http_request: Request,
+    project_id: str = Path(..., max_length=64),
+    task_index: int = Path(..., ge=0, description="0-based task index")
+):
+    """
+    GET /api/project/{project_id}/hints/{task_index}
+    
+    A short Socratic hint for starting a task. Hints prefetched after
+    /init or /plan are served instantly; otherwise the hint is generated
+    now and kept for the next request.
+    """
+    try:
+        hint = await run_until_disconnect(http_request, task_hints.get(
+            project_id, task_index, generate_task_hint, settings.hint_prefetch_wait_seconds
+        ))
+    except IndexError:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "task_not_found", "message": "المهمة غير موجودة في هذا المشروع.", "retryable": False}
+        )
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail={"error": "client_closed_request", "retryable": False})
+    except GeminiServiceError as e:
+        raise HTTPException(
+            status_code=503 if e.retryable else 500,
+            detail={"error": "hint_failed", "message": e.message, "retryable": e.retryable}
+        )
+    if hint is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "error": "project_not_found",
+                "message": "المشروع غير موجود أو انتهت صلاحيته.",
+                "retryable": False
+            }
+        )
+    return ModelResponse(TaskHintResponse(project_id=project_id, task_index=task_index, hint=hint))
+
+
+async def run_review(request: CodeReviewRequest) -> CodeReviewResponse:
+    """Review the session's code after applying `request` (POST /review and the IDE channel)."""
+    session = review_sessions.apply(request)
+    code = session.code
+    version = session.version
+    logger.info(f"Reviewing code for: {session.title}")
+    
+    # Resubmissions that differ only in formatting/comments are served from cache
+    cache_key, code_tokens = review_cache_key(
+        code,
+        session.language,
+        session.tasks,
+        session.current_task_index
+    )
+    cached = review_cache.get(cache_key, code_tokens)
+    if cached is not None:
+        logger.info("✅ Review served from cache")
+        review_sessions.record_review(session, code, cached)
+        return cached.model_copy(update={"code_version": version})
+    
+    # Code that does not parse/compile gets an instant local review
+    analysis = await analyze_code(code, session.language)
+    if analysis.errors:
+        logger.info(f"⚡ Syntax error found locally ({analysis.checker}), skipping AI review")
+        review = syntax_error_review(analysis).model_copy(update={"code_version": version})
+        review_sessions.record_review(session, code, review)
+        return review
+    
+    # Follow-up reviews only send the diff since the last reviewed code
+    code_diff = None
+    if session.reviewed_code is not None:
+        code_diff = build_review_diff(session.reviewed_code, code)
+    
+    if code_diff is not None:
+        prompt = get_incremental_review_prompt(
+            code_diff=code_diff,
+            language=session.language,
+            project_title=session.title,
+            tasks=session.tasks,
+            current_task_index=session.current_task_index,
+            previous_review_summary=session.review_summary(),
+            total_lines=code.count("\n") + 1,
+            diagnostics=analysis.summary()
+        )
+        metrics.increment("review.incremental")
+    else:
         # Generate Socratic review prompt
         prompt = get_code_review_prompt(
-            code=request.code,
-            language=request.language,
-            project_title=request.project_context.title,
-            tasks=request.project_context.tasks,
-            current_task_index=request.project_context.current_task_index,
-            previous_review=request.previous_review
+            code=code,
+            language=session.language,
+            project_title=session.title,
+            tasks=session.tasks,
+            current_task_index=session.current_task_index,
+            previous_review=session.review_summary(),
+            diagnostics=analysis.summary(),
+            focus_lines=[d.line for d in analysis.diagnostics if d.line]
         )
-        
-        # Call Gemini API
+        metrics.increment("review.full")
+    metrics.observe("review.prompt_chars", len(prompt))
+    metrics.observe("review.prompt_tokens", estimate_tokens(prompt))
+    
+    # Call Gemini API
+    async def generate_review():
         result = await gemini.generate_json(
             prompt=prompt,
             temperature=0.8,  # Higher for varied questioning
-            max_output_tokens=2048  # Increased from 500 to handle longer responses
+            max_output_tokens=2048,  # Increased from 500 to handle longer responses
+            operation="code_review"
         )
-        
-        return CodeReviewResponse(**result)
+        review = CodeReviewResponse.model_validate(result).model_copy(update={"code_version": version})
+        review_cache.set(cache_key, code_tokens, review)
+        review_sessions.record_review(session, code, review)
+        return review
+    
+    # Rapid submissions from the same session collapse into one call
+    if request.session_id:
+        work = review_coalescer.submit(request.session_id, generate_review)
+    else:
+        work = generate_review()
+    return await work
+
+
+@router.post("/review", response_model=CodeReviewResponse)
+async def review_code(request: CodeReviewRequest, http_request: Request):
+    """
+    POST /api/project/review
     
+    Comprehensive code review that provides direct feedback on
+    what's correct, what's wrong, and what needs to be done.
+    Reviews sharing a session_id are latest-wins: a newer submission
+    supersedes the in-flight one and all callers get the newest review.
+    Sessions keep the code and last review server-side, so follow-up
+    requests may send only code_edits and the prompt carries only the diff.
+    """
+    try:
+        return ModelResponse(await run_until_disconnect(http_request, run_review(request)))
+    
+    except ReviewSessionError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail={
+                "error": "review_session_out_of_sync" if e.status_code == 409 else "invalid_code_edits",
+                "message": e.message,
+                "retryable": False
+            }
+        )
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail={"error": "client_closed_request", "retryable": False})
     except GeminiServiceError as e:
         raise HTTPException(
             status_code=503 if e.retryable else 500,
@@ -144,7 +589,7 @@ async def review_code(request: CodeReviewRequest):
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_with_mentor(request: ChatRequest):
+async def chat_with_mentor(request: ChatRequest, http_request: Request):
     """
     POST /api/project/chat
     
@@ -154,24 +599,51 @@ async def chat_with_mentor(request: ChatRequest):
     try:
         logger.info(f"Chat request for: {request.project_title}")
         
-        # Generate chat prompt
+        # Common conceptual questions are answered from earlier answers
+        terms = chat_answers.terms(request.message, request.current_code)
+        cached = chat_answers.lookup(terms, request.language)
+        if cached is not None:
+            return ModelResponse(ChatResponse(response=cached, suggested_reading=None))
+        
+        # Older turns are replaced by their cached summary, when there is one
+        context = chat_summaries.prepare(
+            [msg.model_dump() for msg in request.history],
+            summarize_turns,
+            request.summary_hash or "",
+            request.summary
+        )
+        
+        # A standalone question is answered without the student's code or
+        # conversation: the answer may be served to other students later
+        standalone = terms is not None
         prompt = get_chat_prompt(
             message=request.message,
             language=request.language,
             project_title=request.project_title,
-            history=[msg.dict() for msg in request.history],
-            current_code=request.current_code
+            history=[] if standalone else context.recent,
+            current_code=None if standalone else request.current_code,
+            summary=None if standalone else context.summary
         )
+        metrics.observe("chat.prompt_tokens", estimate_tokens(prompt))
         
         # Call Gemini API (text mode, not JSON)
-        response_text = await gemini.generate_text(
+        response_text = await run_until_disconnect(http_request, gemini.generate_text(
             prompt=prompt,
             temperature=0.7,
-            max_output_tokens=800
-        )
+            max_output_tokens=800,
+            operation="chat"
+        ))
+        chat_answers.store(terms, request.language, response_text, request.project_title)
         
-        return ChatResponse(response=response_text, suggested_reading=None)
+        response = ChatResponse(response=response_text, suggested_reading=None)
+        if context.covered:
+            # The client sends these back with the turns after them next time
+            response.summary_hash, response.summary = context.covered_hash, context.summary
+            response.summary_turns = context.covered
+        return ModelResponse(response)
     
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail={"error": "client_closed_request", "retryable": False})
     except GeminiServiceError as e:
         raise HTTPException(
             status_code=503 if e.retryable else 500,
@@ -191,3 +663,154 @@ async def chat_with_mentor(request: ChatRequest):
                 "retryable": True
             }
         )
+
+
+# Turns a channel keeps while they wait to be summarised
+MAX_CHANNEL_TURNS = 200
+
+
+async def stream_chat_answer(
+    channel: IdeChannel,
+    message_id: str,
+    message: str,
+    language: str,
+    project_title: str,
+    current_code: Optional[str],
+    session,
+    standalone: bool = False
+) -> str:
+    """
+    Stream a generated answer as `chunk` frames, with the channel's history
+    as context unless the question is `standalone` (its answer is shared).
+    """
+    state = channel.state
+    history = state["history"]
+    context = chat_summaries.prepare(history, summarize_turns, state["summary_hash"], state["summary"])
+    if context.covered:
+        # The summary stands in for these turns from now on
+        del history[:context.covered]
+        state["summary_hash"], state["summary"] = context.covered_hash, context.summary
+        state["covered"] += context.covered
+        if state["covered"] <= state["seed_turns"]:
+            # Still inside the history the client seeded with: it can map this back
+            state["anchor"] = (context.covered_hash, context.summary, state["covered"])
+    if standalone:
+        prompt = get_chat_prompt(message=message, language=language, project_title=project_title, history=[])
+    else:
+        prompt = get_chat_prompt(
+            message=message,
+            language=language,
+            project_title=project_title,
+            history=context.recent,
+            current_code=current_code,
+            current_task=session.tasks[session.current_task_index]
+            if session and 0 <= session.current_task_index < len(session.tasks) else None,
+            summary=context.summary
+        )
+    metrics.observe("chat.prompt_tokens", estimate_tokens(prompt))
+    parts = []
+    try:
+        async for chunk in gemini.stream_text(
+            prompt=prompt,
+            temperature=0.7,
+            max_output_tokens=800,
+            operation="chat"
+        ):
+            parts.append(chunk)
+            await channel.send_chunk(message_id, chunk)
+    except GeminiServiceError as e:
+        raise ChannelError("chat_failed", e.message, e.retryable)
+    return "".join(parts).strip()
+
+
+async def answer_channel_chat(
+    channel: IdeChannel,
+    message_id: str,
+    request: ChannelChatRequest,
+    session,
+    language: str,
+    project_title: str
+) -> None:
+    """Answer one chat message on a seeded channel and record the exchange."""
+    state = channel.state
+    current_code = request.current_code or (session.code if session else None)
+    terms = chat_answers.terms(request.message, current_code)
+    response = chat_answers.lookup(terms, language)
+    if response is not None:
+        await channel.send_chunk(message_id, response)
+    else:
+        response = await stream_chat_answer(
+            channel, message_id, request.message, language, project_title, current_code, session,
+            standalone=terms is not None
+        )
+        chat_answers.store(terms, language, response, project_title)
+    history = state["history"]
+    history.append({"role": "user", "content": request.message})
+    history.append({"role": "assistant", "content": response})
+    if len(history) > MAX_CHANNEL_TURNS:
+        # Summaries have fallen far behind (they keep failing); bound memory.
+        # Later summaries skip the dropped turns, so they no longer map onto the seed
+        del history[:-MAX_CHANNEL_TURNS]
+        state["seed_turns"] = 0
+    result = ChatResponse(response=response)
+    if state["anchor"]:
+        result.summary_hash, result.summary, result.summary_turns = state["anchor"]
+    await channel.send_result(message_id, result.model_dump())
+
+
+async def channel_chat(channel: IdeChannel, message_id: str, frame: dict) -> None:
+    """`chat` message: stream the answer and keep the exchange in the channel's history."""
+    request = ChannelChatRequest.model_validate(frame)
+    session = review_sessions.get(channel.session_id)
+    language = request.language or (session.language if session else None)
+    project_title = request.project_title or (session.title if session else None)
+    if language is None or project_title is None:
+        raise ChannelError(
+            "missing_context",
+            "Send language and project_title, or review code on this session first"
+        )
+    state = channel.state
+    # One chat at a time per channel: turns are kept in the order they were
+    # asked, and each answer has the previous exchanges as context
+    async with state.setdefault("chat_lock", asyncio.Lock()):
+        seeding = "history" not in state
+        if seeding:
+            state["history"] = [msg.model_dump() for msg in request.history]
+            state["summary_hash"], state["summary"] = request.summary_hash or "", request.summary
+            state["seed_turns"], state["covered"], state["anchor"] = len(request.history), 0, None
+        try:
+            await answer_channel_chat(channel, message_id, request, session, language, project_title)
+        except BaseException:
+            if seeding:
+                # The client only counts the seed as sent once a chat succeeds
+                for key in ("history", "summary_hash", "summary", "seed_turns", "covered", "anchor"):
+                    state.pop(key, None)
+            raise
+
+
+async def channel_review(channel: IdeChannel, message_id: str, frame: dict) -> None:
+    """`review` message: a CodeReviewRequest on the channel's session."""
+    request = CodeReviewRequest.model_validate({**frame, "session_id": channel.session_id})
+    try:
+        review = await run_review(request)
+    except ReviewSessionError as e:
+        raise ChannelError(
+            "review_session_out_of_sync" if e.status_code == 409 else "invalid_code_edits",
+            e.message
+        )
+    except GeminiServiceError as e:
+        raise ChannelError("review_failed", e.message, e.retryable)
+    await channel.send_result(message_id, review.model_dump())
+
+
+@router.websocket("/session/{session_id}")
+async def ide_session(websocket: WebSocket, session_id: str = Path(..., max_length=100)):
+    """
+    WS /api/project/session/{session_id}
+    
+    One connection per IDE session carrying both chat and review messages,
+    so the context stays server-side between them. Chat answers stream as
+    `chunk` frames; any message can be cancelled by its id. The frame
+    protocol is described on IdeChannel.
+    """
+    await serve_channel(websocket, session_id, {"chat": channel_chat, "review": channel_review})
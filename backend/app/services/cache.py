@@ -0,0 +1,90 @@
+"""Bounded TTL cache with hit/miss metrics, in-process or shared across workers."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+from app.services.metrics import metrics
+from app.services.shared_store import shared_store
+from app.services.shutdown import register_snapshot
+
+
+class TTLCache:
+    """
+    LRU cache whose entries expire `ttl_seconds` after being stored.
+    
+    When a shared store is configured (multi-worker mode) entries live there
+    instead, so every worker sees them; values must then be picklable and are
+    copies, so mutated values have to be `set` again.
+    
+    With `persist`, in-process entries are saved at shutdown and restored
+    at startup, so a restart does not start from a cold cache.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl_seconds: float, persist: bool = False):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._shared = shared_store
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        if persist and shared_store is None:
+            register_snapshot(f"cache:{name}", self.export, self.restore)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for `key`, or None on miss/expiry."""
+        if self._shared is not None:
+            value = self._shared.get(f"cache:{self.name}:{key}")
+            metrics.increment(f"cache.{self.name}.{'hits' if value is not None else 'misses'}")
+            return value
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                metrics.increment(f"cache.{self.name}.misses")
+                return None
+            self._entries.move_to_end(key)
+            metrics.increment(f"cache.{self.name}.hits")
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store `value` under `key`, evicting the least recently used entry if full."""
+        if self.maxsize <= 0:
+            return
+        if self._shared is not None:
+            self._shared.set(f"cache:{self.name}:{key}", value, self.ttl_seconds)
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        if self._shared is not None:
+            self._shared.delete_prefix(f"cache:{self.name}:")
+        with self._lock:
+            self._entries.clear()
+
+    def export(self) -> List[Tuple[Hashable, float, Any]]:
+        """Live entries as (key, wall-clock expiry, value), least recently used first."""
+        offset = time.time() - time.monotonic()
+        with self._lock:
+            now = time.monotonic()
+            return [(key, expires + offset, value) for key, (expires, value) in self._entries.items() if expires > now]
+
+    def restore(self, entries: List[Tuple[Hashable, float, Any]]) -> None:
+        """Add entries from `export`, skipping the ones that expired meanwhile."""
+        offset = time.time() - time.monotonic()
+        with self._lock:
+            for key, expires, value in entries:
+                if expires > time.time() and key not in self._entries:
+                    self._entries[key] = (expires - offset, value)
+                    self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,44 @@
+"""Cancel in-flight AI work when the HTTP client goes away."""
+import asyncio
+import logging
+from typing import Awaitable, TypeVar
+from fastapi import Request
+from app.config import settings
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client closed the connection before the result was ready."""
+
+
+async def run_until_disconnect(http_request: Request, work: Awaitable[T]) -> T:
+    """
+    Await `work` while polling the client connection.
+    
+    Uvicorn does not cancel handlers when a client disconnects, so without this
+    a closed tab keeps a generation (and its retries) running to completion.
+    On disconnect the work task is cancelled, which aborts retry sleeps and the
+    in-flight Gemini request, and ClientDisconnected is raised.
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.disconnect_poll_interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.info(f"🔌 Client disconnected from {http_request.url.path}, cancelling generation")
+                metrics.increment("client_disconnects")
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+                raise ClientDisconnected(http_request.url.path)
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,233 @@
+"""Persistent catalog of generated challenges (SQLite with FTS5 search)."""
+import base64
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+from app.config import settings
+from app.models.responses import Challenge, CatalogChallenge
+from app.services.challenge_index import normalize_text
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = "id, title, description, function_signature, test_cases"
+
+
+def encode_cursor(*values) -> str:
+    """Opaque keyset cursor for the last row of a page."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> list:
+    """Inverse of encode_cursor; raises ValueError on malformed input."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def fts_query(text: str) -> Optional[str]:
+    """Normalized prefix query matching every word of `text` (None if no words)."""
+    words = normalize_text(text).split()
+    return " ".join(f'"{word}"*' for word in words) if words else None
+
+
+class ChallengeCatalog:
+    """
+    Every challenge the service has issued, queryable without the model.
+
+    Rows are unique per language/difficulty/title and browsed newest first
+    by keyset (id) pagination; search goes through a contentless FTS5 table
+    holding the Arabic-normalized title and description. Search pages on a
+    key that depends only on each row (title match first, then newest), not
+    on bm25, whose scores shift whenever rows are added, so paging through
+    results never skips or repeats one. All workers share the file, and
+    each statement is a short indexed query run inline.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS challenges (
+                id INTEGER PRIMARY KEY,
+                language TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                function_signature TEXT NOT NULL,
+                test_cases TEXT NOT NULL,
+                created REAL NOT NULL,
+                UNIQUE (language, difficulty, title)
+            );
+            CREATE INDEX IF NOT EXISTS challenges_bucket ON challenges (language, difficulty, id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS challenges_fts USING fts5(title, description, content='');
+        """)
+        logger.info(f"📚 Challenge catalog: {path}")
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread and process (never reuse one across fork)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def add(self, challenge: Challenge, language: str, difficulty: str) -> None:
+        """Store `challenge` unless one with the same title is already catalogued."""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO challenges "
+                "(language, difficulty, title, description, function_signature, test_cases, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    language,
+                    difficulty,
+                    challenge.title,
+                    challenge.description,
+                    challenge.function_signature,
+                    json.dumps([t.model_dump() for t in challenge.test_cases], ensure_ascii=False),
+                    time.time()
+                )
+            )
+            if cursor.rowcount:
+                conn.execute(
+                    "INSERT INTO challenges_fts (rowid, title, description) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, normalize_text(challenge.title), normalize_text(challenge.description))
+                )
+                metrics.increment("catalog.added")
+
+    def browse(
+        self,
+        language: str,
+        difficulty: Optional[str],
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[CatalogChallenge], Optional[str]]:
+        """Newest-first page for a language (and difficulty) plus the next-page cursor."""
+        before_id = int(decode_cursor(cursor)[0]) if cursor else None
+        where = ["language = ?"]
+        params: list = [language]
+        if difficulty:
+            where.append("difficulty = ?")
+            params.append(difficulty)
+        if before_id is not None:
+            where.append("id < ?")
+            params.append(before_id)
+        rows = self._conn().execute(
+            f"SELECT {_COLUMNS} FROM challenges WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+        page = [self._row(row) for row in rows[:limit]]
+        return page, encode_cursor(page[-1].id) if len(rows) > limit else None
+
+    def search(
+        self,
+        query: str,
+        language: Optional[str],
+        difficulty: Optional[str],
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[CatalogChallenge], Optional[str]]:
+        """
+        Matches whose title has every word first, then the rest; newest
+        first within each. Returns the page plus the next-page cursor.
+        """
+        match = fts_query(query)
+        if match is None:
+            return [], None
+        where = []
+        params: list = [f"title : ({match})", match]
+        if language:
+            where.append("c.language = ?")
+            params.append(language)
+        if difficulty:
+            where.append("c.difficulty = ?")
+            params.append(difficulty)
+        if cursor:
+            after_tier, after_id = decode_cursor(cursor)
+            where.append("(h.tier > ? OR (h.tier = ? AND c.id < ?))")
+            params.extend([int(after_tier), int(after_tier), int(after_id)])
+        rows = self._conn().execute(
+            f"WITH titled AS (SELECT rowid FROM challenges_fts WHERE challenges_fts MATCH ?), "
+            f"hits AS (SELECT rowid AS id, rowid NOT IN titled AS tier "
+            f"FROM challenges_fts WHERE challenges_fts MATCH ?) "
+            f"SELECT {', '.join('c.' + column for column in _COLUMNS.split(', '))}, h.tier "
+            f"FROM hits h JOIN challenges c ON c.id = h.id "
+            f"{'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY h.tier, c.id DESC LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+        page = [self._row(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(rows[limit - 1][5], rows[limit - 1][0]) if len(rows) > limit else None
+        return page, next_cursor
+
+    def pick(
+        self,
+        language: str,
+        difficulty: str,
+        count: int,
+        exclude_titles: List[str]
+    ) -> List[CatalogChallenge]:
+        """
+        Up to `count` catalogued challenges whose titles are not excluded.
+
+        Starts at a random id and walks the (language, difficulty, id) index,
+        wrapping around once, so no sort over the whole bucket is needed.
+        """
+        excluded = {normalize_text(title) for title in exclude_titles}
+        conn = self._conn()
+        bounds = conn.execute(
+            "SELECT MIN(id), MAX(id) FROM challenges WHERE language = ? AND difficulty = ?",
+            (language, difficulty)
+        ).fetchone()
+        if bounds[0] is None:
+            return []
+        start = random.randint(bounds[0], bounds[1])
+        picked: List[CatalogChallenge] = []
+        for low, high in ((start, bounds[1]), (bounds[0], start - 1)):
+            after = low - 1
+            while len(picked) < count and after < high:
+                rows = conn.execute(
+                    f"SELECT {_COLUMNS} FROM challenges WHERE language = ? AND difficulty = ? "
+                    f"AND id > ? AND id <= ? ORDER BY id LIMIT ?",
+                    (language, difficulty, after, high, count * 4)
+                ).fetchall()
+                if not rows:
+                    break
+                after = rows[-1][0]
+                picked.extend(
+                    self._row(row) for row in rows
+                    if normalize_text(row[1]) not in excluded
+                )
+        return picked[:count]
+
+    @staticmethod
+    def _row(row: tuple) -> CatalogChallenge:
+        return CatalogChallenge(
+            id=row[0],
+            title=row[1],
+            description=row[2],
+            function_signature=row[3],
+            test_cases=json.loads(row[4])
+        )
+
+
+challenge_catalog: Optional[ChallengeCatalog] = (
+    ChallengeCatalog(settings.challenge_catalog_path) if settings.challenge_catalog_path else None
+)
@@ -0,0 +1,578 @@
+"""
+Derive a challenge in another language from an existing one.
+
+Function signatures and test calls only use a handful of literal types
+(int, float, bool, string and homogeneous lists of those), so they can be
+translated deterministically instead of asking the model again. Each
+derived challenge is checked with the local toolchain: the test calls must
+compile against the derived signature, and the expected outputs are printed
+by the target runtime itself, exactly as the challenge runner will compare
+them.
+"""
+import ast
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+from typing import Any, List, NamedTuple, Optional, Tuple, Union
+from app.models.responses import Challenge, TestCase
+from app.services.metrics import metrics
+from app.services.static_analysis import run_process
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ("python", "javascript", "cpp")
+
+_RESERVED = {
+    "python": {
+        "False", "None", "True", "and", "as", "assert", "async", "await", "break", "class", "continue",
+        "def", "del", "elif", "else", "except", "finally", "for", "from", "global", "if", "import", "in",
+        "is", "lambda", "nonlocal", "not", "or", "pass", "raise", "return", "try", "while", "with", "yield"
+    },
+    "javascript": {
+        "await", "break", "case", "catch", "class", "const", "continue", "debugger", "default", "delete",
+        "do", "else", "enum", "export", "extends", "false", "finally", "for", "function", "if", "import",
+        "in", "instanceof", "let", "new", "null", "return", "super", "switch", "this", "throw", "true",
+        "try", "typeof", "var", "void", "while", "with", "yield", "arguments", "eval"
+    },
+    "cpp": {
+        "auto", "bool", "break", "case", "catch", "char", "class", "const", "continue", "default", "delete",
+        "do", "double", "else", "enum", "explicit", "extern", "false", "float", "for", "friend", "goto",
+        "if", "inline", "int", "long", "namespace", "new", "operator", "private", "protected", "public",
+        "register", "return", "short", "signed", "sizeof", "static", "struct", "switch", "template", "this",
+        "throw", "true", "try", "typedef", "typename", "union", "unsigned", "using", "virtual", "void",
+        "volatile", "while", "and", "or", "not", "xor", "string", "vector", "main", "std", "cout", "endl"
+    },
+}
+
+_INT32_MAX = 2 ** 31 - 1
+
+# Value types: "int" | "float" | "bool" | "str" | ("list", element type or None if unknown)
+ValueType = Union[str, Tuple[str, Any]]
+
+
+class ConversionError(Exception):
+    """Challenge uses something outside the convertible subset."""
+
+
+class FunctionSpec(NamedTuple):
+    """Language-neutral view of a challenge's function."""
+    name: str
+    params: List[str]
+    param_types: List[Optional[ValueType]]
+    return_type: Optional[ValueType]
+
+
+# ---------------------------------------------------------------------------
+# Literal parsing (shared by Python, JavaScript and C++ call syntax)
+# ---------------------------------------------------------------------------
+
+_NUMBER = re.compile(r"-?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?")
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "0": "\0", "\\": "\\", "'": "'", '"': '"'}
+_BOOLEANS = {
+    "python": {"True": True, "False": False},
+    "javascript": {"true": True, "false": False},
+    "cpp": {"true": True, "false": False},
+}
+
+
+class _LiteralParser:
+    """Recursive-descent parser for the literal subset of the three languages."""
+
+    def __init__(self, text: str, language: str):
+        self.text = text
+        self.language = language
+        self.pos = 0
+
+    def skip_space(self) -> None:
+        while self.pos < len(self.text) and self.text[self.pos].isspace():
+            self.pos += 1
+
+    def peek(self) -> str:
+        self.skip_space()
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ConversionError(f"Expected {char!r} at {self.pos} in {self.text!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        char = self.peek()
+        closing = {"[": "]", "{": "}"}.get(char)
+        if closing == "}" and self.language != "cpp":
+            raise ConversionError("Braces are not a list literal here")
+        if closing:
+            self.pos += 1
+            return self.sequence(closing)
+        if char in ("'", '"'):
+            return self.string(char)
+        match = _NUMBER.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            if self.language == "cpp" and self.text[self.pos:self.pos + 2].upper() == "LL":
+                self.pos += 2
+            literal = match.group(0)
+            return float(literal) if any(c in literal for c in ".eE") else int(literal)
+        match = _IDENTIFIER.match(self.text, self.pos)
+        if match and match.group(0) in _BOOLEANS[self.language]:
+            self.pos = match.end()
+            return _BOOLEANS[self.language][match.group(0)]
+        raise ConversionError(f"Unsupported literal at {self.pos} in {self.text!r}")
+
+    def sequence(self, closing: str) -> list:
+        items = []
+        while self.peek() != closing:
+            items.append(self.value())
+            if self.peek() == ",":
+                self.pos += 1
+            elif self.peek() != closing:
+                raise ConversionError(f"Expected ',' or {closing!r} in {self.text!r}")
+        self.pos += 1
+        return items
+
+    def string(self, quote: str) -> str:
+        if quote == "'" and self.language == "cpp":
+            raise ConversionError("char literals are not supported")
+        self.pos += 1
+        chars = []
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+            if char == quote:
+                self.pos += 1
+                return "".join(chars)
+            if char == "\\":
+                escaped = self.text[self.pos + 1:self.pos + 2]
+                if escaped not in _ESCAPES:
+                    raise ConversionError(f"Unsupported escape \\{escaped}")
+                chars.append(_ESCAPES[escaped])
+                self.pos += 2
+                continue
+            chars.append(char)
+            self.pos += 1
+        raise ConversionError("Unterminated string")
+
+    def at_end(self) -> bool:
+        self.skip_space()
+        if self.language == "cpp" and self.text.startswith(";", self.pos):
+            self.pos += 1
+            self.skip_space()
+        return self.pos == len(self.text)
+
+
+def parse_call(text: str, language: str) -> Tuple[str, List[Any]]:
+    """Split a test input like `f(1, [2, 3])` into the function name and argument values."""
+    parser = _LiteralParser(text.strip(), language)
+    match = _IDENTIFIER.match(parser.text)
+    if not match:
+        raise ConversionError(f"Not a function call: {text!r}")
+    parser.pos = match.end()
+    parser.expect("(")
+    args = parser.sequence(")")
+    if not parser.at_end():
+        raise ConversionError(f"Trailing text after call: {text!r}")
+    return match.group(0), args
+
+
+def parse_expected(text: str, language: str, return_type: Optional[ValueType]) -> Any:
+    """
+    Parse a printed expected output.
+
+    Strings are printed without quotes, so a declared/inferred `str` return
+    takes the text as-is (minus the optional quotes the runner also strips).
+    """
+    text = text.strip()
+    if return_type == "str" or return_type is None and not _looks_like_literal(text, language):
+        if len(text) >= 2 and text[0] == text[-1] and text[0] in ("'", '"'):
+            return text[1:-1]
+        return text
+    if language == "cpp" and return_type == "bool" and text in ("0", "1"):
+        return text == "1"
+    parser = _LiteralParser(text, language)
+    value = parser.value()
+    if not parser.at_end():
+        raise ConversionError(f"Unparseable expected output: {text!r}")
+    return value
+
+
+def _looks_like_literal(text: str, language: str) -> bool:
+    try:
+        parser = _LiteralParser(text, language)
+        value = parser.value()
+        return parser.at_end() and not isinstance(value, str)
+    except ConversionError:
+        return False
+
+
+# ---------------------------------------------------------------------------
+# Types
+# ---------------------------------------------------------------------------
+
+def type_of(value: Any) -> ValueType:
+    """Value type of a parsed literal."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    element = None
+    for item in value:
+        element = unify(element, type_of(item))
+    return ("list", element)
+
+
+def unify(a: Optional[ValueType], b: Optional[ValueType]) -> Optional[ValueType]:
+    """Common type of two value types (int widens to float); raises if incompatible."""
+    if a is None:
+        return b
+    if b is None or a == b:
+        return a
+    if {a, b} == {"int", "float"}:
+        return "float"
+    if isinstance(a, tuple) and isinstance(b, tuple):
+        return ("list", unify(a[1], b[1]))
+    raise ConversionError(f"Incompatible types {a} and {b}")
+
+
+def is_complete(value_type: Optional[ValueType]) -> bool:
+    """True if every element type is known (needed for statically typed targets)."""
+    if value_type is None:
+        return False
+    return is_complete(value_type[1]) if isinstance(value_type, tuple) else True
+
+
+def coerce(value: Any, value_type: ValueType) -> Any:
+    """Convert ints to floats where the type says float."""
+    if value_type == "float" and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value_type, tuple) and value_type[1] is not None:
+        return [coerce(item, value_type[1]) for item in value]
+    return value
+
+
+def _python_annotation(node: Optional[ast.expr]) -> Optional[ValueType]:
+    if node is None:
+        return None
+    if isinstance(node, ast.Name) and node.id in ("int", "float", "bool", "str"):
+        return node.id
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id in ("list", "List"):
+        element = _python_annotation(node.slice)
+        if element is None:
+            raise ConversionError("Unsupported list annotation")
+        return ("list", element)
+    raise ConversionError(f"Unsupported annotation: {ast.unparse(node)}")
+
+
+_CPP_SCALARS = {
+    "int": "int", "long": "int", "long long": "int", "short": "int", "unsigned": "int", "size_t": "int",
+    "double": "float", "float": "float", "bool": "bool", "string": "str",
+}
+
+
+def _cpp_type(text: str) -> ValueType:
+    text = re.sub(r"\bconst\b|&|\bstd::", " ", text)
+    text = " ".join(text.split())
+    match = re.fullmatch(r"vector\s*<\s*(.+?)\s*>", text)
+    if match:
+        return ("list", _cpp_type(match.group(1)))
+    if text in _CPP_SCALARS:
+        return _CPP_SCALARS[text]
+    raise ConversionError(f"Unsupported C++ type: {text}")
+
+
+def _split_params(text: str) -> List[str]:
+    """Split a parameter list on commas outside <>."""
+    params, depth, current = [], 0, []
+    for char in text:
+        depth += (char == "<") - (char == ">")
+        if char == "," and depth == 0:
+            params.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if "".join(current).strip():
+        params.append("".join(current).strip())
+    return params
+
+
+def parse_signature(signature: str, language: str) -> FunctionSpec:
+    """Function name, parameter names and any declared types."""
+    signature = signature.strip()
+    if language == "python":
+        try:
+            tree = ast.parse(signature.rstrip(":") + ":\n    pass")
+        except SyntaxError as e:
+            raise ConversionError(f"Invalid Python signature: {e.msg}")
+        func = tree.body[0]
+        if not isinstance(func, ast.FunctionDef) or func.args.vararg or func.args.kwarg or func.args.kwonlyargs:
+            raise ConversionError("Unsupported Python signature")
+        return FunctionSpec(
+            func.name,
+            [arg.arg for arg in func.args.args],
+            [_python_annotation(arg.annotation) for arg in func.args.args],
+            _python_annotation(func.returns)
+        )
+    if language == "javascript":
+        match = re.match(r"function\s+([A-Za-z_$][\w$]*)\s*\(([^)]*)\)", signature)
+        if not match:
+            raise ConversionError("Unsupported JavaScript signature")
+        params = [p.split("=")[0].strip() for p in match.group(2).split(",") if p.strip()]
+        if any(not _IDENTIFIER.fullmatch(p) for p in params):
+            raise ConversionError("Unsupported JavaScript parameters")
+        return FunctionSpec(match.group(1), params, [None] * len(params), None)
+    match = re.match(r"([\w:<>,\s&]+?)\s*\b([A-Za-z_]\w*)\s*\((.*)\)\s*\{?\s*$", signature)
+    if not match:
+        raise ConversionError("Unsupported C++ signature")
+    names, types = [], []
+    for param in _split_params(match.group(3)):
+        param_match = re.match(r"(.+?)\s*&?\s*\b([A-Za-z_]\w*)$", param)
+        if not param_match:
+            raise ConversionError(f"Unsupported C++ parameter: {param}")
+        types.append(_cpp_type(param_match.group(1)))
+        names.append(param_match.group(2))
+    return FunctionSpec(match.group(2), names, types, _cpp_type(match.group(1)))
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+def _float_literal(value: float) -> str:
+    text = repr(value)
+    if text in ("inf", "-inf", "nan"):
+        raise ConversionError("Non-finite floats are not supported")
+    return text if any(c in text for c in ".e") else text + ".0"
+
+
+def _cpp_string(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\t", "\\t").replace("\r", "\\r")
+    if "\0" in escaped:
+        raise ConversionError("NUL in string")
+    return f'"{escaped}"'
+
+
+def render_value(value: Any, value_type: ValueType, language: str) -> str:
+    """Source literal for `value` in `language`."""
+    if value_type == "bool":
+        return ("True" if value else "False") if language == "python" else ("true" if value else "false")
+    if value_type == "int":
+        if language == "cpp" and abs(value) > _INT32_MAX:
+            return f"{value}LL"
+        return str(value)
+    if value_type == "float":
+        return _float_literal(float(value))
+    if value_type == "str":
+        if language == "python":
+            return repr(value)
+        return json.dumps(value, ensure_ascii=False) if language == "javascript" else _cpp_string(value)
+    element = value_type[1]
+    items = ", ".join(render_value(item, element, language) for item in value)
+    return f"{{{items}}}" if language == "cpp" else f"[{items}]"
+
+
+def _cpp_type_name(value_type: ValueType, values: List[Any] = ()) -> str:
+    if isinstance(value_type, tuple):
+        return f"vector<{_cpp_type_name(value_type[1], [item for v in values for item in v])}>"
+    if value_type == "int" and any(abs(v) > _INT32_MAX for v in values):
+        return "long long"
+    return {"int": "int", "float": "double", "bool": "bool", "str": "string"}[value_type]
+
+
+def render_signature(spec: FunctionSpec, language: str, arg_values: List[List[Any]], return_values: List[Any]) -> str:
+    """Signature line in the style the challenge prompt asks for."""
+    params = ", ".join(spec.params)
+    if language == "python":
+        return f"def {spec.name}({params}):"
+    if language == "javascript":
+        return f"function {spec.name}({params}) {{"
+    typed = ", ".join(
+        f"{_cpp_type_name(value_type, [args[i] for args in arg_values])} {name}"
+        for i, (name, value_type) in enumerate(zip(spec.params, spec.param_types))
+    )
+    return f"{_cpp_type_name(spec.return_type, return_values)} {spec.name}({typed}) {{"
+
+
+# ---------------------------------------------------------------------------
+# Validation with the local toolchain
+# ---------------------------------------------------------------------------
+
+async def _printed_outputs(
+    language: str,
+    signature: str,
+    calls: List[str],
+    expected_literals: List[str]
+) -> Optional[List[str]]:
+    """
+    Compile the test calls against a stub of `signature` and print each
+    expected literal with the target runtime. Returns the printed outputs,
+    or None if the toolchain is unavailable or the program does not build.
+    """
+    if language == "python":
+        source = f"{signature}\n    return None\n\n\ndef __check():\n" + "".join(f"    print({c})\n" for c in calls)
+        try:
+            compile(source, "<derived>", "exec")
+        except SyntaxError:
+            return None
+        script = "import json\n" + f"print(json.dumps([str(v) for v in [{', '.join(expected_literals)}]]))\n"
+        output = await run_process([sys.executable, "-I", "-c", script])
+        return json.loads(output.stdout) if output is not None and output.returncode == 0 else None
+
+    if language == "javascript":
+        node = shutil.which("node")
+        if node is None:
+            return None
+        source = (
+            f"{signature}\n  return null;\n}}\n\nfunction __check() {{\n"
+            + "".join(f"  console.log({c});\n" for c in calls)
+            + "}\n\n"
+            + f"console.log(JSON.stringify([{', '.join(expected_literals)}].map(v => require('util').format(v))));\n"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "derived.js")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(source)
+            output = await run_process([node, path])
+        return json.loads(output.stdout) if output is not None and output.returncode == 0 else None
+
+    compiler = shutil.which("g++")
+    if compiler is None:
+        return None
+    source = (
+        "#include <iostream>\n#include <string>\n#include <vector>\nusing namespace std;\n\n"
+        f"{signature}\n    return {{}};\n}}\n\nvoid __check() {{\n"
+        + "".join(f"    cout << {c} << endl;\n" for c in calls)
+        + "}\n\nint main() {\n"
+        + "".join(f'    cout << {literal} << "\\x1e";\n' for literal in expected_literals)
+        + "    return 0;\n}\n"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        binary = os.path.join(directory, "derived")
+        built = await run_process(
+            [compiler, "-std=c++17", "-x", "c++", "-", "-o", binary],
+            stdin=source.encode("utf-8"),
+            timeout=30.0
+        )
+        if built is None or built.returncode != 0:
+            return None
+        output = await run_process([binary])
+    if output is None or output.returncode != 0:
+        return None
+    return output.stdout.split("\x1e")[:-1]
+
+
+# ---------------------------------------------------------------------------
+# Conversion
+# ---------------------------------------------------------------------------
+
+def analyze_challenge(challenge: Challenge, language: str) -> Tuple[FunctionSpec, List[List[Any]], List[Any]]:
+    """Parse the challenge into a typed spec plus argument and expected values per test."""
+    spec = parse_signature(challenge.function_signature, language)
+    arg_values: List[List[Any]] = []
+    for test_case in challenge.test_cases:
+        name, args = parse_call(test_case.input, language)
+        if name != spec.name or len(args) != len(spec.params):
+            raise ConversionError(f"Test call does not match the signature: {test_case.input!r}")
+        arg_values.append(args)
+
+    param_types = list(spec.param_types)
+    for i in range(len(spec.params)):
+        inferred = None
+        for args in arg_values:
+            inferred = unify(inferred, type_of(args[i]))
+        param_types[i] = unify(param_types[i], inferred) if param_types[i] else inferred
+
+    return_type = spec.return_type
+    if return_type is None:
+        output_types = [type_of(parse_expected(t.expected, language, None)) for t in challenge.test_cases]
+        # Printed strings may look like numbers ("5"); once any output is text, all are
+        if "str" in output_types:
+            return_type = "str"
+        else:
+            for output_type in output_types:
+                return_type = unify(return_type, output_type)
+        if return_type is None:
+            raise ConversionError("Cannot infer the return type")
+    expected = [parse_expected(t.expected, language, return_type) for t in challenge.test_cases]
+    for value in expected:
+        unify(return_type, type_of(value))
+
+    spec = spec._replace(param_types=param_types, return_type=return_type)
+    arg_values = [[coerce(v, t) for v, t in zip(args, param_types)] for args in arg_values]
+    return spec, arg_values, [coerce(value, return_type) for value in expected]
+
+
+def _ascii_only(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.isascii()
+    if isinstance(value, list):
+        return all(_ascii_only(item) for item in value)
+    return True
+
+
+async def convert_challenge(challenge: Challenge, source_language: str, target_language: str) -> Optional[Challenge]:
+    """
+    Derive `challenge` for `target_language`, or return None if it falls
+    outside the convertible subset, fails local validation or fails in
+    an unexpected way (logged; only this target language is skipped).
+    """
+    try:
+        spec, arg_values, expected = analyze_challenge(challenge, source_language)
+        if spec.name in _RESERVED[target_language] or any(p in _RESERVED[target_language] for p in spec.params):
+            raise ConversionError("Name is reserved in the target language")
+        if target_language == "cpp":
+            if not _ascii_only(arg_values) or not _ascii_only(expected):
+                raise ConversionError("std::string works on bytes; non-ASCII text changes the results")
+            if not all(is_complete(t) for t in spec.param_types):
+                raise ConversionError("Parameter element types are unknown")
+            if isinstance(spec.return_type, tuple):
+                raise ConversionError("cout cannot print a vector return value")
+        if target_language == "python" and source_language != "python" and spec.return_type == "float" \
+                and any(value == int(value) for value in expected):
+            # Python prints 3 or 3.0 depending on how the solution computes it
+            raise ConversionError("Integral float outputs are ambiguous in Python")
+
+        calls = [
+            f"{spec.name}({', '.join(render_value(v, t, target_language) for v, t in zip(args, spec.param_types))})"
+            for args in arg_values
+        ]
+        signature = render_signature(spec, target_language, arg_values, expected)
+        printed = await _printed_outputs(
+            target_language,
+            signature,
+            calls,
+            [render_value(value, spec.return_type, target_language) for value in expected]
+        )
+        if printed is None or len(printed) != len(expected):
+            raise ConversionError("Local validation failed")
+        derived = Challenge(
+            title=challenge.title,
+            description=challenge.description,
+            function_signature=signature,
+            test_cases=[
+                TestCase(input=call, expected=output, hidden=test_case.hidden)
+                for call, output, test_case in zip(calls, printed, challenge.test_cases)
+            ]
+        )
+    except ConversionError as e:
+        logger.info(f"↪️ '{challenge.title}' not derivable {source_language} → {target_language}: {e}")
+        metrics.increment(f"challenge_convert.skipped.{target_language}")
+        return None
+    except Exception as e:
+        # Unexpected toolchain output (e.g. a runtime printing non-JSON) or a
+        # converter bug: skip this language, the others are still derived
+        logger.warning(
+            f"⚠️ Deriving '{challenge.title}' {source_language} → {target_language} failed: {e!r}",
+            exc_info=True
+        )
+        metrics.increment(f"challenge_convert.failed.{target_language}")
+        return None
+
+    metrics.increment(f"challenge_convert.derived.{target_language}")
+    return derived
@@ -0,0 +1,179 @@
+"""Near-duplicate detection for generated challenges (MinHash over character shingles)."""
+import re
+import threading
+import zlib
+from functools import lru_cache
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.config import settings
+from app.models.responses import Challenge
+from app.services.metrics import metrics
+
+_SHINGLE_SIZE = 4
+_BANDS = 16
+_ROWS = 4
+_NUM_PERM = _BANDS * _ROWS
+_PRIME = (1 << 61) - 1
+# Fixed coefficients so signatures agree across workers and restarts
+_PERMUTATIONS = [
+    (1 + (i * 0x9E3779B97F4A7C15) % (_PRIME - 1), (i * 0xC2B2AE3D27D4EB4F) % _PRIME)
+    for i in range(1, _NUM_PERM + 1)
+]
+
+_ARABIC_DIACRITICS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u0640]")
+_ARABIC_LETTERS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي"})
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_NON_WORD = re.compile(r"[\W_]+")
+_FUNCTION_NAME = re.compile(r"(\w+)\s*\(")
+
+Signature = Tuple[int, ...]
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, split identifiers into words and fold Arabic spelling variants."""
+    text = _CAMEL_BOUNDARY.sub(" ", text)
+    text = _ARABIC_DIACRITICS.sub("", text).translate(_ARABIC_LETTERS)
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+@lru_cache(maxsize=8192)
+def minhash(text: str) -> Optional[Signature]:
+    """MinHash signature of the character shingles of `text` (None if empty)."""
+    text = normalize_text(text)
+    if not text:
+        return None
+    if len(text) < _SHINGLE_SIZE:
+        text = text.ljust(_SHINGLE_SIZE)
+    shingles = {
+        zlib.crc32(text[i:i + _SHINGLE_SIZE].encode("utf-8"))
+        for i in range(len(text) - _SHINGLE_SIZE + 1)
+    }
+    return tuple(min((a * x + b) % _PRIME for x in shingles) for a, b in _PERMUTATIONS)
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / _NUM_PERM
+
+
+def challenge_text(challenge: Challenge) -> str:
+    """Text a challenge is compared on: title, function name and description."""
+    name = _FUNCTION_NAME.search(challenge.function_signature)
+    return f"{challenge.title} {name.group(1) if name else ''} {challenge.description}"
+
+
+def similar_title(title: str, known_titles: Iterable[str]) -> Optional[str]:
+    """Return the first of `known_titles` that near-duplicates `title`, if any."""
+    title_sig = minhash(title)
+    if title_sig is None:
+        return None
+    for known in known_titles:
+        other = minhash(known)
+        if other is not None and similarity(title_sig, other) >= settings.challenge_title_duplicate_threshold:
+            return known
+    return None
+
+
+def find_duplicate(
+    challenge: Challenge,
+    known_titles: Iterable[str],
+    known_challenges: Iterable[Challenge] = ()
+) -> Optional[str]:
+    """
+    The title `challenge` near-duplicates among what one client already
+    has: `known_titles` by title, `known_challenges` (e.g. the rest of the
+    batch) by title or full text. None if it is new to that client.
+    """
+    known = similar_title(challenge.title, known_titles)
+    if known is not None:
+        return known
+    text_sig = minhash(challenge_text(challenge))
+    if text_sig is None:
+        return None
+    for other in known_challenges:
+        other_sig = minhash(challenge_text(other))
+        if other_sig is not None and similarity(text_sig, other_sig) >= settings.challenge_duplicate_threshold:
+            return other.title
+    return similar_title(challenge.title, [other.title for other in known_challenges])
+
+
+class _Bucket:
+    """Issued challenges for one language/difficulty with an LSH band index."""
+
+    def __init__(self):
+        self.entries: "OrderedDict[int, Tuple[str, Signature, Signature]]" = OrderedDict()
+        self.bands: List[Dict[Signature, Set[int]]] = [defaultdict(set) for _ in range(_BANDS)]
+        self.next_id = 0
+
+    def candidates(self, signature: Signature) -> Set[int]:
+        found: Set[int] = set()
+        for band, table in enumerate(self.bands):
+            found |= table.get(signature[band * _ROWS:(band + 1) * _ROWS], set())
+        return found
+
+    def add(self, title: str, title_sig: Signature, text_sig: Signature) -> None:
+        entry_id = self.next_id
+        self.next_id += 1
+        self.entries[entry_id] = (title, title_sig, text_sig)
+        for band, table in enumerate(self.bands):
+            table[text_sig[band * _ROWS:(band + 1) * _ROWS]].add(entry_id)
+        while len(self.entries) > settings.challenge_index_size:
+            old_id, (_, _, old_sig) = self.entries.popitem(last=False)
+            for band, table in enumerate(self.bands):
+                key = old_sig[band * _ROWS:(band + 1) * _ROWS]
+                table[key].discard(old_id)
+                if not table[key]:
+                    del table[key]
+
+
+class ChallengeIndex:
+    """
+    Signatures of challenges issued to anyone, per language/difficulty.
+
+    The index is shared by all clients of a worker, so it never rejects a
+    challenge for one client because another was given something similar
+    (that is `find_duplicate`, on the client's own titles). It keeps the
+    catalog free of repeats: `find_issued` compares a candidate on its
+    full text through LSH banding, at the same cost however many
+    challenges have been issued. `recent_titles` gives the prompt a
+    bounded list of what was generated lately, to steer the model towards
+    new ideas. The index is per worker process.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str], _Bucket] = defaultdict(_Bucket)
+        self._lock = threading.Lock()
+
+    def find_issued(self, challenge: Challenge, language: str, difficulty: str) -> Optional[str]:
+        """The title of an issued challenge `challenge` near-duplicates, or None."""
+        title_sig = minhash(challenge.title)
+        text_sig = minhash(challenge_text(challenge))
+        if title_sig is None or text_sig is None:
+            return None
+        with self._lock:
+            bucket = self._buckets[(language, difficulty)]
+            for entry_id in bucket.candidates(text_sig):
+                title, other_title_sig, other_text_sig = bucket.entries[entry_id]
+                if (similarity(text_sig, other_text_sig) >= settings.challenge_duplicate_threshold
+                        or similarity(title_sig, other_title_sig) >= settings.challenge_title_duplicate_threshold):
+                    return title
+        return None
+
+    def add(self, challenge: Challenge, language: str, difficulty: str) -> None:
+        """Record `challenge` as issued."""
+        title_sig = minhash(challenge.title)
+        text_sig = minhash(challenge_text(challenge))
+        if title_sig is None or text_sig is None:
+            return
+        with self._lock:
+            self._buckets[(language, difficulty)].add(challenge.title, title_sig, text_sig)
+        metrics.increment("challenge_index.added")
+
+    def recent_titles(self, language: str, difficulty: str, limit: int) -> List[str]:
+        """Most recently issued titles, newest last."""
+        with self._lock:
+            entries = self._buckets[(language, difficulty)].entries
+            return [title for title, _, _ in list(entries.values())[-limit:]] if limit > 0 else []
+
+
+challenge_index = ChallengeIndex()
@@ -0,0 +1,199 @@
+"""Answers to common conceptual chat questions, matched by TF-IDF similarity."""
+import math
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from app.services.challenge_index import normalize_text
+from app.services.metrics import metrics
+from app.services.shutdown import register_snapshot
+
+# Function words of English, Arabic (after normalize_text) and Egyptian Arabic.
+# Code keywords ("for", "in", "if") are deliberately not here.
+_STOPWORDS = {
+    "a", "an", "the", "how", "what", "is", "are", "do", "does", "i", "to", "can", "you",
+    "please", "explain", "of", "and", "or", "me", "why", "when", "should", "with",
+    "ما", "ماذا", "هي", "هو", "كيف", "هل", "في", "من", "الي", "علي", "عن", "ان", "او",
+    "و", "مع", "لماذا", "اريد", "ممكن", "يمكن", "يمكنني", "استطيع", "كيفيه", "اشرح",
+    "شرح", "ايه", "ازاي", "يعني", "عايز", "لو", "سمحت", "معني", "الفرق", "بين"
+}
+# Words pointing at the student's own code or an earlier turn
+_REFERENCES = {
+    "my", "this", "that", "these", "it", "here", "above", "mine",
+    "كودي", "برنامجي", "دالتي", "متغيري", "مشكلتي", "الكود", "البرنامج", "هذا", "هذه",
+    "هنا", "ذلك", "تلك", "فوق", "ده", "دي", "دا", "بتاعي", "خطئي", "سطر", "السطر"
+}
+# Negations, folded into one term: "do not use x" never matches "use x"
+_NEGATIONS = {"not", "no", "never", "لا", "ليس", "لم", "لن", "مش", "مو", "بدون"}
+_CONTRACTED_NOT = re.compile(r"(\w+)n['’]t\b", re.IGNORECASE)
+_CONTRACTED_STEMS = {"ca": "can", "wo": "will", "sha": "shall"}
+_ARTICLES = ("وال", "بال", "كال", "فال", "لل", "ال")
+_ARABIC_WORD = re.compile(r"^[\u0600-\u06FF]+$")
+# Code in the question itself: calls with arguments, assignments, brackets, backticks, line numbers
+_CODE_SYNTAX = re.compile(r"`|\w\([^)\s]|[=\[\]{};<>]|\bline\s*\d+|\n\s")
+# User-made identifiers: snake_case, camelCase or with digits
+_IDENTIFIER = re.compile(r"\b(?=\w*(?:_|[a-z][A-Z]|[A-Za-z]\d))[A-Za-z_]\w*\b")
+
+
+def _stem(word: str) -> str:
+    """Strip an Arabic definite article (with a leading conjunction/preposition)."""
+    if _ARABIC_WORD.match(word):
+        for article in _ARTICLES:
+            if word.startswith(article) and len(word) - len(article) >= 2:
+                return word[len(article):]
+    return word
+
+
+def _expand_contractions(text: str) -> str:
+    """Spell out "n't" ("don't" -> "do not") so the negation survives tokenizing."""
+    return _CONTRACTED_NOT.sub(
+        lambda m: f"{_CONTRACTED_STEMS.get(m.group(1).lower(), m.group(1))} not", text
+    )
+
+
+def _content_terms(terms: Counter) -> frozenset:
+    """The single-word terms (bigrams hold a space)."""
+    return frozenset(term for term in terms if " " not in term)
+
+
+class ChatAnswerCache:
+    """
+    Past answers to standalone conceptual questions ("ما هي الحلقة for؟",
+    "how do I convert input to int"), per programming language.
+
+    Questions are compared on Arabic-normalized, article-stripped terms
+    without function words plus the bigrams of consecutive terms, so word
+    order counts ("string to int" is not "int to string"), weighted by
+    TF-IDF over the stored questions. A stored answer is served only when
+    both questions have exactly the same single-word terms (negations
+    included) and the cosine similarity reaches `min_similarity`. Questions that point at the student's code (code
+    syntax, identifiers from their file, "my code", "هذا") or have fewer
+    than `min_terms` terms are never looked up or stored. Callers answer
+    cacheable questions from the question and language alone (no code,
+    history or summary in the prompt), so a stored answer holds nothing
+    from the student who asked first. The cache is per
+    worker process, keeps the `maxsize` most recently used answers per
+    language and survives restarts through the shutdown snapshot.
+
+    Metrics: chat_answers.lookups, split into hits, misses and skipped
+    (not cacheable); chat_answers.similarity (best match per lookup, for
+    tuning the threshold); chat_answers.stored.
+    """
+
+    def __init__(self, maxsize: int, min_similarity: float, min_terms: int):
+        self.maxsize = maxsize
+        self.min_similarity = min_similarity
+        self.min_terms = min_terms
+        self._entries: Dict[str, "OrderedDict[int, Tuple[Counter, str]]"] = defaultdict(OrderedDict)
+        self._postings: Dict[str, Dict[str, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self._next_id = 0
+        self._lock = threading.Lock()
+        register_snapshot("chat_answers", self.export, self.restore)
+
+    def terms(self, question: str, current_code: Optional[str] = None) -> Optional[Counter]:
+        """Terms of `question`, or None when it is not a standalone conceptual question."""
+        if self.maxsize <= 0 or _CODE_SYNTAX.search(question):
+            return None
+        if current_code:
+            named = set(_IDENTIFIER.findall(question))
+            if named and any(re.search(rf"\b{re.escape(name)}\b", current_code) for name in named):
+                return None
+        words = normalize_text(_expand_contractions(question)).split()
+        if any(word in _REFERENCES for word in words):
+            return None
+        sequence = [
+            "not" if word in _NEGATIONS else _stem(word)
+            for word in words if word not in _STOPWORDS
+        ]
+        if len(set(sequence)) < self.min_terms:
+            return None
+        return Counter(sequence + [f"{a} {b}" for a, b in zip(sequence, sequence[1:])])
+
+    def _weights(self, terms: Counter, language: str) -> Dict[str, float]:
+        entries = self._entries[language]
+        postings = self._postings[language]
+        total = len(entries)
+        return {
+            term: (1 + math.log(count)) * (math.log((1 + total) / (1 + len(postings.get(term, ())))) + 1)
+            for term, count in terms.items()
+        }
+
+    def _best_match(self, terms: Counter, language: str) -> Tuple[Optional[int], float]:
+        postings = self._postings[language]
+        candidates: Set[int] = set()
+        for term in terms:
+            candidates |= postings.get(term, set())
+        content = _content_terms(terms)
+        query = self._weights(terms, language)
+        query_norm = math.sqrt(sum(w * w for w in query.values()))
+        best_id, best = None, 0.0
+        for entry_id in candidates:
+            stored_terms = self._entries[language][entry_id][0]
+            if _content_terms(stored_terms) != content:
+                continue
+            stored = self._weights(stored_terms, language)
+            dot = sum(weight * stored.get(term, 0.0) for term, weight in query.items())
+            score = dot / (query_norm * math.sqrt(sum(w * w for w in stored.values())))
+            if score > best:
+                best_id, best = entry_id, score
+        return best_id, best
+
+    def lookup(self, terms: Optional[Counter], language: str) -> Optional[str]:
+        """The stored answer to a question similar enough to `terms`, if any."""
+        metrics.increment("chat_answers.lookups")
+        if terms is None:
+            metrics.increment("chat_answers.skipped")
+            return None
+        with self._lock:
+            entry_id, score = self._best_match(terms, language)
+            metrics.observe("chat_answers.similarity", score)
+            if entry_id is None or score < self.min_similarity:
+                metrics.increment("chat_answers.misses")
+                return None
+            self._entries[language].move_to_end(entry_id)
+            metrics.increment("chat_answers.hits")
+            return self._entries[language][entry_id][1]
+
+    def store(self, terms: Optional[Counter], language: str, answer: str, project_title: str = "") -> None:
+        """
+        Remember `answer` unless the question is not cacheable or the answer
+        is project-specific. `answer` must come from a prompt without the
+        student's code or conversation.
+        """
+        answer = answer.strip()
+        if terms is None or not answer or (project_title and project_title in answer):
+            return
+        with self._lock:
+            _, score = self._best_match(terms, language)
+            if score >= self.min_similarity:
+                return
+            self._add(terms, language, answer)
+        metrics.increment("chat_answers.stored")
+
+    def _add(self, terms: Counter, language: str, answer: str) -> None:
+        entries = self._entries[language]
+        postings = self._postings[language]
+        entry_id = self._next_id
+        self._next_id += 1
+        entries[entry_id] = (terms, answer)
+        for term in terms:
+            postings[term].add(entry_id)
+        while len(entries) > self.maxsize:
+            old_id, (old_terms, _) = entries.popitem(last=False)
+            for term in old_terms:
+                postings[term].discard(old_id)
+                if not postings[term]:
+                    del postings[term]
+
+    def export(self) -> Dict[str, List[Tuple[Counter, str]]]:
+        """Stored (terms, answer) pairs per language, least recently used first."""
+        with self._lock:
+            return {language: list(entries.values()) for language, entries in self._entries.items() if entries}
+
+    def restore(self, state: Dict[str, List[Tuple[Counter, str]]]) -> None:
+        """Add the pairs from `export`."""
+        with self._lock:
+            for language, pairs in state.items():
+                for terms, answer in pairs:
+                    self._add(terms, language, answer)
+
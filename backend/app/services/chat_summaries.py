@@ -0,0 +1,120 @@
+"""Rolling summaries of older chat turns, generated in the background."""
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Sequence, Set
+from app.services.cache import TTLCache
+from app.services.metrics import metrics
+from app.services.shutdown import shutdown
+
+logger = logging.getLogger(__name__)
+
+# (summary of the turns before, turns to fold in) -> new summary
+Summarize = Callable[[Optional[str], List[dict]], Awaitable[str]]
+
+
+def chain_hash(previous: str, message: dict) -> str:
+    """Hash of a history prefix, extended by one more turn."""
+    digest = hashlib.blake2b(previous.encode("utf-8"), digest_size=16)
+    digest.update(f"\x00{message['role']}\x00{message['content']}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ChatContext(NamedTuple):
+    summary: Optional[str]  # covers the first `covered` turns of the history
+    recent: List[dict]  # the turns after them, to send verbatim
+    covered: int
+    covered_hash: str  # prefix hash the summary covers ("" when none)
+
+
+class ChatSummaries:
+    """
+    Summaries of conversation prefixes, keyed by a hash chained over the
+    turns, so any client sending the same history finds the same summary.
+
+    Each request uses the longest summarised prefix of its history plus the
+    turns after it. Once `batch` or more older turns (beyond the `keep`
+    most recent) are not yet covered, a summary extending the current one
+    over them is generated in the background; the request itself never
+    waits for it. The prompt therefore carries one summary and at most
+    `keep + batch - 1` verbatim turns, however long the conversation gets.
+    One background summary folds in at most `max_fold` turns, so a long
+    uncovered history is caught up over several requests instead of in
+    one unbounded prompt.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float, keep: int, batch: int, max_fold: int):
+        self.keep = keep
+        self.batch = batch
+        self.max_fold = max(batch, max_fold)
+        self._summaries = TTLCache("chat_summaries", maxsize, ttl_seconds, persist=True)
+        self._pending: Set[str] = set()
+        self._background: Set[asyncio.Task] = set()
+
+    def prepare(
+        self,
+        history: Sequence[dict],
+        summarize: Summarize,
+        base_hash: str = "",
+        base_summary: Optional[str] = None
+    ) -> ChatContext:
+        """
+        Split `history` into a cached summary and the turns after it, and
+        schedule the next summary if enough older turns are uncovered.
+        `base_hash`/`base_summary` describe turns that came before
+        `history` and were already dropped by the caller (a summary this
+        class returned earlier, e.g. sent back by the client).
+        """
+        if base_hash:
+            stored = self._summaries.get(base_hash)
+            if stored is not None:
+                base_summary = stored
+            elif base_summary:
+                # Expired here, so the caller's copy is used; chain from a hash
+                # of it too, so summaries built on it never share keys with ours
+                base_hash = chain_hash(base_hash, {"role": "summary", "content": base_summary})
+            else:
+                base_hash = ""
+        older = max(0, len(history) - self.keep)
+        hashes = [base_hash]
+        for message in history[:older]:
+            hashes.append(chain_hash(hashes[-1], message))
+
+        covered, summary = 0, base_summary
+        for index in range(older, 0, -1):
+            cached = self._summaries.get(hashes[index])
+            if cached is not None:
+                covered, summary = index, cached
+                break
+        if covered:
+            metrics.increment("chat_summary.used")
+
+        if older - covered >= self.batch:
+            end = min(older, covered + self.max_fold)
+            self._schedule(hashes[end], summary, list(history[covered:end]), summarize)
+        return ChatContext(summary, list(history[covered:]), covered, hashes[covered])
+
+    def _schedule(self, key: str, previous: Optional[str], turns: List[dict], summarize: Summarize) -> None:
+        if key in self._pending or shutdown.draining:
+            return
+        self._pending.add(key)
+        started = time.monotonic()
+
+        async def run() -> None:
+            try:
+                summary = (await summarize(previous, turns)).strip()
+            except Exception as e:
+                logger.warning(f"⚠️ Chat summary failed, older turns stay verbatim for now: {e}")
+                metrics.increment("chat_summary.failed")
+                return
+            finally:
+                self._pending.discard(key)
+            if summary:
+                self._summaries.set(key, summary)
+                metrics.increment("chat_summary.generated")
+                metrics.observe("chat_summary.seconds", time.monotonic() - started)
+
+        task = asyncio.ensure_future(run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
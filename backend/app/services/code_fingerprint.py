@@ -0,0 +1,92 @@
+"""Formatting- and comment-insensitive fingerprints of student code."""
+import hashlib
+import io
+import re
+import tokenize
+from typing import List, NamedTuple, Optional
+
+
+class CodeToken(NamedTuple):
+    """Significant token with the 1-based line it starts on."""
+    text: str
+    line: int
+
+
+# Lightweight lexer shared by JavaScript and C++ (maximal munch for operators)
+_C_LIKE_TOKEN = re.compile(
+    r"""
+    (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+    |(?P<string>"(?:\\.|[^"\\\n])*"?|'(?:\\.|[^'\\\n])*'?|`(?:\\.|[^`\\])*`?)
+    |(?P<number>\.?\d(?:[\w.]|[eE][+-])*)
+    |(?P<word>[A-Za-z_$][\w$]*)
+    |(?P<preprocessor>\#\s*\w+)
+    |(?P<op>>>>=|<<=|>>=|>>>|===|!==|\*\*=|\.\.\.|<=>|->\*|::|->|\+\+|--|&&|\|\||\?\?|\?\.|==|!=|<=|>=|\+=|-=|\*=|/=|%=|&=|\|=|\^=|<<|>>|=>|\*\*|[^\s\w])
+    |(?P<space>\s+)
+    """,
+    re.VERBOSE | re.DOTALL
+)
+
+
+def _c_like_tokens(code: str) -> List[CodeToken]:
+    """Tokenize JavaScript/C++ source, dropping comments and whitespace."""
+    tokens = []
+    line = 1
+    for match in _C_LIKE_TOKEN.finditer(code):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == "preprocessor":
+            tokens.append(CodeToken("#" + text[1:].strip(), line))
+        elif kind not in ("comment", "space"):
+            tokens.append(CodeToken(text, line))
+        line += text.count("\n")
+    return tokens
+
+
+def _python_tokens(code: str) -> Optional[List[CodeToken]]:
+    """Tokenize Python with `tokenize`; None if the source cannot be tokenized."""
+    markers = {tokenize.INDENT: "<INDENT>", tokenize.DEDENT: "<DEDENT>", tokenize.NEWLINE: "<NEWLINE>"}
+    skipped = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER}
+    tokens = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type in skipped:
+                continue
+            tokens.append(CodeToken(markers.get(tok.type, tok.string), tok.start[0]))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return None
+    return tokens
+
+
+def normalize_code(code: str, language: str) -> List[CodeToken]:
+    """Return the significant token stream of `code` (no comments or formatting)."""
+    if language == "python":
+        tokens = _python_tokens(code)
+        if tokens is not None:
+            return tokens
+    return _c_like_tokens(code)
+
+
+def fingerprint_tokens(tokens: List[CodeToken]) -> str:
+    """Stable hash of a token stream."""
+    digest = hashlib.sha256()
+    for token in tokens:
+        digest.update(token.text.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def token_index_for_line(tokens: List[CodeToken], line: Optional[int]) -> Optional[int]:
+    """Index of the first token on or after `line`, to re-anchor highlights across formatting."""
+    if line is None:
+        return None
+    for index, token in enumerate(tokens):
+        if token.line >= line:
+            return index
+    return None
+
+
+def line_for_token_index(tokens: List[CodeToken], index: Optional[int]) -> Optional[int]:
+    """Inverse of token_index_for_line for another formatting of the same code."""
+    if index is None or index >= len(tokens):
+        return None
+    return tokens[index].line
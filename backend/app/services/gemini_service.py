@@ -2,9 +2,15 @@
 import asyncio
 import logging
 import json
-from typing import Dict, Any, Optional, Union, List
-from google import genai
+import time
+from typing import AsyncIterator, Dict, Any, Optional, Union, List
+import httpx
+from google.genai import types
 from app.config import settings
+from app.services.metrics import metrics
+from app.services.key_pool import ApiKey, key_pool, NoHealthyKeys
+from app.services.retry_policy import retry_policy, classify, OutputError
+from app.services.shutdown import shutdown
 
 logger = logging.getLogger(__name__)
 
@@ -18,15 +24,117 @@ class GeminiServiceError(Exception):
         super().__init__(self.message)
 
 
+class GeminiHTTPError(Exception):
+    """Non-2xx response from the Gemini REST API.
+    
+    `failover` marks a key-specific failure (revoked/forbidden key) that
+    another healthy key can retry.
+    """
+    def __init__(
+        self,
+        status_code: int,
+        message: str,
+        status: Optional[str] = None,
+        retry_after: Optional[float] = None,
+        failover: bool = False
+    ):
+        self.status_code = status_code
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+        self.failover = failover
+        super().__init__(f"{status_code} {status or ''}: {message}")
+
+
+_json_decoder = json.JSONDecoder()
+
+# Truncated responses are retried with a higher token limit up to this ceiling
+_MAX_OUTPUT_TOKENS = 30000
+
+# Final failure kind -> (user-facing message, retryable by the client)
+_ERROR_MESSAGES = {
+    "rate_limited": ("خدمة الذكاء الاصطناعي مشغولة. انتظر دقيقة وحاول مرة أخرى.", True),
+    "unavailable": ("خدمة الذكاء الاصطناعي مشغولة. انتظر دقيقة وحاول مرة أخرى.", True),
+    "auth": ("مشكلة في التوثيق. اتصل بالمسؤول.", False),
+    "timeout": ("فشل الاتصال. تحقق من الإنترنت.", True),
+    "network": ("فشل الاتصال. تحقق من الإنترنت.", True),
+    "safety": ("المحتوى لا يتوافق مع سياسة الاستخدام.", False),
+    "too_long": ("الاستجابة طويلة جداً. حاول تبسيط فكرة المشروع.", False),
+    "bad_request": ("فشل في توليد الاستجابة. حاول مرة أخرى.", False),
+    "invalid_json": ("تعذّرت قراءة استجابة الذكاء الاصطناعي. حاول مرة أخرى.", False),
+    "empty": ("لم تُرجع خدمة الذكاء الاصطناعي أي استجابة. حاول مرة أخرى.", False),
+}
+
+
+def parse_json_array_prefix(text: str) -> List[Any]:
+    """
+    Return every fully closed element of a (possibly truncated) JSON array.
+
+    Elements are decoded one at a time, so a response cut off by MAX_TOKENS
+    still yields the items completed before the cut. Returns [] if `text`
+    does not start with an array.
+    """
+    items: List[Any] = []
+    end = len(text)
+    pos = len(text) - len(text.lstrip())
+    if pos >= end or text[pos] != '[':
+        return items
+    pos += 1
+    while True:
+        while pos < end and text[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= end or text[pos] == ']':
+            return items
+        try:
+            item, pos = _json_decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            return items  # truncated inside this element
+        if pos >= end and not isinstance(item, (dict, list)):
+            return items  # a scalar at the cut may itself be cut short
+        items.append(item)
+
+
+def retry_after_seconds(http_response: httpx.Response, error: Dict[str, Any]) -> Optional[float]:
+    """Server retry hint from the Retry-After header or a google.rpc.RetryInfo detail."""
+    header = http_response.headers.get('retry-after')
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            pass
+    for detail in error.get('details') or []:
+        if isinstance(detail, dict) and str(detail.get('@type', '')).endswith('RetryInfo'):
+            try:
+                return max(0.0, float(str(detail.get('retryDelay', '')).rstrip('s')))
+            except ValueError:
+                return None
+    return None
+
+
 class GeminiService:
     """Wrapper for Google Gemini API with error handling and rate limiting."""
     
     def __init__(self):
-        """Initialize Gemini client with API key from environment."""
+        """Initialize one async HTTP client per pooled API key."""
         try:
-            self.client = genai.Client(api_key=settings.google_api_key)
             self.model = settings.gemini_model
-            logger.info(f"✅ Gemini client initialized: {self.model}")
+            # Native async transport: cancelling the awaiting task closes the
+            # connection, so upstream generation stops with the client. The
+            # read timeout bounds calls nobody can cancel (background work);
+            # it raises httpx.ReadTimeout, retried as a "timeout" failure.
+            timeout = httpx.Timeout(
+                settings.request_timeout,
+                read=settings.gemini_read_timeout_seconds
+            )
+            self.clients = {
+                key.label: httpx.AsyncClient(
+                    base_url=settings.gemini_base_url,
+                    headers={'x-goog-api-key': key.api_key},
+                    timeout=timeout
+                )
+                for key in key_pool.keys
+            }
+            logger.info(f"✅ Gemini client initialized: {self.model} ({len(self.clients)} API key(s))")
         except Exception as e:
             logger.error(f"❌ Failed to initialize Gemini: {e}")
             raise GeminiServiceError(
@@ -38,23 +146,167 @@ class GeminiService:
     async def health_check(self) -> bool:
         """Verify API connectivity."""
         try:
-            # Run synchronous call in thread pool to avoid blocking event loop
-            response = await asyncio.to_thread(
-                self.client.models.generate_content,
-                model=self.model,
-                contents="Say OK",
-                config={'max_output_tokens': 10}
+            response = await self._generate_content(
+                "Say OK",
+                {'maxOutputTokens': 10},
+                operation="health_check"
             )
             return bool(response.text)
         except Exception as e:
             raise GeminiServiceError("Health check failed", retryable=True, original_error=e)
     
+    async def aclose(self) -> None:
+        """Close the underlying HTTP connection pools."""
+        for client in self.clients.values():
+            await client.aclose()
+    
+    async def _generate_content(
+        self,
+        prompt: str,
+        config: Dict[str, Any],
+        operation: str
+    ) -> types.GenerateContentResponse:
+        """
+        Call models.generateContent and record latency/token metrics.
+        
+        If the awaiting task is cancelled the in-flight request is aborted and
+        the estimated work saved is reported under `gemini.cancelled.*`.
+        """
+        with shutdown.track():
+            started = time.monotonic()
+            key = None
+            try:
+                key = await self._acquire_key()
+                started = time.monotonic()
+                http_response = await self.clients[key.label].post(
+                    f"/v1beta/models/{key.model}:generateContent",
+                    json={
+                        'contents': [{'role': 'user', 'parts': [{'text': prompt}]}],
+                        'generationConfig': config
+                    }
+                )
+            except asyncio.CancelledError:
+                elapsed = time.monotonic() - started
+                self._record_cancellation(operation, config.get('maxOutputTokens', 0), elapsed)
+                raise
+            finally:
+                if key is not None:
+                    key_pool.release(key)
+        
+            if http_response.status_code != 200:
+                self._raise_http_error(key, http_response)
+        
+            response = types.GenerateContentResponse.model_validate(http_response.json())
+            metrics.observe(f"gemini.latency_seconds.{operation}", time.monotonic() - started)
+            self._record_usage(key, response, operation)
+            return response
+    
+    async def _stream_content(
+        self,
+        prompt: str,
+        config: Dict[str, Any],
+        operation: str
+    ) -> AsyncIterator[types.GenerateContentResponse]:
+        """
+        Call models.streamGenerateContent (server-sent events) and yield each
+        partial response as it arrives. Closing the generator aborts the call.
+        """
+        with shutdown.track():
+            started = time.monotonic()
+            key = None
+            try:
+                key = await self._acquire_key()
+                started = time.monotonic()
+                async with self.clients[key.label].stream(
+                    "POST",
+                    f"/v1beta/models/{key.model}:streamGenerateContent",
+                    params={'alt': 'sse'},
+                    json={
+                        'contents': [{'role': 'user', 'parts': [{'text': prompt}]}],
+                        'generationConfig': config
+                    }
+                ) as http_response:
+                    if http_response.status_code != 200:
+                        await http_response.aread()
+                        self._raise_http_error(key, http_response)
+                    first = True
+                    async for line in http_response.aiter_lines():
+                        if not line.startswith('data:'):
+                            continue
+                        response = types.GenerateContentResponse.model_validate_json(line[5:])
+                        if first:
+                            metrics.observe(f"gemini.first_chunk_seconds.{operation}", time.monotonic() - started)
+                            first = False
+                        self._record_usage(key, response, operation)
+                        yield response
+            except (asyncio.CancelledError, GeneratorExit):
+                elapsed = time.monotonic() - started
+                self._record_cancellation(operation, config.get('maxOutputTokens', 0), elapsed)
+                raise
+            finally:
+                if key is not None:
+                    key_pool.release(key)
+            metrics.observe(f"gemini.latency_seconds.{operation}", time.monotonic() - started)
+    
+    @staticmethod
+    async def _acquire_key() -> ApiKey:
+        try:
+            return await key_pool.acquire()
+        except NoHealthyKeys as e:
+            raise GeminiHTTPError(429, str(e), status='RESOURCE_EXHAUSTED', retry_after=e.retry_after)
+    
+    @staticmethod
+    def _raise_http_error(key: ApiKey, http_response: httpx.Response) -> None:
+        """Record the failure against `key` and raise it as GeminiHTTPError."""
+        try:
+            error = http_response.json().get('error', {})
+        except ValueError:
+            error = {}
+        retry_after = retry_after_seconds(http_response, error)
+        key_pool.record(key, http_response.status_code, retry_after)
+        raise GeminiHTTPError(
+            http_response.status_code,
+            error.get('message') or http_response.text[:200],
+            status=error.get('status'),
+            retry_after=key_pool.retry_hint(key, retry_after),
+            failover=http_response.status_code in (401, 403) and key_pool.can_fail_over(key)
+        )
+    
+    @staticmethod
+    def _record_usage(key: ApiKey, response: types.GenerateContentResponse, operation: str) -> None:
+        # Streamed calls only report usage on the final chunk
+        if response.usage_metadata and response.usage_metadata.candidates_token_count and (
+            not response.candidates or response.candidates[0].finish_reason is not None
+        ):
+            metrics.observe(f"gemini.output_tokens.{operation}", response.usage_metadata.candidates_token_count)
+            key_pool.record_tokens(key, response.usage_metadata.candidates_token_count)
+    
+    def _record_cancellation(self, operation: str, max_output_tokens: int, elapsed: float = 0.0) -> None:
+        """Estimate tokens and seconds not spent because a call was cancelled."""
+        expected_seconds = metrics.average(f"gemini.latency_seconds.{operation}")
+        expected_tokens = metrics.average(f"gemini.output_tokens.{operation}", default=max_output_tokens)
+        metrics.increment(f"gemini.cancelled.calls.{operation}")
+        metrics.increment("gemini.cancelled.tokens_saved", expected_tokens)
+        metrics.increment("gemini.cancelled.seconds_saved", max(0.0, expected_seconds - elapsed))
+        logger.info(f"🛑 Cancelled {operation} call after {elapsed:.1f}s")
+    
+    async def _sleep_before_retry(self, wait_time: float, operation: str, max_output_tokens: int) -> None:
+        """Retry backoff that counts the skipped attempt as saved work if cancelled."""
+        started = time.monotonic()
+        try:
+            await asyncio.sleep(wait_time)
+        except asyncio.CancelledError:
+            metrics.increment("gemini.cancelled.seconds_saved", max(0.0, wait_time - (time.monotonic() - started)))
+            self._record_cancellation(operation, max_output_tokens)
+            raise
+    
     async def generate_json(
         self,
         prompt: str,
         temperature: float = 0.7,
         max_output_tokens: int = 4096,
-        retry_count: int = 0
+        operation: str = "generate",
+        salvage_array: bool = False
     ) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
         """
         Generate JSON response with retry logic.
@@ -62,251 +314,206 @@ class GeminiService:
         Args:
             prompt: Complete prompt text
             temperature: Randomness (0.0-1.0)
-            max_output_tokens: Max response tokens
-            retry_count: Internal retry counter
+            max_output_tokens: Max response tokens (raised on truncated retries)
+            operation: Metrics label for the calling endpoint
+            salvage_array: For array responses, return the complete items of a
+                truncated/invalid array instead of retrying the whole call
+                (the caller asks for whatever is missing)
         
         Returns:
             Parsed JSON dictionary
         """
-        try:
-            logger.debug(f"Calling Gemini: temp={temperature}, max_tokens={max_output_tokens}")
-            logger.debug(f"Prompt preview: {prompt[:100]}...")
+        limit = max_output_tokens
+        
+        async def attempt(retry: int) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+            nonlocal limit
+            logger.debug("Calling Gemini: temp=%s, max_tokens=%s", temperature, limit)
+            logger.debug("Prompt preview: %.100s...", prompt)
             
-            # Run synchronous call in thread pool to avoid blocking event loop
-            response = await asyncio.to_thread(
-                self.client.models.generate_content,
-                model=self.model,
-                contents=prompt,
-                config={
+            response = await self._generate_content(
+                prompt,
+                {
                     'temperature': temperature,
-                    'max_output_tokens': max_output_tokens,
-                    'response_mime_type': 'application/json'
-                }
+                    'maxOutputTokens': limit,
+                    'responseMimeType': 'application/json'
+                },
+                operation=operation
             )
+            text = response.text or ""
             
-            # Validate response exists
-            if not response or not hasattr(response, 'text'):
-                logger.error("❌ Gemini returned invalid response object")
-                raise GeminiServiceError(
-                    "AI service returned invalid response",
-                    retryable=True,
-                    original_error=None
-                )
-            
-            # Check for safety blocks or finish reasons
-            if hasattr(response, 'candidates') and response.candidates:
-                candidate = response.candidates[0]
-                
-                # Check finish reason
-                if hasattr(candidate, 'finish_reason'):
-                    finish_reason = str(candidate.finish_reason)
-                    logger.debug(f"Finish reason: {finish_reason}")
-                    
-                    if 'SAFETY' in finish_reason.upper():
-                        logger.error(f"❌ Content blocked by safety filters: {finish_reason}")
-                        raise GeminiServiceError(
-                            "المحتوى لا يتوافق مع سياسة الاستخدام.",
-                            retryable=False,
-                            original_error=None
-                        )
-                    elif 'MAX_TOKENS' in finish_reason.upper() or 'LENGTH' in finish_reason.upper():
-                        logger.warning(f"⚠️ Response truncated: {finish_reason}")
-                        # Try to extract partial content
+            if self._finished_with(response, 'MAX_TOKENS'):
+                logger.warning(f"⚠️ Response truncated at {limit} tokens ({len(text)} chars)")
+                if text.strip():
+                    if salvage_array:
+                        items = parse_json_array_prefix(text)
+                        if items:
+                            logger.warning(f"♻️ Salvaged {len(items)} complete items from truncated array")
+                            metrics.increment(f"gemini.salvaged_items.{operation}", len(items))
+                            return items
+                    if limit >= _MAX_OUTPUT_TOKENS:
                         try:
-                            if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                                if candidate.content.parts and hasattr(candidate.content.parts[0], 'text'):
-                                    partial_text = candidate.content.parts[0].text
-                                    if partial_text and partial_text.strip():
-                                        logger.warning(f"⚠️ Extracted {len(partial_text)} chars from truncated response")
-                                        # If we already have a high token limit (>= 30000), don't retry
-                                        if max_output_tokens >= 30000:
-                                            logger.warning("⚠️ Already at max token limit (30000), attempting to parse partial JSON")
-                                            # Try to parse what we have
-                                            try:
-                                                result = json.loads(partial_text)
-                                                logger.warning("✅ Successfully parsed truncated JSON")
-                                                return result
-                                            except json.JSONDecodeError:
-                                                logger.error("❌ Truncated JSON is invalid, cannot recover")
-                                                raise GeminiServiceError(
-                                                    "الاستجابة طويلة جداً. حاول تبسيط فكرة المشروع.",
-                                                    retryable=False,
-                                                    original_error=None
-                                                )
-                                        # Only retry if we're below 30000
-                                        if retry_count < settings.max_retries and max_output_tokens < 30000:
-                                            wait_time = (2 ** retry_count) * 1
-                                            new_limit = min(30000, max_output_tokens + 5000)  # Increase by 5k, cap at 30k
-                                            logger.warning(f"⏳ Retrying with increased token limit ({new_limit}) in {wait_time}s (attempt {retry_count+1}/{settings.max_retries})")
-                                            await asyncio.sleep(wait_time)
-                                            return await self.generate_json(prompt, temperature, new_limit, retry_count + 1)
-                        except Exception as extract_error:
-                            logger.error(f"Failed to extract partial content: {extract_error}")
-                    elif finish_reason not in ['STOP', 'FINISH_REASON_STOP', '1', 'FinishReason.STOP']:
-                        logger.warning(f"⚠️ Unusual finish reason: {finish_reason}")
+                            result = json.loads(text)
+                            logger.warning("✅ Successfully parsed truncated JSON")
+                            return result
+                        except json.JSONDecodeError:
+                            raise OutputError("too_long", "Truncated JSON at the token ceiling", retryable=False)
+                    limit = min(_MAX_OUTPUT_TOKENS, limit + 5000)
+                    raise OutputError("truncated", "Response truncated by MAX_TOKENS")
+                limit += 2048
+                raise OutputError("truncated_empty", "MAX_TOKENS before any output")
             
-            # Check if response text is None or empty
-            if response.text is None or response.text.strip() == "":
-                logger.error("❌ Gemini returned empty response")
-                logger.error(f"Response object: {response}")
-                
-                # Check if it was due to MAX_TOKENS
-                if hasattr(response, 'candidates') and response.candidates:
-                    candidate = response.candidates[0]
-                    if hasattr(candidate, 'finish_reason') and 'MAX_TOKENS' in str(candidate.finish_reason).upper():
-                        # MAX_TOKENS with empty content - increase token limit and retry
-                        if retry_count < settings.max_retries:
-                            wait_time = (2 ** retry_count) * 1  # 1s, 2s, 4s
-                            new_token_limit = max_output_tokens + 2048
-                            logger.warning(f"⏳ Retrying empty MAX_TOKENS response with {new_token_limit} tokens in {wait_time}s (attempt {retry_count+1}/{settings.max_retries})")
-                            await asyncio.sleep(wait_time)
-                            return await self.generate_json(prompt, temperature, new_token_limit, retry_count + 1)
-                
-                # Retry if attempts remaining (for other empty response cases)
-                if retry_count < settings.max_retries:
-                    wait_time = (2 ** retry_count) * 1  # 1s, 2s, 4s
-                    logger.warning(f"⏳ Retrying empty response in {wait_time}s (attempt {retry_count+1}/{settings.max_retries})")
-                    await asyncio.sleep(wait_time)
-                    # Increase token limit for retry
-                    return await self.generate_json(prompt, temperature, max_output_tokens + 1024, retry_count + 1)
-                else:
-                    raise GeminiServiceError(
-                        "AI service returned empty response after retries",
-                        retryable=False,
-                        original_error=None
-                    )
+            if not text.strip():
+                limit += 1024
+                raise OutputError("empty", "Gemini returned empty response")
             
-            # Parse JSON
             try:
-                result = json.loads(response.text)
+                result = json.loads(text)
                 logger.debug("✅ JSON response parsed successfully")
                 return result
-            except json.JSONDecodeError as e:
-                logger.error(f"Invalid JSON response: {response.text[:200]}")
-                
-                # Retry if attempts remaining
-                if retry_count < settings.max_retries:
-                    wait_time = (2 ** retry_count) * 1  # 1s, 2s, 4s
-                    logger.warning(f"⏳ Retrying invalid JSON in {wait_time}s (attempt {retry_count+1}/{settings.max_retries})")
-                    await asyncio.sleep(wait_time)
-                    return await self.generate_json(prompt, temperature, max_output_tokens, retry_count + 1)
-                else:
-                    raise GeminiServiceError(
-                        "AI returned invalid JSON after retries",
-                        retryable=False,
-                        original_error=e
-                    )
+            except json.JSONDecodeError:
+                logger.error(f"Invalid JSON response: {text[:200]}")
+                if salvage_array:
+                    items = parse_json_array_prefix(text)
+                    if items:
+                        logger.warning(f"♻️ Salvaged {len(items)} complete items from invalid array")
+                        metrics.increment(f"gemini.salvaged_items.{operation}", len(items))
+                        return items
+                raise OutputError("invalid_json", "Gemini returned invalid JSON")
         
+        try:
+            return await retry_policy.run(
+                operation,
+                attempt,
+                sleep=lambda delay: self._sleep_before_retry(delay, operation, limit)
+            )
         except Exception as e:
-            error_msg = str(e).lower()
-            
-            # Rate limiting (429)
-            if '429' in error_msg or 'rate limit' in error_msg or 'quota' in error_msg:
-                if retry_count < settings.max_retries:
-                    wait_time = (2 ** retry_count) * 2  # 2s, 4s, 8s
-                    logger.warning(f"⏳ Rate limited. Retrying in {wait_time}s (attempt {retry_count+1}/{settings.max_retries})")
-                    await asyncio.sleep(wait_time)
-                    return await self.generate_json(prompt, temperature, max_output_tokens, retry_count + 1)
-                else:
-                    raise GeminiServiceError(
-                        "خدمة الذكاء الاصطناعي مشغولة. انتظر دقيقة وحاول مرة أخرى.",
-                        retryable=True,
-                        original_error=e
-                    )
-            
-            # Auth errors (401/403)
-            elif '401' in error_msg or '403' in error_msg or 'api key' in error_msg:
-                raise GeminiServiceError(
-                    "مشكلة في التوثيق. اتصل بالمسؤول.",
-                    retryable=False,
-                    original_error=e
-                )
-            
-            # Network/timeout
-            elif 'timeout' in error_msg or 'connection' in error_msg:
-                raise GeminiServiceError(
-                    "فشل الاتصال. تحقق من الإنترنت.",
-                    retryable=True,
-                    original_error=e
-                )
-            
-            # Safety blocks
-            elif 'safety' in error_msg or 'blocked' in error_msg:
-                raise GeminiServiceError(
-                    "المحتوى لا يتوافق مع سياسة الاستخدام.",
-                    retryable=False,
-                    original_error=e
-                )
-            
-            # Generic error
-            else:
-                logger.error(f"Unexpected error: {e}")
-                raise GeminiServiceError(
-                    "فشل في توليد الاستجابة. حاول مرة أخرى.",
-                    retryable=True,
-                    original_error=e
-                )
+            raise self._service_error(e)
     
     async def generate_text(
         self,
         prompt: str,
         temperature: float = 0.7,
         max_output_tokens: int = 1000,
-        retry_count: int = 0
+        operation: str = "generate"
     ) -> str:
         """Generate plain text response."""
-        try:
-            # Run synchronous call in thread pool to avoid blocking event loop
-            response = await asyncio.to_thread(
-                self.client.models.generate_content,
-                model=self.model,
-                contents=prompt,
-                config={
+        limit = max_output_tokens
+        
+        async def attempt(retry: int) -> str:
+            nonlocal limit
+            response = await self._generate_content(
+                prompt,
+                {
                     'temperature': temperature,
-                    'max_output_tokens': max_output_tokens
-                }
+                    'maxOutputTokens': limit
+                },
+                operation=operation
             )
+            text = (response.text or "").strip()
             
-            # Check for MAX_TOKENS finish reason
-            if hasattr(response, 'candidates') and response.candidates:
-                candidate = response.candidates[0]
-                if hasattr(candidate, 'finish_reason') and 'MAX_TOKENS' in str(candidate.finish_reason).upper():
-                    logger.warning(f"⚠️ Text response truncated: MAX_TOKENS")
-                    # If we have partial content, return it, otherwise retry with higher limit
-                    if response.text and response.text.strip():
-                        logger.warning(f"⚠️ Returning partial response ({len(response.text)} chars)")
-                        return response.text.strip()
-                    elif retry_count < settings.max_retries:
-                        wait_time = (2 ** retry_count) * 1
-                        new_token_limit = max_output_tokens + 1024
-                        logger.warning(f"⏳ Retrying with {new_token_limit} tokens in {wait_time}s (attempt {retry_count+1}/{settings.max_retries})")
-                        await asyncio.sleep(wait_time)
-                        return await self.generate_text(prompt, temperature, new_token_limit, retry_count + 1)
+            if self._finished_with(response, 'MAX_TOKENS'):
+                logger.warning(f"⚠️ Text response truncated: MAX_TOKENS")
+                # Partial text is still useful; without any, retry with a higher limit
+                if text:
+                    logger.warning(f"⚠️ Returning partial response ({len(text)} chars)")
+                    return text
+                limit += 1024
+                raise OutputError("truncated_empty", "MAX_TOKENS before any output")
             
-            # Validate response is not None or empty
-            if not response or not hasattr(response, 'text') or response.text is None or response.text.strip() == "":
+            if not text:
                 logger.error("Gemini returned empty/None text response")
-                if retry_count < settings.max_retries:
-                    wait_time = (2 ** retry_count) * 1
-                    logger.warning(f"⏳ Retrying empty text response in {wait_time}s (attempt {retry_count+1}/{settings.max_retries})")
-                    await asyncio.sleep(wait_time)
-                    return await self.generate_text(prompt, temperature, max_output_tokens + 1024, retry_count + 1)
-                else:
-                    raise GeminiServiceError(
-                        "AI service returned empty response",
-                        retryable=True,
-                        original_error=None
-                    )
-            
-            return response.text.strip()
+                limit += 1024
+                raise OutputError("empty", "Gemini returned empty response")
+            return text
+        
+        try:
+            return await retry_policy.run(
+                operation,
+                attempt,
+                sleep=lambda delay: self._sleep_before_retry(delay, operation, limit)
+            )
         except Exception as e:
-            if retry_count < settings.max_retries:
-                wait_time = (2 ** retry_count) * 1
-                logger.warning(f"⏳ Retrying text generation error in {wait_time}s (attempt {retry_count+1}/{settings.max_retries})")
-                await asyncio.sleep(wait_time)
-                return await self.generate_text(prompt, temperature, max_output_tokens + 1024, retry_count + 1)
-            raise GeminiServiceError(
-                "فشل في توليد النص.",
-                retryable=True,
-                original_error=e
+            raise self._service_error(e, default_message="فشل في توليد النص.")
+    
+    async def stream_text(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        max_output_tokens: int = 1000,
+        operation: str = "generate"
+    ) -> AsyncIterator[str]:
+        """
+        Generate plain text, yielding chunks as the model produces them.
+        
+        Failures before the first chunk are retried like generate_text; once
+        text has been sent, a failure ends the stream with GeminiServiceError.
+        """
+        config = {'temperature': temperature, 'maxOutputTokens': max_output_tokens}
+        
+        async def attempt(retry: int):
+            stream = self._stream_content(prompt, config, operation)
+            try:
+                async for response in stream:
+                    self._finished_with(response, 'MAX_TOKENS')
+                    if response.text:
+                        return response.text, stream
+            except BaseException:
+                await stream.aclose()
+                raise
+            config['maxOutputTokens'] += 1024
+            raise OutputError("empty", "Gemini returned empty response")
+        
+        try:
+            first, stream = await retry_policy.run(
+                operation,
+                attempt,
+                sleep=lambda delay: self._sleep_before_retry(delay, operation, config['maxOutputTokens'])
             )
+        except Exception as e:
+            raise self._service_error(e, default_message="فشل في توليد النص.")
+        
+        try:
+            yield first
+            async for response in stream:
+                if self._finished_with(response, 'MAX_TOKENS'):
+                    logger.warning("⚠️ Streamed text truncated: MAX_TOKENS")
+                if response.text:
+                    yield response.text
+        except (GeminiServiceError, asyncio.CancelledError, GeneratorExit):
+            raise
+        except Exception as e:
+            raise self._service_error(e, default_message="فشل في توليد النص.")
+        finally:
+            await stream.aclose()
+    
+    @staticmethod
+    def _finished_with(response: types.GenerateContentResponse, reason: str) -> bool:
+        """
+        True if the first candidate stopped for `reason`.
+        
+        A SAFETY stop is raised here as a non-retryable output error.
+        """
+        if not response.candidates or response.candidates[0].finish_reason is None:
+            return False
+        finish_reason = str(response.candidates[0].finish_reason).upper()
+        logger.debug("Finish reason: %s", finish_reason)
+        if 'SAFETY' in finish_reason:
+            logger.error(f"❌ Content blocked by safety filters: {finish_reason}")
+            raise OutputError("safety", "Content blocked by safety filters", retryable=False)
+        return reason in finish_reason
+    
+    @staticmethod
+    def _service_error(
+        error: Exception,
+        default_message: str = "فشل في توليد الاستجابة. حاول مرة أخرى."
+    ) -> GeminiServiceError:
+        """User-facing error for the final failure of a call."""
+        if isinstance(error, GeminiServiceError):
+            return error
+        classification = classify(error)
+        message, retryable = _ERROR_MESSAGES.get(classification.kind, (default_message, True))
+        if classification.kind == "unexpected":
+            logger.error(f"Unexpected error: {error}")
+        else:
+            logger.error(f"❌ Gemini call failed ({classification.kind}): {error}")
+        return GeminiServiceError(message, retryable=retryable, original_error=error)
@@ -0,0 +1,260 @@
+"""Multiplexed WebSocket channel between the project IDE and the backend."""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.shutdown import shutdown
+
+logger = logging.getLogger(__name__)
+
+# WebSocket close codes 1013 "Try Again Later" and 1012 "Service Restart"
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_SERVICE_RESTART = 1012
+CLOSE_POLICY_VIOLATION = 1008
+
+Handler = Callable[["IdeChannel", str, Dict[str, Any]], Awaitable[None]]
+
+
+class _ClientNotReading(Exception):
+    """The client sends frames but no longer reads the replies."""
+
+
+class ChannelError(Exception):
+    """Failure of one message, reported to the client as an `error` frame."""
+    def __init__(self, error: str, message: str, retryable: bool = False):
+        self.error = error
+        self.message = message
+        self.retryable = retryable
+        super().__init__(message)
+
+
+class ChannelSlots:
+    """Bound on concurrently open channels in this worker."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+
+    def try_acquire(self) -> bool:
+        if self.active >= self.limit:
+            return False
+        self.active += 1
+        return True
+
+    def release(self) -> None:
+        self.active -= 1
+
+
+channel_slots = ChannelSlots(settings.ws_max_sessions)
+
+
+class IdeChannel:
+    """
+    One IDE session over one WebSocket.
+
+    Client frames are JSON objects with a `type` and, for work, a
+    client-chosen `id`. Each message runs as its own task, so a long chat
+    answer does not hold up a review, and `{"type": "cancel", "id": ...}`
+    cancels it (aborting the upstream call). Replies carry the same `id`:
+    `chunk` frames while text streams, then `result`, `error` or
+    `cancelled`.
+
+    Outgoing frames go through a bounded queue drained by one writer, so a
+    client that stops reading pauses the producers instead of growing
+    memory. Replies the receive loop makes itself (pong, ping, rejections)
+    use a separate bounded queue that the writer drains first and that
+    never blocks, so cancel frames are still read while the producers wait;
+    a client that fills even that queue is not reading and is disconnected.
+    At most `ws_max_inflight` messages run at once per channel.
+    An idle client is pinged every `ws_keepalive_seconds` and dropped after
+    `ws_idle_timeout_seconds` without any frame from it.
+    """
+
+    def __init__(self, websocket: WebSocket, session_id: str, handlers: Dict[str, Handler]):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.handlers = handlers
+        self.state: Dict[str, Any] = {}  # per-session context owned by the handlers
+        self._outbox: asyncio.Queue = asyncio.Queue(settings.ws_send_queue_size)
+        self._replies: asyncio.Queue = asyncio.Queue(settings.ws_send_queue_size)
+        self._ready = asyncio.Event()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._closed = False
+
+    async def send(self, frame: Dict[str, Any]) -> None:
+        """Queue a frame for the client; waits while the client is not reading."""
+        if not self._closed:
+            await self._outbox.put(frame)
+            self._ready.set()
+
+    def _reply(self, frame: Dict[str, Any]) -> None:
+        """Queue a frame from the receive loop without waiting for the writer."""
+        try:
+            self._replies.put_nowait(frame)
+        except asyncio.QueueFull:
+            raise _ClientNotReading() from None
+        self._ready.set()
+
+    async def send_chunk(self, message_id: str, text: str) -> None:
+        await self.send({"type": "chunk", "id": message_id, "text": text})
+
+    async def send_result(self, message_id: str, data: Dict[str, Any]) -> None:
+        await self.send({"type": "result", "id": message_id, "data": data})
+
+    async def _write(self) -> None:
+        try:
+            while True:
+                if not self._replies.empty():
+                    frame = self._replies.get_nowait()
+                elif not self._outbox.empty():
+                    frame = self._outbox.get_nowait()
+                else:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                await self.websocket.send_text(orjson.dumps(frame, default=str).decode("utf-8"))
+        except Exception:
+            return  # the client went away; run() notices the writer has stopped
+
+    async def run(self) -> None:
+        """Serve the channel until the client leaves or goes idle."""
+        writer = asyncio.create_task(self._write())
+        receive: Optional[asyncio.Future] = None
+        last_received = time.monotonic()
+        try:
+            while not writer.done():
+                if receive is None:
+                    receive = asyncio.ensure_future(self.websocket.receive())
+                done, _ = await asyncio.wait({receive, writer}, timeout=settings.ws_keepalive_seconds,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if receive not in done:
+                    if writer in done:
+                        break
+                    if time.monotonic() - last_received >= settings.ws_idle_timeout_seconds:
+                        metrics.increment("ws.idle_closed")
+                        await self.websocket.close(code=1001, reason="idle")
+                        break
+                    self._reply({"type": "ping"})
+                    continue
+                message, receive = receive.result(), None
+                if message["type"] == "websocket.disconnect":
+                    break
+                last_received = time.monotonic()
+                self._dispatch(message.get("text") or message.get("bytes") or b"")
+        except WebSocketDisconnect:
+            pass
+        except _ClientNotReading:
+            metrics.increment("ws.not_reading_closed")
+            logger.warning(f"🐌 IDE channel {self.session_id} closed: the client stopped reading")
+            writer.cancel()
+            try:
+                await asyncio.wait_for(
+                    self.websocket.close(code=CLOSE_POLICY_VIOLATION, reason="Client is not reading"),
+                    timeout=1.0
+                )
+            except Exception:
+                pass
+        finally:
+            self._closed = True
+            for task in self._tasks.values():
+                task.cancel()
+            if receive is not None:
+                receive.cancel()
+            writer.cancel()
+
+    def _dispatch(self, raw) -> None:
+        try:
+            frame = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            frame = None
+        if not isinstance(frame, dict):
+            self._reply({"type": "error", "id": None, "error": "invalid_message",
+                         "message": "Frames must be JSON objects", "retryable": False})
+            return
+        kind = frame.get("type")
+        message_id = frame.get("id")
+        if kind == "ping":
+            self._reply({"type": "pong"})
+            return
+        if kind == "pong":
+            return
+        if kind == "cancel":
+            task = self._tasks.get(message_id) if isinstance(message_id, str) else None
+            if task is not None:
+                task.cancel()
+            return
+        if kind not in self.handlers or not isinstance(message_id, str) or not 0 < len(message_id) <= 100:
+            self._reply({"type": "error", "id": message_id if isinstance(message_id, str) else None,
+                         "error": "invalid_message", "message": f"Unknown type or missing id: {kind!r}",
+                         "retryable": False})
+            return
+        if message_id in self._tasks:
+            self._reply({"type": "error", "id": message_id, "error": "duplicate_id",
+                         "message": "A message with this id is still running", "retryable": False})
+            return
+        if shutdown.draining:
+            self._reply({"type": "error", "id": message_id, "error": "shutting_down",
+                         "message": "الخادم يعيد التشغيل. أعد الاتصال وحاول مرة أخرى.", "retryable": True})
+            return
+        if len(self._tasks) >= settings.ws_max_inflight:
+            metrics.increment("ws.rejected_inflight")
+            self._reply({"type": "error", "id": message_id, "error": "too_many_in_flight",
+                         "message": f"At most {settings.ws_max_inflight} messages may run at once",
+                         "retryable": True})
+            return
+        metrics.increment(f"ws.messages.{kind}")
+        self._tasks[message_id] = asyncio.create_task(self._run(kind, message_id, frame))
+
+    async def _run(self, kind: str, message_id: str, frame: Dict[str, Any]) -> None:
+        try:
+            await self.handlers[kind](self, message_id, frame)
+        except asyncio.CancelledError:
+            metrics.increment(f"ws.cancelled.{kind}")
+            await self.send({"type": "cancelled", "id": message_id})
+        except ValidationError as e:
+            await self.send({"type": "error", "id": message_id, "error": "validation_error",
+                             "message": "البيانات المرسلة غير صحيحة", "detail": e.errors(include_url=False),
+                             "retryable": False})
+        except ChannelError as e:
+            await self.send({"type": "error", "id": message_id, "error": e.error,
+                             "message": e.message, "retryable": e.retryable})
+        except Exception as e:
+            logger.error(f"Unexpected error in {kind} message: {e}", exc_info=True)
+            await self.send({"type": "error", "id": message_id, "error": "internal_error",
+                             "message": "حدث خطأ غير متوقع. الرجاء المحاولة لاحقاً.", "retryable": True})
+        finally:
+            self._tasks.pop(message_id, None)
+
+
+async def serve_channel(websocket: WebSocket, session_id: str, handlers: Dict[str, Handler]) -> None:
+    """Accept `websocket` and run an IdeChannel on it, if this worker has room."""
+    # CORS does not cover WebSockets: refuse pages from other sites, which
+    # could otherwise spend the API quota from a student's browser.
+    # Non-browser clients send no Origin.
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in settings.cors_origins:
+        metrics.increment("ws.rejected_origins")
+        logger.warning(f"🚫 IDE channel refused for origin {origin}")
+        await websocket.close(code=CLOSE_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    if shutdown.draining:
+        await websocket.close(code=CLOSE_SERVICE_RESTART, reason="Server restarting, reconnect")
+        return
+    if not channel_slots.try_acquire():
+        metrics.increment("ws.rejected_sessions")
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="Too many sessions, retry later")
+        return
+    metrics.increment("ws.opened")
+    logger.info(f"🔌 IDE channel opened for session {session_id} ({channel_slots.active} active)")
+    try:
+        await IdeChannel(websocket, session_id, handlers).run()
+    finally:
+        channel_slots.release()
+        metrics.increment("ws.closed")
+        logger.info(f"🔌 IDE channel closed for session {session_id}")
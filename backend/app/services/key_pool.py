@@ -0,0 +1,191 @@
+"""Pool of Gemini API keys with per-key budgets, health and usage metrics."""
+import asyncio
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.rate_limiter import TokenBucket
+from app.services.shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+
+class ApiKey(NamedTuple):
+    """One upstream credential; `label` is what logs and metrics show."""
+    label: str
+    api_key: str
+    model: str
+    bucket: TokenBucket
+
+
+class NoHealthyKeys(Exception):
+    """Every key is ejected; `retry_after` is when the first one returns."""
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"All API keys are cooling down for {retry_after:.0f}s")
+
+
+def parse_api_keys() -> List[ApiKey]:
+    """
+    `GOOGLE_API_KEY` plus the comma-separated `GOOGLE_API_KEYS`.
+
+    An entry may pin a model as `key@model`; otherwise `GEMINI_MODEL` is used.
+    Keys from different projects have separate quotas, which is the point.
+    """
+    entries = [settings.google_api_key] + [e for e in settings.google_api_keys.split(",") if e.strip()]
+    keys: List[ApiKey] = []
+    seen = set()
+    for entry in entries:
+        api_key, _, model = entry.strip().partition("@")
+        model = model.strip() or settings.gemini_model
+        if (api_key, model) in seen:
+            continue
+        seen.add((api_key, model))
+        label = f"key{len(keys) + 1}"
+        keys.append(ApiKey(label, api_key, model, TokenBucket(f"gemini.{label}", settings.rate_limit_per_minute)))
+    return keys
+
+
+class KeyPool:
+    """
+    Routes each call to the healthy key with the most remaining budget,
+    then the fewest calls in flight, then in turn; without per-key limits
+    (the default) that spreads calls evenly over the keys.
+
+    A key answering 429 is ejected until its quota resets (Retry-After, or
+    `key_rate_limited_cooldown_seconds`); 401/403 ejects it for
+    `key_forbidden_cooldown_seconds`, unless it is the last healthy key:
+    then the error reaches the caller instead of turning every later call
+    into "busy". Ejections are shared across workers when a shared store
+    is configured.
+    """
+
+    def __init__(self, keys: List[ApiKey]):
+        self.keys = keys
+        self._ejected_until: Dict[str, float] = {}
+        self._in_flight: Dict[str, int] = {key.label: 0 for key in keys}
+        self._turn = 0
+        self._rate_limited_at = 0.0
+
+    def _ejected_for(self, key: ApiKey, now: float) -> float:
+        until = self._ejected_until.get(key.label, 0.0)
+        if shared_store is not None:
+            until = max(until, shared_store.get(f"keypool:ejected:{key.label}") or 0.0)
+        return max(0.0, until - now)
+
+    def _preference(self, healthy: List[ApiKey]) -> List[ApiKey]:
+        """`healthy` best first: most budget, fewest in flight, then whose turn it is."""
+        count = len(self.keys)
+        position = {key.label: index for index, key in enumerate(self.keys)}
+        return sorted(healthy, key=lambda k: (
+            -k.bucket.available(),
+            self._in_flight[k.label],
+            (position[k.label] - self._turn) % count
+        ))
+
+    async def acquire(self) -> ApiKey:
+        """
+        Claim a token from the best key, waiting while every healthy key is
+        at its limit. Pair every acquired key with a `release`.
+        """
+        while True:
+            now = time.time()
+            cooldowns = {key.label: self._ejected_for(key, now) for key in self.keys}
+            healthy = [key for key in self.keys if cooldowns[key.label] <= 0]
+            if not healthy:
+                raise NoHealthyKeys(min(cooldowns.values()))
+            waits = []
+            for key in self._preference(healthy):
+                wait = key.bucket.try_acquire()
+                if wait <= 0:
+                    self._in_flight[key.label] += 1
+                    self._turn = (self.keys.index(key) + 1) % len(self.keys)
+                    metrics.increment(f"gemini.keys.{key.label}.calls")
+                    return key
+                waits.append(wait)
+            wait = min(waits)
+            metrics.increment("ratelimit.gemini.throttled")
+            metrics.increment("ratelimit.gemini.wait_seconds", wait)
+            logger.info(f"⏳ All API keys at their rate limit, waiting {wait:.1f}s")
+            await asyncio.sleep(wait)
+
+    def release(self, key: ApiKey) -> None:
+        """The call `acquire` returned `key` for has finished."""
+        self._in_flight[key.label] = max(0, self._in_flight[key.label] - 1)
+
+    def in_flight(self) -> int:
+        """Calls this worker has in flight on any key."""
+        return sum(self._in_flight.values())
+
+    def record(self, key: ApiKey, status_code: int, retry_after: Optional[float] = None) -> None:
+        """Update `key`'s health from an upstream response status."""
+        if status_code == 429:
+            cooldown = retry_after or settings.key_rate_limited_cooldown_seconds
+            self._rate_limited_at = time.monotonic()
+            metrics.increment(f"gemini.keys.{key.label}.rate_limited")
+        elif status_code in (401, 403):
+            cooldown = settings.key_forbidden_cooldown_seconds
+            metrics.increment(f"gemini.keys.{key.label}.forbidden")
+        else:
+            if status_code >= 500:
+                metrics.increment(f"gemini.keys.{key.label}.server_errors")
+            return
+        if len(self.keys) == 1 and status_code == 429:
+            # Nowhere else to send traffic; let the retry policy back off instead
+            return
+        if status_code in (401, 403) and not self.can_fail_over(key):
+            # Ejecting the last healthy key would only hide the auth error
+            # behind "all keys cooling down"; let the caller see it
+            return
+        until = time.time() + cooldown
+        self._ejected_until[key.label] = until
+        if shared_store is not None:
+            shared_store.set(f"keypool:ejected:{key.label}", until, ttl_seconds=cooldown)
+        metrics.increment(f"gemini.keys.{key.label}.ejections")
+        logger.warning(f"🚫 API {key.label} ejected for {cooldown:.0f}s after HTTP {status_code}")
+
+    def can_fail_over(self, key: ApiKey) -> bool:
+        """Whether a healthy key other than `key` could take a call that failed on it."""
+        now = time.time()
+        return any(other is not key and self._ejected_for(other, now) <= 0 for other in self.keys)
+
+    def retry_hint(self, key: ApiKey, retry_after: Optional[float]) -> Optional[float]:
+        """
+        Wait the caller should honour before retrying a call that failed on `key`:
+        none while another key can take it, since `key` is already ejected.
+        """
+        if self.can_fail_over(key):
+            return None
+        return retry_after
+
+    def seconds_since_rate_limited(self) -> float:
+        """Time since this worker last got a 429 on any key (inf if never)."""
+        if not self._rate_limited_at:
+            return float("inf")
+        return time.monotonic() - self._rate_limited_at
+
+    def available_calls(self) -> float:
+        """Calls the healthy keys could make right now without waiting (inf when unlimited)."""
+        now = time.time()
+        return sum(key.bucket.available() for key in self.keys if self._ejected_for(key, now) <= 0)
+
+    def record_tokens(self, key: ApiKey, output_tokens: int) -> None:
+        metrics.increment(f"gemini.keys.{key.label}.output_tokens", output_tokens)
+
+    def snapshot(self) -> List[dict]:
+        """Per-key state for the /metrics endpoint (never the key itself)."""
+        now = time.time()
+        return [
+            {
+                "label": key.label,
+                "model": key.model,
+                "available_tokens": round(key.bucket.available(), 2) if key.bucket.rate_per_minute > 0 else None,
+                "in_flight": self._in_flight[key.label],
+                "ejected_for_seconds": round(self._ejected_for(key, now), 1)
+            }
+            for key in self.keys
+        ]
+
+
+key_pool = KeyPool(parse_api_keys())
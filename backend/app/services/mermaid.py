@@ -0,0 +1,237 @@
+"""Validation and deterministic repair of generated Mermaid flowcharts."""
+import re
+from typing import Dict, List, NamedTuple
+
+_FENCE = re.compile(r"^\s*```[\w-]*\s*$|^\s*```\s*$")
+_HEADER = re.compile(r"^(graph|flowchart)(?:\s+(TD|TB|BT|RL|LR))?\s*(?:;\s*(.*))?$", re.IGNORECASE)
+_ID = re.compile(r"[A-Za-z0-9_]+")
+_WORD_ID = re.compile(r"[^\s\[\](){}<>|&;:\"'-]+")
+_SAFE_LABEL = re.compile(r"^[A-Za-z0-9 _]*$")
+_PASSTHROUGH = re.compile(r"^(classDef|class|style|linkStyle|click|direction|accTitle|accDescr)\b")
+_SUBGRAPH = re.compile(r"^subgraph\b(.*)$")
+# Arrow with an optional |label|; `-- text -->` forms are matched separately
+_LINK = re.compile(r"(<?(?:-{2,}|={2,}|-\.+-?)[>ox]?)\s*(?:\|([^|]*)\|)?")
+_TEXT_LINK = re.compile(r"(--|==|-\.)\s+([^|>]+?)\s+(-{2,}[>ox]?|={2,}[>ox]?|\.-+[>ox]?)")
+_NODE_END = re.compile(r"\s*(?:$|;|&|:::|<?(?:-{2}|={2}|-\.))")
+# (opener, closer), longest openers first
+_SHAPES = [
+    ("(((", ")))"), ("([", "])"), ("[[", "]]"), ("[(", ")]"), ("((", "))"), ("{{", "}}"),
+    ("[/", "/]"), ("[\\", "\\]"), (">", "]"), ("[", "]"), ("(", ")"), ("{", "}"),
+]
+
+
+class ChartError(ValueError):
+    """A flowchart defect that cannot be repaired deterministically."""
+    def __init__(self, line: int, message: str):
+        self.line = line
+        super().__init__(f"line {line}: {message}")
+
+
+class RepairResult(NamedTuple):
+    chart: str
+    fixes: List[str]  # kinds of defects repaired; empty if the chart was valid
+
+
+def quote_label(text: str) -> str:
+    """A label as a Mermaid string; quotes inside it become the #quot; entity."""
+    return '"' + text.strip().replace('"', "#quot;") + '"'
+
+
+class _Statement:
+    """Parses and re-renders one node/edge statement, recording the fixes it needed."""
+
+    def __init__(self, text: str, line: int, ids: Dict[str, str], fixes: List[str]):
+        self.text = text
+        self.pos = 0
+        self.line = line
+        self.ids = ids
+        self.fixes = fixes
+        self.out: List[str] = []
+
+    def _error(self, message: str) -> ChartError:
+        return ChartError(self.line, f"{message} near {self.text[self.pos:self.pos + 20]!r}")
+
+    def _skip_spaces(self) -> None:
+        while self.pos < len(self.text) and self.text[self.pos] in " \t":
+            self.pos += 1
+
+    def _node_id(self) -> str:
+        match = _ID.match(self.text, self.pos)
+        end_match = match and _NODE_END.match(self.text, match.end())
+        shape_follows = match and self.text.startswith(tuple(o for o, _ in _SHAPES), match.end())
+        if match and (end_match or shape_follows):
+            self.pos = match.end()
+            return match.group(0)
+        # Non-ASCII or punctuated ids (often a bare Arabic label) get a generated id
+        word = _WORD_ID.match(self.text, self.pos)
+        if not word:
+            raise self._error("expected a node")
+        self.pos = word.end()
+        # Every use is a fix: a statement kept verbatim would name another node
+        self.fixes.append("node_id")
+        if word.group(0) not in self.ids:
+            self.ids[word.group(0)] = f"n{len(self.ids) + 1}"
+            if not self.text.startswith(tuple(o for o, _ in _SHAPES), self.pos):
+                return f"{self.ids[word.group(0)]}[{quote_label(word.group(0))}]"
+        return self.ids[word.group(0)]
+
+    def _label(self, closer: str) -> str:
+        start = self.pos
+        if self.text.startswith('"', start):
+            end = self.text.find('"', start + 1)
+            if end != -1 and self.text.startswith(closer, end + 1):
+                self.pos = end + 1 + len(closer)
+                return self.text[start:end + 1]
+        # Unquoted (or badly quoted): the closer that ends the node is the
+        # first one followed by a link, `&`, `;`, `:::` or the end of line
+        search = start
+        while True:
+            end = self.text.find(closer, search)
+            if end == -1:
+                raise self._error(f"unclosed node label (expected {closer!r})")
+            if _NODE_END.match(self.text, end + len(closer)):
+                break
+            search = end + 1
+        self.pos = end + len(closer)
+        raw = self.text[start:end]
+        text = raw.strip()
+        if len(text) >= 2 and text[0] == text[-1] == '"':
+            if '"' not in text[1:-1]:
+                return raw
+            text = text[1:-1]
+        if _SAFE_LABEL.match(text) and text:
+            return text
+        self.fixes.append("unquoted_label")
+        return quote_label(text)
+
+    def _node(self) -> None:
+        node = self._node_id()
+        for opener, closer in _SHAPES:
+            if self.text.startswith(opener, self.pos):
+                self.pos += len(opener)
+                node += opener + self._label(closer) + closer
+                break
+        if self.text.startswith(":::", self.pos):
+            match = _ID.match(self.text, self.pos + 3)
+            if not match:
+                raise self._error("expected a class name after :::")
+            node += ":::" + match.group(0)
+            self.pos = match.end()
+        self.out.append(node)
+
+    def _link(self) -> bool:
+        match = _TEXT_LINK.match(self.text, self.pos)
+        if match:
+            opener, text, closer = match.groups()
+            arrow = "-" + closer if opener == "-." else closer
+            self.pos = match.end()
+            self.fixes.append("link_text")
+            self.out.append(f" {arrow}|{quote_label(text)}| ")
+            return True
+        match = _LINK.match(self.text, self.pos)
+        if not match:
+            return False
+        arrow, label = match.groups()
+        self.pos = match.end()
+        if label is None:
+            self.out.append(f" {arrow} ")
+        elif _SAFE_LABEL.match(label.strip()) or (label.strip().startswith('"') and label.strip().endswith('"')):
+            self.out.append(f" {arrow}|{label.strip()}| ")
+        else:
+            self.fixes.append("unquoted_label")
+            self.out.append(f" {arrow}|{quote_label(label)}| ")
+        return True
+
+    def parse(self) -> str:
+        while True:
+            self._skip_spaces()
+            self._node()
+            self._skip_spaces()
+            if self.text.startswith("&", self.pos):
+                self.pos += 1
+                self.out.append(" & ")
+                continue
+            if self.pos >= len(self.text) or self.text.startswith(";", self.pos):
+                return "".join(self.out)
+            if not self._link():
+                raise self._error("expected a link or end of statement")
+
+
+def _statements(line: str) -> List[str]:
+    """Split a line on `;` outside quotes and labels."""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char in "[({":
+            depth += 1
+        elif not quoted and char in "])}":
+            depth = max(0, depth - 1)
+        elif char == ";" and not quoted and depth == 0:
+            parts.append(line[start:i])
+            start = i + 1
+    parts.append(line[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def repair_flowchart(chart: str) -> RepairResult:
+    """
+    Validate a Mermaid flowchart, repairing what can be fixed deterministically:
+    code fences, a missing header, unquoted labels with Arabic or special
+    characters, `-- text -->` links and non-ASCII node ids.
+
+    Raises ChartError when the chart cannot be parsed even after repair.
+    Statements without defects are kept verbatim.
+    """
+    fixes: List[str] = []
+    lines = chart.replace("\r\n", "\n").split("\n")
+    if any(_FENCE.match(line) for line in lines):
+        lines = [line for line in lines if not _FENCE.match(line)]
+        fixes.append("code_fence")
+    while lines and not lines[0].strip() or lines and lines[0].strip().lower() == "mermaid":
+        lines.pop(0)
+    if not lines:
+        raise ChartError(1, "empty chart")
+    header = _HEADER.match(lines[0].strip())
+    if header and header.group(3):
+        # `graph TD; A --> B` on one line
+        lines[0:1] = [lines[0].strip()[:header.start(3)].rstrip("; "), header.group(3)]
+    elif not header:
+        lines.insert(0, "flowchart TD")
+        fixes.append("header")
+        if not any(line.strip() and not line.strip().startswith("%%") for line in lines[1:]):
+            raise ChartError(1, "no flowchart statements")
+
+    ids: Dict[str, str] = {}
+    out = [lines[0]]
+    depth = 0
+    nodes = 0
+    for number, line in enumerate(lines[1:], start=2):
+        stripped = line.strip()
+        indent = line[:len(line) - len(line.lstrip())]
+        if not stripped or stripped.startswith("%%") or _PASSTHROUGH.match(stripped):
+            out.append(line)
+            continue
+        if _SUBGRAPH.match(stripped):
+            depth += 1
+            out.append(line)
+            continue
+        if stripped.rstrip(";") == "end":
+            depth -= 1
+            if depth < 0:
+                raise ChartError(number, "`end` without subgraph")
+            out.append(line)
+            continue
+        rendered = []
+        for statement in _statements(stripped):
+            before = len(fixes)
+            text = _Statement(statement, number, ids, fixes).parse()
+            rendered.append(text if len(fixes) > before else statement)
+            nodes += 1
+        out.append(indent + "; ".join(rendered))
+    if depth:
+        raise ChartError(len(lines), "subgraph without `end`")
+    if not nodes:
+        raise ChartError(1, "no flowchart statements")
+    return RepairResult("\n".join(out).strip() if fixes else chart.strip(), sorted(set(fixes)))
+
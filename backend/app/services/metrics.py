@@ -0,0 +1,57 @@
+"""In-process metrics registry exposed on the /metrics endpoint."""
+import threading
+from collections import defaultdict
+from typing import Dict, Any
+
+
+class Metrics:
+    """Thread-safe counters and running averages."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._averages: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Add `value` to counter `name`."""
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one observation of `name` for its running average."""
+        with self._lock:
+            stats = self._averages.setdefault(name, {"count": 0, "total": 0.0})
+            stats["count"] += 1
+            stats["total"] += value
+
+    def average(self, name: str, default: float = 0.0) -> float:
+        """Return the running average of `name`, or `default` if never observed."""
+        with self._lock:
+            stats = self._averages.get(name)
+            if not stats or not stats["count"]:
+                return default
+            return stats["total"] / stats["count"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a JSON-serialisable copy of all metrics."""
+        with self._lock:
+            return {
+                "counters": {name: round(value, 3) for name, value in sorted(self._counters.items())},
+                "averages": {
+                    name: {
+                        "count": int(stats["count"]),
+                        "mean": round(stats["total"] / stats["count"], 3) if stats["count"] else 0.0
+                    }
+                    for name, stats in sorted(self._averages.items())
+                }
+            }
+
+    def reset(self) -> None:
+        """Clear all metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._averages.clear()
+
+
+# Process-wide registry
+metrics = Metrics()
@@ -0,0 +1,157 @@
+"""Live-worker diagnostics: a sampling profiler and an event-loop stall monitor."""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from types import FrameType
+from typing import Optional
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ProfilerBusy(Exception):
+    """A profile is already running in this worker."""
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_APP_ROOT):
+        filename = os.path.relpath(filename, _APP_ROOT)
+    else:
+        filename = "/".join(filename.replace("\\", "/").split("/")[-2:])
+    # `;` separates frames in the collapsed format
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def collapse_stack(frame: Optional[FrameType]) -> str:
+    """`root;...;leaf` for the stack ending at `frame`."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of every thread at a fixed interval and counts
+    identical stacks. Nothing is hooked into the interpreter, so the cost
+    is one `sys._current_frames()` walk per sample and zero when idle.
+    One profile runs at a time per worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def run(self, seconds: float, interval: float) -> str:
+        """Blocking; profile for `seconds` and return collapsed stacks (`stack count` per line)."""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            own = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            counts: Counter = Counter()
+            samples = 0
+            deadline = time.monotonic() + seconds
+            next_sample = time.monotonic()
+            while next_sample < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    if ident not in names:
+                        names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    thread = names.get(ident, f"thread-{ident}").replace(";", ":").replace(" ", "_")
+                    counts[f"{thread};{collapse_stack(frame)}"] += 1
+                samples += 1
+                next_sample += interval
+                time.sleep(max(0.0, next_sample - time.monotonic()))
+            metrics.increment("profiler.runs")
+            metrics.increment("profiler.samples", samples)
+            return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+        finally:
+            self._lock.release()
+
+    async def profile(self, seconds: float, interval: float) -> str:
+        """Profile from a thread, so the event loop being sampled keeps running."""
+        return await asyncio.to_thread(self.run, seconds, interval)
+
+
+class LoopLagMonitor:
+    """
+    Detects a blocked event loop.
+
+    A task on the loop refreshes a heartbeat every `interval` seconds and
+    records how late it woke up (`loop.lag_seconds`). A watchdog thread
+    checks the heartbeat; when it is older than `threshold`, the loop is
+    stuck in synchronous code, so the watchdog logs the loop thread's
+    current stack once per stall, then the stall's length when it ends.
+    """
+
+    def __init__(self, threshold: float, interval: float):
+        self.threshold = threshold
+        self.interval = interval
+        self._heartbeat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Start monitoring the running loop."""
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+
+    async def _beat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            metrics.observe("loop.lag_seconds", max(0.0, now - expected))
+            self._heartbeat = now
+
+    def _watch(self) -> None:
+        stalled_since: Optional[float] = None
+        while not self._stopped.wait(self.interval):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat
+            if stalled < self.threshold:
+                if stalled_since is not None:
+                    duration = heartbeat - stalled_since
+                    metrics.observe("loop.stall_seconds", duration)
+                    logger.warning("🐢 Event loop unblocked after %.0fms", duration * 1000)
+                    stalled_since = None
+                continue
+            if stalled_since is not None:
+                continue
+            stalled_since = heartbeat
+            metrics.increment("loop.stalls")
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(unavailable)\n"
+            logger.warning("🐢 Event loop blocked for %.0fms, loop thread is at:\n%s", stalled * 1000, stack.rstrip())
+
+
+# Process-wide profiler
+profiler = SamplingProfiler()
@@ -0,0 +1,86 @@
+"""Per-project store for solution code generated in the background."""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from app.services.cache import TTLCache
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_POLL_SECONDS = 0.5
+
+
+class SolutionStore:
+    """
+    Tracks `full_solution_code` generation per project.
+
+    Records are {"status": "pending"|"ready"|"failed", "code": str|None,
+    "message": str|None}. They live in a TTLCache, so with a shared store any
+    worker can serve a solution generated by another one, and without one
+    they survive restarts through the shutdown snapshot. The client keeps
+    its own copy once ready; failed or forgotten solutions are generated
+    again with `start`.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self._records = TTLCache("project_solutions", maxsize, ttl_seconds, persist=True)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    def start(self, project_id: str, work: Callable[[], Awaitable[str]], failure_message: str) -> None:
+        """Run `work` in the background and store its result under `project_id`."""
+        self._records.set(project_id, {"status": "pending", "code": None, "message": None})
+        started = time.monotonic()
+
+        async def run() -> None:
+            try:
+                code = await work()
+            except asyncio.CancelledError:
+                self._records.set(project_id, {"status": "failed", "code": None, "message": failure_message})
+                raise
+            except Exception as e:
+                logger.error(f"❌ Background solution generation failed for {project_id}: {e}")
+                metrics.increment("project.solution.failed")
+                self._records.set(project_id, {"status": "failed", "code": None, "message": failure_message})
+                return
+            metrics.observe("project.solution.seconds", time.monotonic() - started)
+            self._records.set(project_id, {"status": "ready", "code": code, "message": None})
+            logger.info(f"✅ Solution ready for {project_id}")
+
+        task = asyncio.ensure_future(run())
+        self._tasks[project_id] = task
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        task.add_done_callback(lambda _: self._tasks.pop(project_id, None))
+
+    def get(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """Current record for `project_id`, or None if unknown/expired."""
+        return self._records.get(project_id)
+
+    async def wait(self, project_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Return the record once it is no longer pending, or after `timeout` seconds."""
+        task = self._tasks.get(project_id)
+        if task is not None and timeout > 0:
+            # Generated by this worker: wake up as soon as it finishes
+            await asyncio.wait({task}, timeout=timeout)
+            return self.get(project_id)
+
+        deadline = time.monotonic() + timeout
+        record = self.get(project_id)
+        while record is not None and record["status"] == "pending" and time.monotonic() < deadline:
+            await asyncio.sleep(_POLL_SECONDS)
+            record = self.get(project_id)
+        return record
+
+    async def cancel(self) -> None:
+        """Stop this worker's generations, recording them as failed (before the shutdown snapshot)."""
+        tasks = list(self._background)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of solutions still being generated by this worker."""
+        return len(self._background)
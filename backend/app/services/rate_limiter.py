@@ -0,0 +1,61 @@
+"""Upstream request budgets, shared across workers when possible."""
+import asyncio
+import logging
+import math
+import time
+from app.services.metrics import metrics
+from app.services.shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate_per_minute`, holding up to one minute of tokens.
+    
+    Counting upstream calls ourselves queues bursts locally instead of
+    turning them into 429 responses and retry traffic. The bucket is kept
+    as a single "theoretical arrival time" (GCRA), which lets a shared
+    store update it atomically so the budget is global across workers.
+    """
+
+    def __init__(self, name: str, rate_per_minute: int):
+        self.name = name
+        self.rate_per_minute = rate_per_minute
+        self.capacity = float(rate_per_minute)
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._tat = 0.0
+
+    def available(self) -> float:
+        """Tokens that could be claimed right now (inf when unlimited)."""
+        if self.rate_per_minute <= 0:
+            return math.inf
+        if shared_store is not None:
+            backlog = shared_store.bucket_backlog(f"bucket:{self.name}")
+        else:
+            backlog = max(0.0, self._tat - time.time())
+        return self.capacity - backlog / self.interval
+
+    def try_acquire(self) -> float:
+        """Claim a token and return 0, or return seconds until one is available."""
+        if self.rate_per_minute <= 0:
+            return 0.0
+        if shared_store is not None:
+            return shared_store.take_token(f"bucket:{self.name}", self.interval, self.capacity)
+        now = time.time()
+        tat = max(self._tat, now)
+        wait = tat - now - (self.capacity - 1) * self.interval
+        if wait <= 0:
+            self._tat = tat + self.interval
+        return max(0.0, wait)
+
+    async def acquire(self) -> None:
+        """Wait until a token is claimed."""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            metrics.increment(f"ratelimit.{self.name}.throttled")
+            metrics.increment(f"ratelimit.{self.name}.wait_seconds", wait)
+            logger.info(f"⏳ Upstream rate limit reached, waiting {wait:.1f}s")
+            await asyncio.sleep(wait)
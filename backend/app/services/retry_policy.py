@@ -0,0 +1,198 @@
+"""Declarative retry policy shared by every upstream call type."""
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, TypeVar
+import httpx
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Classification(NamedTuple):
+    """What went wrong and whether trying again can help."""
+    kind: str
+    retryable: bool
+    retry_after: Optional[float] = None
+
+
+# HTTP status -> (kind, retryable)
+STATUS_RULES: Dict[int, tuple] = {
+    400: ("bad_request", False),
+    401: ("auth", False),
+    403: ("auth", False),
+    404: ("not_found", False),
+    408: ("timeout", True),
+    409: ("conflict", True),
+    429: ("rate_limited", True),
+    500: ("server_error", True),
+    502: ("server_error", True),
+    503: ("unavailable", True),
+    504: ("timeout", True),
+}
+
+
+class OutputError(Exception):
+    """The model answered, but the output cannot be used as is."""
+    def __init__(self, kind: str, message: str, retryable: bool = True):
+        self.kind = kind
+        self.retryable = retryable
+        super().__init__(message)
+
+
+def classify(error: BaseException) -> Classification:
+    """Map an exception from an attempt to a Classification."""
+    if isinstance(error, OutputError):
+        return Classification(error.kind, error.retryable)
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        kind, retryable = STATUS_RULES.get(
+            status_code,
+            ("server_error", True) if status_code >= 500 else ("client_error", False)
+        )
+        # Auth failures are per key: retryable while another key can take the call
+        retryable = retryable or getattr(error, "failover", False)
+        return Classification(kind, retryable, getattr(error, "retry_after", None))
+    if isinstance(error, httpx.TimeoutException):
+        return Classification("timeout", True)
+    if isinstance(error, httpx.TransportError):
+        return Classification("network", True)
+    return Classification("unexpected", False)
+
+
+class RetryBudget:
+    """
+    Retries may add at most `ratio` of first-attempt traffic (plus a small
+    floor) per window, so an upstream outage is not multiplied by retries.
+    Counted across workers when a shared store is configured.
+    """
+
+    def __init__(self, ratio: float, window_seconds: float, min_retries: int):
+        self.ratio = ratio
+        self.window_seconds = window_seconds
+        self.min_retries = min_retries
+        self._local: Dict[tuple, int] = defaultdict(int)
+
+    def _incr(self, name: str) -> Optional[int]:
+        window = int(time.time() // self.window_seconds)
+        if shared_store is not None:
+            return shared_store.incr(f"retrybudget:{name}:{window}", ttl_seconds=2 * self.window_seconds)
+        for stale in [k for k in self._local if k[1] < window]:
+            del self._local[stale]
+        self._local[(name, window)] += 1
+        return self._local[(name, window)]
+
+    def _count(self, name: str) -> int:
+        window = int(time.time() // self.window_seconds)
+        if shared_store is not None:
+            return shared_store.counter(f"retrybudget:{name}:{window}")
+        return self._local.get((name, window), 0)
+
+    def record_request(self) -> None:
+        self._incr("requests")
+
+    def try_spend(self) -> bool:
+        """Claim one retry; False when the window's budget is used up."""
+        allowed = self.min_retries + self.ratio * self._count("requests")
+        if self._count("retries") >= allowed:
+            return False
+        self._incr("retries")
+        return True
+
+
+class RetryPolicy:
+    """
+    Run an attempt function until it succeeds, the error is not retryable,
+    attempts run out or the retry budget is spent.
+
+    Backoff is full jitter (uniform in [0, min(cap, base * 2**n)]). A server
+    retry hint (Retry-After) is honoured as the minimum wait, unless it is
+    longer than `max_hint_seconds`, in which case waiting inside the request
+    is pointless and the error is returned at once.
+    """
+
+    def __init__(
+        self,
+        max_retries: int,
+        base_delay: float,
+        max_delay: float,
+        max_hint_seconds: float,
+        budget: RetryBudget
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_hint_seconds = max_hint_seconds
+        self.budget = budget
+
+    def backoff(self, retry: int, retry_after: Optional[float]) -> Optional[float]:
+        """Seconds to wait before retry number `retry` (0-based); None to give up."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry)))
+        if retry_after is not None:
+            if retry_after > self.max_hint_seconds:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+
+    async def run(
+        self,
+        operation: str,
+        attempt: Callable[[int], Awaitable[T]],
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep
+    ) -> T:
+        """
+        Call `attempt(n)` for n = 0, 1, ... and return the first result.
+
+        Raises the last attempt's exception when giving up; its
+        Classification is available through `classify`.
+        """
+        self.budget.record_request()
+        metrics.increment(f"retry.calls.{operation}")
+        retry = 0
+        try:
+            while True:
+                metrics.increment(f"retry.attempts.{operation}")
+                try:
+                    return await attempt(retry)
+                except Exception as error:
+                    classification = classify(error)
+                    metrics.increment(f"retry.errors.{operation}.{classification.kind}")
+                    if not classification.retryable or retry >= self.max_retries:
+                        raise
+                    delay = self.backoff(retry, classification.retry_after)
+                    if delay is None:
+                        metrics.increment(f"retry.hint_too_long.{operation}")
+                        raise
+                    if not self.budget.try_spend():
+                        metrics.increment(f"retry.budget_exhausted.{operation}")
+                        logger.warning(f"🪫 Retry budget exhausted, not retrying {operation} ({classification.kind})")
+                        raise
+                    metrics.increment(f"retry.retries.{operation}.{classification.kind}")
+                    logger.warning(
+                        f"⏳ {operation}: {classification.kind}, retrying in {delay:.1f}s "
+                        f"(attempt {retry + 2}/{self.max_retries + 1})"
+                    )
+                    await sleep(delay)
+                    retry += 1
+        finally:
+            # Mean of this is the retry amplification factor
+            metrics.observe(f"retry.attempts_per_call.{operation}", retry + 1)
+
+
+retry_policy = RetryPolicy(
+    max_retries=settings.max_retries,
+    base_delay=settings.retry_base_delay,
+    max_delay=settings.retry_max_delay,
+    max_hint_seconds=settings.retry_max_hint_seconds,
+    budget=RetryBudget(
+        ratio=settings.retry_budget_ratio,
+        window_seconds=settings.retry_budget_window_seconds,
+        min_retries=settings.retry_budget_min_retries
+    )
+)
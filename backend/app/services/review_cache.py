@@ -0,0 +1,56 @@
+"""Code review cache keyed by normalized code fingerprints."""
+import hashlib
+import json
+from typing import List, Optional, Tuple
+from app.models.responses import CodeReviewResponse
+from app.services.cache import TTLCache
+from app.services.code_fingerprint import (
+    CodeToken,
+    normalize_code,
+    fingerprint_tokens,
+    token_index_for_line,
+    line_for_token_index
+)
+
+
+def review_cache_key(
+    code: str,
+    language: str,
+    tasks: List[str],
+    current_task_index: int
+) -> Tuple[str, List[CodeToken]]:
+    """
+    Build the cache key for a review request.
+
+    Returns the key and the normalized token stream, which is needed to map
+    `highlight_line` between differently formatted submissions.
+    """
+    tokens = normalize_code(code, language)
+    context = json.dumps([language, tasks, current_task_index], ensure_ascii=False)
+    key = hashlib.sha256(f"{fingerprint_tokens(tokens)}:{context}".encode("utf-8")).hexdigest()
+    return key, tokens
+
+
+class ReviewCache:
+    """Stores reviews with the highlight anchored to a token, not a line."""
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self._cache = TTLCache("review", maxsize, ttl_seconds, persist=True)
+
+    def get(self, key: str, tokens: List[CodeToken]) -> Optional[CodeReviewResponse]:
+        """Return the cached review re-anchored to this submission's line numbers."""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        review, anchor = entry
+        return review.model_copy(update={
+            "highlight_line": line_for_token_index(tokens, anchor) if anchor is not None else review.highlight_line
+        })
+
+    def set(self, key: str, tokens: List[CodeToken], review: CodeReviewResponse) -> None:
+        """Cache `review` for the submission that produced `tokens`."""
+        self._cache.set(key, (review, token_index_for_line(tokens, review.highlight_line)))
+
+    def clear(self) -> None:
+        """Drop every cached review."""
+        self._cache.clear()
@@ -0,0 +1,186 @@
+"""Latest-wins coalescing of code reviews per IDE session."""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+# Shared-store polls start fast (results usually land soon) and back off
+# so a long wait costs a handful of queries, not one every tick
+_SHARED_POLL_MIN_SECONDS = 0.05
+_SHARED_POLL_MAX_SECONDS = 1.0
+
+
+def _poll_intervals():
+    interval = _SHARED_POLL_MIN_SECONDS
+    while True:
+        yield interval
+        interval = min(interval * 2, _SHARED_POLL_MAX_SECONDS)
+
+
+class _Session:
+    """Coalescing state for one session key."""
+
+    def __init__(self):
+        self.generation = 0
+        self.waiters = 0
+        self.task: Optional[asyncio.Task] = None
+        self.result: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class LatestWinsCoalescer:
+    """
+    Run at most one upstream call per session, always for the newest submission.
+
+    A submission for an idle key starts its call at once. A newer
+    submission for the same key cancels the in-flight call (if any), waits
+    `debounce_seconds` in case more follow, and takes over; every caller
+    still waiting receives the newest submission's result, so a burst of
+    submissions collapses into a single upstream call while an isolated
+    one pays no delay.
+    
+    With a shared store the submission generation is global, so a newer
+    submission handled by another worker also supersedes this worker's call
+    and its result is picked up from the store.
+    """
+
+    def __init__(self, debounce_seconds: float = 0.0, name: str = "review"):
+        self.debounce_seconds = debounce_seconds
+        self.name = name
+        self._sessions: Dict[str, _Session] = {}
+
+    async def submit(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Submit work for `key` and return the result of the latest submission."""
+        session = self._sessions.get(key)
+        if session is None:
+            session = self._sessions[key] = _Session()
+        # Something pending or in flight for this key: we are in a burst
+        burst = session.waiters > 0 or (session.task is not None and not session.task.done())
+        session.generation += 1
+        generation = session.generation
+        session.waiters += 1
+        # None (no store, or it is busy) runs the call in this worker only
+        shared_generation = (
+            shared_store.incr(self._counter_key(key), ttl_seconds=settings.review_session_ttl_seconds)
+            if shared_store is not None else None
+        )
+
+        if session.task is not None and not session.task.done():
+            logger.debug(f"Superseding in-flight {self.name} for session {key}")
+            session.task.cancel()
+            metrics.increment(f"{self.name}.superseded_inflight")
+
+        try:
+            if burst and self.debounce_seconds > 0:
+                await asyncio.sleep(self.debounce_seconds)
+            if session.generation == generation:
+                self._start(key, session, generation, factory, shared_generation)
+            else:
+                metrics.increment(f"{self.name}.coalesced")
+            return await asyncio.shield(session.result)
+        except asyncio.CancelledError:
+            # Caller went away (e.g. client disconnect). Keep the call alive for
+            # the remaining waiters, or stop it if nobody is left to read it.
+            if session.waiters == 1:
+                if session.task is not None:
+                    session.task.cancel()
+                if not session.result.done():
+                    session.result.cancel()
+                self._drop(key, session)
+            elif session.generation == generation and (session.task is None or session.task.done()):
+                self._start(key, session, generation, factory, shared_generation)
+            raise
+        finally:
+            session.waiters -= 1
+
+    def _start(
+        self,
+        key: str,
+        session: _Session,
+        generation: int,
+        factory: Callable[[], Awaitable[Any]],
+        shared_generation: Optional[int]
+    ) -> None:
+        """Launch the upstream call for `generation` and resolve waiters when it finishes."""
+        if shared_generation is None:
+            metrics.increment(f"{self.name}.upstream_calls")
+            task = asyncio.ensure_future(factory())
+        else:
+            task = asyncio.ensure_future(self._run_single_flight(key, shared_generation, factory))
+        session.task = task
+
+        def _on_done(done: asyncio.Task) -> None:
+            if session.generation != generation or session.result.done():
+                # Superseded by a newer submission, which will resolve waiters
+                return
+            if done.cancelled():
+                session.result.cancel()
+            elif done.exception() is not None:
+                session.result.set_exception(done.exception())
+            else:
+                session.result.set_result(done.result())
+            self._drop(key, session)
+
+        task.add_done_callback(_on_done)
+
+    def _counter_key(self, key: str) -> str:
+        return f"singleflight:{self.name}:{key}"
+
+    def _result_key(self, key: str) -> str:
+        return f"singleflight-result:{self.name}:{key}"
+
+    async def _run_single_flight(self, key: str, shared_generation: int, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `factory` unless/until a newer submission on any worker supersedes it."""
+        if shared_store.counter(self._counter_key(key)) > shared_generation:
+            metrics.increment(f"{self.name}.coalesced")
+            return await self._await_remote_result(key, shared_generation, factory)
+
+        metrics.increment(f"{self.name}.upstream_calls")
+        task = asyncio.ensure_future(factory())
+        try:
+            for interval in _poll_intervals():
+                done, _ = await asyncio.wait({task}, timeout=interval)
+                if done:
+                    result = task.result()
+                    shared_store.set(
+                        self._result_key(key),
+                        (shared_generation, result),
+                        settings.singleflight_wait_seconds
+                    )
+                    return result
+                if shared_store.counter(self._counter_key(key)) > shared_generation:
+                    logger.debug(f"{self.name} for session {key} superseded on another worker")
+                    task.cancel()
+                    metrics.increment(f"{self.name}.superseded_inflight")
+                    return await self._await_remote_result(key, shared_generation, factory)
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def _await_remote_result(self, key: str, shared_generation: int, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Wait for a newer generation's result from another worker, or run our own call on timeout."""
+        deadline = time.monotonic() + settings.singleflight_wait_seconds
+        for interval in _poll_intervals():
+            if time.monotonic() >= deadline:
+                break
+            entry = shared_store.get(self._result_key(key))
+            if entry is not None and entry[0] > shared_generation:
+                return entry[1]
+            await asyncio.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+        logger.warning(f"⚠️ No shared {self.name} result for session {key}, running locally")
+        metrics.increment(f"{self.name}.upstream_calls")
+        return await factory()
+
+    def _drop(self, key: str, session: _Session) -> None:
+        """Forget `session` so the next submission starts fresh."""
+        if self._sessions.get(key) is session:
+            del self._sessions[key]
+
+    @property
+    def active_sessions(self) -> int:
+        """Number of sessions with pending work."""
+        return len(self._sessions)
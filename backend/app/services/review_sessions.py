@@ -0,0 +1,165 @@
+"""Server-held review session state for incremental (diff-based) code review."""
+import difflib
+from typing import List, Optional
+from app.config import settings
+from app.models.requests import CodeReviewRequest, CodeEdit
+from app.models.responses import CodeReviewResponse
+from app.services.cache import TTLCache
+
+_DIFF_CONTEXT_LINES = 3
+_REVIEW_SUMMARY_CHARS = 600
+
+
+class ReviewSessionError(Exception):
+    """Delta request that cannot be applied to the session state."""
+    def __init__(self, message: str, status_code: int = 409):
+        self.message = message
+        self.status_code = status_code
+        super().__init__(message)
+
+
+class ReviewSession:
+    """Project context, latest code and last completed review for one IDE session."""
+
+    def __init__(
+        self,
+        session_id: Optional[str],
+        language: str,
+        title: str,
+        tasks: List[str],
+        current_task_index: int,
+        code: str
+    ):
+        self.session_id = session_id
+        self.language = language
+        self.title = title
+        self.tasks = tasks
+        self.current_task_index = current_task_index
+        self.code = code
+        self.version = 0
+        self.reviewed_code: Optional[str] = None
+        self.last_review: Optional[CodeReviewResponse] = None
+
+    def review_summary(self) -> Optional[str]:
+        """Compact form of the last review for the incremental prompt."""
+        if self.last_review is None:
+            return None
+        comment = self.last_review.review_comment
+        if len(comment) > _REVIEW_SUMMARY_CHARS:
+            comment = comment[:_REVIEW_SUMMARY_CHARS].rsplit(" ", 1)[0] + " …"
+        line = f", line {self.last_review.highlight_line}" if self.last_review.highlight_line else ""
+        return f"[{self.last_review.severity}{line}] {comment}"
+
+
+def apply_code_edits(code: str, edits: List[CodeEdit]) -> str:
+    """Apply line edits in order, each relative to the result of the previous one."""
+    lines = code.split("\n")
+    for edit in edits:
+        if edit.start_line > len(lines) + 1 or not edit.start_line - 1 <= edit.end_line <= len(lines):
+            raise ReviewSessionError(
+                f"Edit range {edit.start_line}-{edit.end_line} is outside the {len(lines)}-line code",
+                status_code=422
+            )
+        lines[edit.start_line - 1:edit.end_line] = [] if edit.text is None else edit.text.split("\n")
+    return "\n".join(lines)
+
+
+def build_review_diff(old_code: str, new_code: str) -> Optional[str]:
+    """
+    Render the change from `old_code` to `new_code` with new-file line numbers.
+
+    Returns None when the rendered diff would not be meaningfully smaller than
+    the code itself, in which case a full review is cheaper and clearer.
+    """
+    old_lines = old_code.split("\n")
+    new_lines = new_code.split("\n")
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    hunks = []
+    for group in matcher.get_grouped_opcodes(_DIFF_CONTEXT_LINES):
+        rendered = []
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                rendered.extend(f"  {j + 1:>4} | {new_lines[j]}" for j in range(j1, j2))
+                continue
+            if tag in ("replace", "delete"):
+                rendered.extend(f"-      | {old_lines[i]}" for i in range(i1, i2))
+            if tag in ("replace", "insert"):
+                rendered.extend(f"+ {j + 1:>4} | {new_lines[j]}" for j in range(j1, j2))
+        hunks.append("\n".join(rendered))
+    diff = "\n  ...\n".join(hunks) if hunks else "(no changes)"
+    if len(diff) > settings.incremental_review_max_diff_ratio * len(new_code):
+        return None
+    return diff
+
+
+class ReviewSessionStore:
+    """Bounded, expiring map of session_id -> ReviewSession."""
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self._sessions = TTLCache("review_sessions", maxsize, ttl_seconds, persist=True)
+
+    def get(self, session_id: str) -> Optional[ReviewSession]:
+        return self._sessions.get(session_id)
+
+    def apply(self, request: CodeReviewRequest) -> ReviewSession:
+        """
+        Update the session from a full or delta request and return it.
+
+        Requests without session_id get a throwaway session so callers can
+        treat both cases the same way. The version goes up with every change
+        of the code and is never reused within a session.
+        """
+        session = self._sessions.get(request.session_id) if request.session_id else None
+        context = request.project_context
+
+        if request.code_edits is not None:
+            if session is None:
+                raise ReviewSessionError("Unknown or expired review session; resend the full code")
+            if request.base_version != session.version:
+                raise ReviewSessionError(
+                    f"Session is at version {session.version}, edits are based on {request.base_version}; resend the full code"
+                )
+            code = apply_code_edits(session.code, request.code_edits)
+            if len(code) > settings.max_code_length:
+                raise ReviewSessionError(f"Code exceeds {settings.max_code_length} characters", status_code=422)
+            session.code = code
+            session.version += 1
+        elif session is None or context is not None and (
+            context.title != session.title or context.tasks != session.tasks or request.language != session.language
+        ):
+            if context is None:
+                raise ReviewSessionError("Unknown or expired review session; resend project_context")
+            previous = session
+            session = ReviewSession(
+                request.session_id,
+                request.language,
+                context.title,
+                context.tasks,
+                context.current_task_index,
+                request.code
+            )
+            if previous is not None:
+                # Versions never repeat, so edits based on the old session are refused
+                session.version = previous.version + 1
+            if request.previous_review:
+                session.last_review = CodeReviewResponse(review_comment=request.previous_review, severity="info")
+        elif request.code != session.code:
+            session.code = request.code
+            session.version += 1
+
+        if context is not None:
+            session.current_task_index = context.current_task_index
+        if request.current_task_index is not None:
+            session.current_task_index = request.current_task_index
+
+        if request.session_id:
+            self._sessions.set(request.session_id, session)
+        return session
+
+    def record_review(self, session: ReviewSession, code: str, review: CodeReviewResponse) -> None:
+        """Remember `review` as the latest review of `code`."""
+        session.reviewed_code = code
+        session.last_review = review
+        if session.session_id:
+            # Shared-store sessions are copies; persist the update
+            self._sessions.set(session.session_id, session)
@@ -0,0 +1,185 @@
+"""Host-local key-value store shared by all worker processes (SQLite in WAL mode)."""
+import functools
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+from app.config import settings
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_PURGE_EVERY_WRITES = 500
+
+# After a lock wait times out, skip the store for this long
+_BUSY_BYPASS_SECONDS = 1.0
+
+
+def _on_busy(fallback: Callable[..., Any]):
+    """
+    Return `fallback(self, *args)` instead of waiting when another worker
+    holds the lock past the busy timeout (or recently did).
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if time.monotonic() < self._bypass_until:
+                metrics.increment(f"shared_store.bypassed.{method.__name__}")
+                return fallback(self, *args, **kwargs)
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                self._bypass_until = time.monotonic() + _BUSY_BYPASS_SECONDS
+                metrics.increment(f"shared_store.busy.{method.__name__}")
+                logger.warning(f"🗄️ Shared store busy ({e}), using per-process state for {_BUSY_BYPASS_SECONDS:.0f}s")
+                return fallback(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class SharedStore:
+    """
+    Expiring values and counters in one SQLite file.
+
+    Every worker opens the same file, so caches, rate-limit windows and
+    single-flight generations are seen by the whole server rather than being
+    duplicated per process. Operations are single short statements run
+    inline on the event loop, so a lock held by another worker is waited
+    for at most `busy_timeout` seconds; then the operation falls back
+    (a cache miss, a skipped write, no shared generation) and the store is
+    bypassed for a second.
+    """
+
+    def __init__(self, path: str, busy_timeout: float):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._writes = 0
+        self._bypass_until = 0.0
+        # Creating the schema may wait for the other workers starting up
+        conn = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER, expires REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tat REAL)")
+        finally:
+            conn.close()
+        logger.info(f"🗄️ Shared state store: {path}")
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread and process (never reuse one across fork)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @_on_busy(lambda self, key: None)
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value stored under `key`, or None if missing/expired."""
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    @_on_busy(lambda self, key, value, ttl_seconds: None)
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        """Store `value` under `key` for `ttl_seconds`."""
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time() + ttl_seconds)
+        )
+        self._after_write()
+
+    @_on_busy(lambda self, key: None)
+    def delete(self, key: str) -> None:
+        """Remove `key` if present."""
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    @_on_busy(lambda self, prefix: None)
+    def delete_prefix(self, prefix: str) -> None:
+        """Remove every key starting with `prefix`."""
+        self._conn().execute("DELETE FROM kv WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    @_on_busy(lambda self, key, amount=1, ttl_seconds=3600: None)
+    def incr(self, key: str, amount: int = 1, ttl_seconds: float = 3600) -> Optional[int]:
+        """
+        Atomically add `amount` to counter `key` (reset once expired) and
+        return the new value; None if the store is busy.
+        """
+        now = time.time()
+        row = self._conn().execute(
+            """
+            INSERT INTO counters (key, value, expires) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                value = CASE WHEN counters.expires > ? THEN counters.value + excluded.value ELSE excluded.value END,
+                expires = CASE WHEN counters.expires > ? THEN counters.expires ELSE excluded.expires END
+            RETURNING value
+            """,
+            (key, amount, now + ttl_seconds, now, now)
+        ).fetchone()
+        self._after_write()
+        return row[0]
+
+    @_on_busy(lambda self, key: 0)
+    def counter(self, key: str) -> int:
+        """Current value of counter `key` (0 if missing/expired)."""
+        row = self._conn().execute(
+            "SELECT value FROM counters WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    @_on_busy(lambda self, key, interval, capacity: interval)
+    def take_token(self, key: str, interval: float, capacity: float) -> float:
+        """
+        Token bucket `key` (GCRA form): claim one token and return 0, or return
+        the seconds until one is available without claiming it. While the
+        store is busy no token is claimed and one interval is returned.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tat FROM buckets WHERE key = ?", (key,)).fetchone()
+            tat = max(row[0] if row else now, now)
+            wait = tat - now - (capacity - 1) * interval
+            if wait <= 0:
+                conn.execute("INSERT OR REPLACE INTO buckets (key, tat) VALUES (?, ?)", (key, tat + interval))
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return max(0.0, wait)
+
+    @_on_busy(lambda self, key: 0.0)
+    def bucket_backlog(self, key: str) -> float:
+        """Seconds of claimed tokens still ahead of now for bucket `key`."""
+        row = self._conn().execute("SELECT tat FROM buckets WHERE key = ?", (key,)).fetchone()
+        return max(0.0, row[0] - time.time()) if row else 0.0
+
+    @_on_busy(lambda self: None)
+    def purge_expired(self) -> None:
+        """Delete expired rows."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM kv WHERE expires <= ?", (now,))
+        conn.execute("DELETE FROM counters WHERE expires <= ?", (now,))
+
+    def _after_write(self) -> None:
+        self._writes += 1
+        if self._writes % _PURGE_EVERY_WRITES == 0:
+            self.purge_expired()
+
+
+# Set by run.py for multi-worker deployments; None means per-process state
+shared_store: Optional[SharedStore] = (
+    SharedStore(settings.shared_state_path, settings.shared_state_busy_timeout_seconds)
+    if settings.shared_state_path else None
+)
@@ -0,0 +1,162 @@
+"""Graceful shutdown: readiness, draining of in-flight Gemini calls, state snapshots."""
+import asyncio
+import json
+import logging
+import os
+import pickle
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Tuple
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_POLL_SECONDS = 0.1
+_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+# name -> (export() -> picklable state, restore(state))
+_snapshots: Dict[str, Tuple[Callable[[], Any], Callable[[Any], None]]] = {}
+
+
+def register_snapshot(name: str, export: Callable[[], Any], restore: Callable[[Any], None]) -> None:
+    """Include a component's state in the snapshot written at shutdown and read at startup."""
+    _snapshots[name] = (export, restore)
+
+
+class ShutdownCoordinator:
+    """
+    Worker-wide shutdown state.
+
+    On SIGTERM/SIGINT the worker starts draining at once, before the
+    server's own handler runs: /ready turns 503 so the load balancer
+    shifts traffic, new API requests, channel messages and speculative
+    background work (hint prefetches, chat summaries) are refused, and
+    work already admitted carries on. The server then stops listening,
+    after `readiness_delay` seconds when set, and waits for open
+    requests; the lifespan shutdown finally waits for Gemini calls still
+    running in the background (solutions, prefetches) via `drain`.
+    """
+
+    def __init__(self):
+        self.draining = False
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def begin_drain(self, reason: str) -> None:
+        if self.draining:
+            return
+        self.draining = True
+        metrics.increment("shutdown.drains")
+        logger.info(f"🚦 Draining ({reason}): not ready, refusing new work, {self._inflight} Gemini call(s) in flight")
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Count a Gemini call as in flight for its duration."""
+        with self._lock:
+            self._inflight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+    async def drain(self, timeout: float) -> int:
+        """Wait up to `timeout` seconds for in-flight calls; return how many were still running."""
+        self.begin_drain("shutdown")
+        if self._inflight:
+            logger.info(f"⏳ Waiting up to {timeout:.0f}s for {self._inflight} Gemini call(s)")
+        deadline = time.monotonic() + timeout
+        while self._inflight and time.monotonic() < deadline:
+            await asyncio.sleep(_POLL_SECONDS)
+        if self._inflight:
+            metrics.increment("shutdown.abandoned_calls", self._inflight)
+            logger.warning(f"⚠️ Drain deadline passed, abandoning {self._inflight} Gemini call(s)")
+        return self._inflight
+
+    def install_signal_handlers(self, readiness_delay: float = 0.0) -> None:
+        """
+        Start draining on SIGTERM/SIGINT, then pass the signal on to the
+        server's handler (after `readiness_delay` seconds, the first time).
+        Only possible from the main thread, once the server has installed
+        its handlers; otherwise draining starts in the lifespan shutdown.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        loop = asyncio.get_running_loop()
+        for signum in _SIGNALS:
+            previous = signal.getsignal(signum)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous=previous):
+                first = not self.draining
+                self.begin_drain(signal.Signals(signum).name)
+                if first and readiness_delay > 0:
+                    loop.call_soon_threadsafe(loop.call_later, readiness_delay, previous, signum, frame)
+                else:
+                    previous(signum, frame)
+
+            signal.signal(signum, handler)
+
+
+def _ensure_directory(path: str) -> None:
+    """Create the directory `path` goes in, private (0700): snapshots are pickles loaded at startup."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+
+def save_snapshot(path: str) -> None:
+    """Write every registered component's state to `path` (atomically)."""
+    state = {}
+    for name, (export, _) in _snapshots.items():
+        try:
+            # Pickled one by one, so one bad component does not lose the others
+            state[name] = pickle.dumps(export(), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not snapshot {name}: {e}")
+    _ensure_directory(path)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        pickle.dump({"saved_at": time.time(), "state": state}, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+    logger.info(f"💾 Saved {len(state)} component snapshot(s) to {path}")
+
+
+def load_snapshot(path: str) -> None:
+    """Restore registered components from the snapshot at `path`, if there is one."""
+    try:
+        with open(path, "rb") as file:
+            snapshot = pickle.load(file)
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        logger.warning(f"⚠️ Ignoring unreadable snapshot {path}: {e}")
+        return
+    restored = 0
+    for name, state in snapshot["state"].items():
+        if name in _snapshots:
+            try:
+                _snapshots[name][1](pickle.loads(state))
+                restored += 1
+            except Exception as e:
+                logger.warning(f"⚠️ Could not restore {name}: {e}")
+    logger.info(f"💾 Restored {restored} component snapshot(s) from {path}")
+
+
+def append_metrics(path: str) -> None:
+    """Append this worker's final metrics to `path` as one JSON line."""
+    record = {"time": time.time(), "worker_pid": os.getpid(), **metrics.snapshot()}
+    _ensure_directory(path)
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+# Process-wide coordinator
+shutdown = ShutdownCoordinator()
@@ -0,0 +1,224 @@
+"""Local syntax checks run before asking the model for a code review."""
+import ast
+import asyncio
+import builtins
+import logging
+import os
+import re
+import shutil
+import tempfile
+from typing import List, NamedTuple, Optional
+from app.config import settings
+from app.models.responses import CodeReviewResponse
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Bound concurrent compiler processes per worker
+_subprocess_slots = asyncio.Semaphore(settings.static_analysis_concurrency)
+
+_MAX_SUMMARY_ITEMS = 5
+
+
+class Diagnostic(NamedTuple):
+    """Single compiler/parser finding."""
+    line: Optional[int]
+    message: str
+    severity: str  # "error" | "warning"
+
+
+class AnalysisResult(NamedTuple):
+    """Outcome of the local pre-pass."""
+    checker: Optional[str]  # None when no checker is available for the language
+    diagnostics: List[Diagnostic]
+
+    @property
+    def errors(self) -> List[Diagnostic]:
+        return [d for d in self.diagnostics if d.severity == "error"]
+
+    def summary(self) -> Optional[str]:
+        """Compact diagnostics text for the review prompt, or None if nothing was checked."""
+        if self.checker is None:
+            return None
+        lines = [f"- Syntax check ({self.checker}): {'FAILED' if self.errors else 'OK'}"]
+        for diagnostic in self.diagnostics[:_MAX_SUMMARY_ITEMS]:
+            where = f"line {diagnostic.line}" if diagnostic.line else "unknown line"
+            lines.append(f"- {diagnostic.severity} at {where}: {diagnostic.message}")
+        if len(self.diagnostics) > _MAX_SUMMARY_ITEMS:
+            lines.append(f"- ... {len(self.diagnostics) - _MAX_SUMMARY_ITEMS} more")
+        return "\n".join(lines)
+
+
+def _analyze_python(code: str) -> AnalysisResult:
+    """Compile with the interpreter's own parser and flag likely-undefined names."""
+    try:
+        tree = ast.parse(code)
+        compile(tree, "<student>", "exec")
+    except SyntaxError as e:
+        return AnalysisResult("python ast", [Diagnostic(e.lineno, e.msg, "error")])
+    except ValueError as e:  # e.g. null bytes in source
+        return AnalysisResult("python ast", [Diagnostic(None, str(e), "error")])
+
+    defined = set(dir(builtins)) | {"__file__"}
+    loads = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                loads.append(node)
+            else:
+                defined.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            defined.add(node.name)
+        elif isinstance(node, ast.arg):
+            defined.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            defined.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        elif isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar)) and node.name:
+            defined.add(node.name)
+
+    if "*" in defined:
+        # Star imports make undefined-name checks meaningless
+        return AnalysisResult("python ast", [])
+
+    diagnostics = []
+    reported = set()
+    for node in loads:
+        if node.id not in defined and node.id not in reported:
+            reported.add(node.id)
+            diagnostics.append(Diagnostic(node.lineno, f"name '{node.id}' is never defined", "warning"))
+    return AnalysisResult("python ast", diagnostics)
+
+
+class ProcessOutput(NamedTuple):
+    """Exit status and decoded output of a local tool run."""
+    returncode: int
+    stdout: str
+    stderr: str
+
+
+async def run_process(
+    args: List[str],
+    stdin: Optional[bytes] = None,
+    timeout: Optional[float] = None
+) -> Optional[ProcessOutput]:
+    """Run a local tool within the per-worker process slots; None on timeout/launch failure."""
+    timeout = timeout or settings.static_analysis_timeout
+    async with _subprocess_slots:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except OSError as e:
+            logger.warning(f"⚠️ Could not start {args[0]}: {e}")
+            return None
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(stdin), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            logger.warning(f"⚠️ {args[0]} timed out after {timeout}s")
+            return None
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+        return ProcessOutput(
+            process.returncode,
+            stdout.decode("utf-8", errors="replace"),
+            stderr.decode("utf-8", errors="replace")
+        )
+
+
+async def _run_checker(args: List[str], stdin: Optional[bytes] = None) -> Optional[str]:
+    """Run a checker process and return its stderr, or None on timeout/launch failure."""
+    output = await run_process(args, stdin)
+    return output.stderr if output is not None else None
+
+
+async def _analyze_javascript(code: str) -> AnalysisResult:
+    """`node --check` the code; ES module syntax is checked as .mjs."""
+    node = shutil.which("node")
+    if node is None:
+        return AnalysisResult(None, [])
+    is_module = re.search(r"^\s*(import|export)\s", code, re.MULTILINE) is not None
+    fd, path = tempfile.mkstemp(suffix=".mjs" if is_module else ".js")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(code)
+        stderr = await _run_checker([node, "--check", path])
+    finally:
+        os.unlink(path)
+    if stderr is None:
+        return AnalysisResult(None, [])
+    if not stderr.strip():
+        return AnalysisResult("node --check", [])
+
+    line_match = re.search(re.escape(path) + r":(\d+)", stderr)
+    error_match = re.search(r"^(\w*Error: .+)$", stderr, re.MULTILINE)
+    message = error_match.group(1) if error_match else stderr.strip().splitlines()[-1]
+    return AnalysisResult("node --check", [
+        Diagnostic(int(line_match.group(1)) if line_match else None, message, "error")
+    ])
+
+
+async def _analyze_cpp(code: str) -> AnalysisResult:
+    """`g++ -fsyntax-only -Wall` the code from stdin."""
+    compiler = shutil.which("g++")
+    if compiler is None:
+        return AnalysisResult(None, [])
+    stderr = await _run_checker(
+        [compiler, "-fsyntax-only", "-Wall", "-std=c++17", "-x", "c++", "-"],
+        stdin=code.encode("utf-8")
+    )
+    if stderr is None:
+        return AnalysisResult(None, [])
+
+    diagnostics = []
+    for match in re.finditer(r"^<stdin>:(\d+):(?:\d+:)? (?:fatal )?(error|warning): (.+)$", stderr, re.MULTILINE):
+        diagnostics.append(Diagnostic(int(match.group(1)), match.group(3), match.group(2)))
+    # Errors first so the highlight points at the first hard error
+    diagnostics.sort(key=lambda d: d.severity != "error")
+    return AnalysisResult("g++ -fsyntax-only", diagnostics)
+
+
+async def analyze_code(code: str, language: str) -> AnalysisResult:
+    """Parse/compile `code` locally; never raises."""
+    try:
+        if language == "python":
+            result = _analyze_python(code)
+        elif language == "javascript":
+            result = await _analyze_javascript(code)
+        elif language == "cpp":
+            result = await _analyze_cpp(code)
+        else:
+            result = AnalysisResult(None, [])
+    except Exception as e:
+        logger.warning(f"⚠️ Static analysis failed for {language}: {e}")
+        return AnalysisResult(None, [])
+    metrics.increment(f"static_analysis.{'errors' if result.errors else 'clean'}.{language}")
+    return result
+
+
+def syntax_error_review(result: AnalysisResult) -> CodeReviewResponse:
+    """Build the instant review returned when the code does not compile."""
+    first = result.errors[0]
+    details = "\n".join(
+        f"- {'السطر ' + str(d.line) if d.line else 'موقع غير محدد'}: `{d.message}`"
+        for d in result.errors[:_MAX_SUMMARY_ITEMS]
+    )
+    where = f"السطر {first.line}" if first.line else "الكود"
+    return CodeReviewResponse(
+        review_comment=(
+            "أحسنت على تقدمك حتى الآن! لكن الكود يحتوي على **خطأ في الصياغة (Syntax Error)** "
+            "يمنع تشغيله، لذلك يجب إصلاحه قبل مراجعة المنطق والمهام.\n\n"
+            f"**ما الخطأ (✗):**\n{details}\n\n"
+            f"**ما يجب فعله:**\nراجع {where} والسطر الذي قبله مباشرةً: تحقق من الأقواس وعلامات التنصيص "
+            "والفواصل المنقوطة والمسافات البادئة. بعد الإصلاح اطلب المراجعة مرة أخرى للحصول على مراجعة كاملة.\n\n"
+            "لا تقلق، أخطاء الصياغة طبيعية جداً أثناء التعلم 💪"
+        ),
+        highlight_line=first.line,
+        severity="error"
+    )
@@ -0,0 +1,174 @@
+"""Per-project Socratic hints for each task, prefetched after planning."""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from app.services.cache import TTLCache
+from app.services.key_pool import key_pool
+from app.services.metrics import metrics
+from app.services.shutdown import shutdown
+
+logger = logging.getLogger(__name__)
+
+
+class TaskHints:
+    """
+    Hints per project task, kept in a TTLCache next to the project's plan.
+
+    After /init or /plan, `prefetch` generates every task's hint in one
+    background call, at low priority: at most `concurrency` prefetches run
+    per worker and at most `max_queued` wait for a slot. When its turn
+    comes, a prefetch is skipped if any key got a 429 in the last
+    `rate_limit_backoff_seconds`, if the worker already has
+    `max_calls_per_key` calls per key in flight, or if the keys' budgets
+    (when limited) have fewer than `min_spare_calls` calls to spare. `get`
+    serves a prefetched hint instantly, waits for a prefetch still
+    running, and otherwise generates just the requested hint.
+
+    Metrics: hints.requests, split into hints.prefetch_hits (served from
+    the prefetch), hints.cold (generated on demand) and hints.cached
+    (a cold hint asked for again); hints.prefetch_waits;
+    hints.prefetch.generated / used (prefetched hints and how many were
+    ever asked for); hints.prefetch.skipped_quota, skipped_busy and
+    skipped_queue.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_seconds: float,
+        concurrency: int,
+        min_spare_calls: float,
+        max_calls_per_key: float = 2.0,
+        rate_limit_backoff_seconds: float = 60.0,
+        max_queued: int = 8
+    ):
+        self._records = TTLCache("task_hints", maxsize, ttl_seconds, persist=True)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._waiting: Set[str] = set()  # project ids whose prefetch waits for a slot
+        self.min_spare_calls = min_spare_calls
+        self.max_calls_per_key = max_calls_per_key
+        self.rate_limit_backoff_seconds = rate_limit_backoff_seconds
+        self.max_queued = max_queued
+
+    def _skip_reason(self) -> Optional[str]:
+        """Why a prefetch should not take upstream capacity now (None: go ahead)."""
+        if key_pool.seconds_since_rate_limited() < self.rate_limit_backoff_seconds:
+            return "quota"
+        if key_pool.available_calls() < self.min_spare_calls:
+            return "quota"
+        if key_pool.in_flight() >= self.max_calls_per_key * len(key_pool.keys):
+            return "busy"
+        return None
+
+    def register(self, project_id: str, title: str, tasks: List[str], language: str, level: str) -> None:
+        """Remember a project's plan so its hints can be generated later."""
+        self._records.set(project_id, {
+            "title": title,
+            "tasks": tasks,
+            "language": language,
+            "level": level,
+            "hints": [None] * len(tasks),
+            "prefetched": [False] * len(tasks),
+            "used": [False] * len(tasks)
+        })
+
+    def prefetch(self, project_id: str, work: Callable[[Dict[str, Any]], Awaitable[List[str]]]) -> None:
+        """Generate all hints of `project_id` in the background with `work(context)`."""
+        if len(self._waiting) >= self.max_queued:
+            metrics.increment("hints.prefetch.skipped_queue")
+            logger.info(f"⏭️ Skipping hint prefetch for {project_id}: {len(self._waiting)} already waiting")
+            return
+        self._waiting.add(project_id)
+
+        async def run() -> None:
+            try:
+                await self._slots.acquire()
+            finally:
+                self._waiting.discard(project_id)
+            try:
+                record = self._records.get(project_id)
+                if record is None or shutdown.draining:
+                    return
+                reason = self._skip_reason()
+                if reason is not None:
+                    metrics.increment(f"hints.prefetch.skipped_{reason}")
+                    logger.info(f"⏭️ Skipping hint prefetch for {project_id}: no spare API capacity ({reason})")
+                    return
+                started = time.monotonic()
+                try:
+                    hints = await work(record)
+                except Exception as e:
+                    logger.warning(f"⚠️ Hint prefetch failed for {project_id}: {e}")
+                    metrics.increment("hints.prefetch.failed")
+                    return
+            finally:
+                self._slots.release()
+            # Re-read: a hint may have been generated on demand meanwhile
+            record = self._records.get(project_id)
+            if record is None:
+                return
+            stored = 0
+            for index, hint in enumerate(hints[:len(record["hints"])]):
+                if record["hints"][index] is None and isinstance(hint, str) and hint.strip():
+                    record["hints"][index] = hint.strip()
+                    record["prefetched"][index] = True
+                    stored += 1
+            self._records.set(project_id, record)
+            metrics.increment("hints.prefetch.generated", stored)
+            metrics.observe("hints.prefetch.seconds", time.monotonic() - started)
+            logger.info(f"💡 Prefetched {stored} task hints for {project_id}")
+
+        task = asyncio.ensure_future(run())
+        self._tasks[project_id] = task
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        task.add_done_callback(lambda _: self._tasks.pop(project_id, None))
+        task.add_done_callback(lambda _: self._waiting.discard(project_id))
+
+    async def get(
+        self,
+        project_id: str,
+        index: int,
+        generate: Callable[[Dict[str, Any], int], Awaitable[str]],
+        wait_seconds: float
+    ) -> Optional[str]:
+        """
+        The hint for task `index` (0-based), or None if the project is
+        unknown. Raises IndexError for a task the project does not have.
+        """
+        record = self._records.get(project_id)
+        if record is None:
+            return None
+        if not 0 <= index < len(record["tasks"]):
+            raise IndexError(index)
+        metrics.increment("hints.requests")
+
+        task = self._tasks.get(project_id)
+        if record["hints"][index] is None and task is not None and wait_seconds > 0:
+            # Prefetch running in this worker: a wait is still faster than a cold call
+            metrics.increment("hints.prefetch_waits")
+            await asyncio.wait({task}, timeout=wait_seconds)
+            record = self._records.get(project_id) or record
+
+        hint = record["hints"][index]
+        if hint is not None:
+            if not record["prefetched"][index]:
+                metrics.increment("hints.cached")
+                return hint
+            metrics.increment("hints.prefetch_hits")
+            if not record["used"][index]:
+                record["used"][index] = True
+                metrics.increment("hints.prefetch.used")
+                self._records.set(project_id, record)
+            return hint
+
+        metrics.increment("hints.cold")
+        hint = (await generate(record, index)).strip()
+        record = self._records.get(project_id) or record
+        record["hints"][index] = hint
+        record["used"][index] = True
+        self._records.set(project_id, record)
+        return hint
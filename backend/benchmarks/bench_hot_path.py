@@ -0,0 +1,373 @@
+"""CPU cost of the request hot path, tracked across runs.
+
+Times the work a worker does per request besides waiting for Gemini:
+prompt construction, request validation (10k-character code), parsing and
+model construction of a ~30k-token Arabic ProjectInitResponse, and the
+error paths (422 rendering, truncated JSON, salvaging a cut-off challenge
+array). Inputs are the recorded fixtures in benchmarks/fixtures/, so runs
+are comparable; `--write-fixtures` regenerates them.
+
+Each case is timed in `--rounds` rounds of enough calls to last ~50ms and
+the best round is kept. A fixed pure-Python reference workload is timed
+alongside, and cases are compared as multiples of it, so a machine that
+is uniformly slower today (CPU scaling, noisy neighbours) does not look
+like a regression. Results are appended to `--history` (JSON lines) and
+compared with a baseline: per case, the median over the last
+`--baseline-runs` runs with the same `--label` and Python version, so
+one lucky run does not become the bar. The exit status is 1 when a case got slower by more than
+`--max-regression` (and by at least `--min-delta-us`, so sub-microsecond
+jitter of the cheapest cases is not reported), so the script can gate a
+deployment. Compare runs from the same machine only.
+
+Usage (from backend/):
+    python benchmarks/bench_hot_path.py
+    python benchmarks/bench_hot_path.py --filter prompt. --rounds 9
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(BACKEND_DIR, "benchmarks", "fixtures")
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from pydantic import ValidationError  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from fastapi.exceptions import RequestValidationError  # noqa: E402
+from app.main import validation_exception_handler  # noqa: E402
+from app.models.requests import ChallengeGenerateRequest, ChatRequest, CodeReviewRequest  # noqa: E402
+from app.models.responses import ProjectInitResponse  # noqa: E402
+from app.prompts.budget import estimate_tokens, _layout_cache  # noqa: E402
+from app.prompts.challenge_prompts import get_challenges_prompt  # noqa: E402
+from app.prompts.project_prompts import (  # noqa: E402
+    get_project_init_prompt,
+    get_code_review_prompt,
+    get_chat_prompt
+)
+from app.services.gemini_service import parse_json_array_prefix  # noqa: E402
+
+ARABIC = "اكتب دالة تحسب مجموع الأرقام في القائمة ثم اطبع النتيجة للمستخدم بشكل واضح"
+_ROUND_SECONDS = 0.05
+
+
+# ----- fixtures -----
+
+def _python_program(target_chars: int, arabic_ratio: int = 3) -> str:
+    """A plausible student program (functions, Arabic comments and strings) of about `target_chars`."""
+    parts = ['"""برنامج إدارة المكتبة"""', "import json", "", "books = []", ""]
+    i = 0
+    while sum(len(p) + 1 for p in parts) < target_chars:
+        comment = f"    # {ARABIC}\n" if i % arabic_ratio == 0 else ""
+        parts.append(
+            f"def handle_book_{i}(library, title, copies={i % 5 + 1}):\n"
+            f"{comment}"
+            f"    if title in library:\n"
+            f"        library[title] += copies\n"
+            f"    else:\n"
+            f"        library[title] = copies\n"
+            f"    print(\"تمت إضافة الكتاب\", title, library[title])\n"
+            f"    return library\n"
+        )
+        i += 1
+    return "\n".join(parts)[:target_chars]
+
+
+def _project_init_response(target_tokens: int) -> str:
+    """Raw text of a large Gemini /init answer, grown to `target_tokens` (estimated)."""
+    tasks = [f"المهمة {i + 1}: {ARABIC}" for i in range(10)]
+    chart = "flowchart TD\n" + "\n".join(
+        f'    S{i}["{ARABIC[:40]} {i}"] --> S{i + 1}' for i in range(40)
+    )
+    data = {
+        "project_title": "نظام إدارة المكتبة",
+        "mermaid_chart": chart,
+        "tasks": tasks,
+        "full_solution_code": "",
+        "starter_filename": "library.py"
+    }
+    code_chars = 1000
+    while True:
+        data["full_solution_code"] = _python_program(code_chars, arabic_ratio=1)
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        if estimate_tokens(text) >= target_tokens:
+            return text
+        code_chars += 2000
+
+
+def _challenges_response(count: int) -> str:
+    """Raw text of a challenge array, cut off inside its last element (MAX_TOKENS)."""
+    challenges = [
+        {
+            "title": f"تحدي رقم {n}: مجموع القائمة",
+            "description": f"{ARABIC}. " * 3,
+            "function_signature": f"def solve_{n}(numbers: list) -> int:",
+            "test_cases": [
+                {"input": f"solve_{n}([{i}, {i + 1}])", "expected": str(2 * i + 1), "hidden": i > 2}
+                for i in range(6)
+            ]
+        }
+        for n in range(count)
+    ]
+    text = json.dumps(challenges, ensure_ascii=False, indent=2)
+    return text[:len(text) - len(json.dumps(challenges[-1], ensure_ascii=False, indent=2)) // 2]
+
+
+def write_fixtures() -> None:
+    code = _python_program(10000)
+    history = []
+    for i in range(10):
+        history.append({"role": "user", "content": f"كيف أستخدم القاموس في الخطوة {i}؟"})
+        history.append({"role": "assistant", "content": f"{ARABIC}. ما الذي تتوقعه؟ " * 3})
+    requests = {
+        "project_init": {"idea": "نظام إدارة مكتبة بسيط", "language": "python", "level": "intermediate"},
+        "code_review": {
+            "code": code,
+            "language": "python",
+            "project_context": {
+                "title": "نظام إدارة المكتبة",
+                "tasks": [f"المهمة {i + 1}: {ARABIC}" for i in range(8)],
+                "current_task_index": 3
+            },
+            "session_id": "benchmark-session"
+        },
+        "chat": {
+            "message": "لماذا تعيد الدالة handle_book_3 قيمة None أحياناً؟",
+            "language": "python",
+            "project_title": "نظام إدارة المكتبة",
+            "history": history,
+            "current_code": code
+        },
+        "challenge_generate": {
+            "count": 5,
+            "difficulty": "medium",
+            "language": "python",
+            "existing_titles": [f"تحدي رقم {n}: {ARABIC[:30]}" for n in range(100)]
+        }
+    }
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    with open(os.path.join(FIXTURES_DIR, "hot_path_requests.json"), "w", encoding="utf-8") as file:
+        json.dump(requests, file, ensure_ascii=False, indent=2)
+    for name, text in (
+        ("project_init_response.json", _project_init_response(30000)),
+        ("challenges_truncated.json", _challenges_response(5))
+    ):
+        with open(os.path.join(FIXTURES_DIR, name), "w", encoding="utf-8") as file:
+            file.write(text)
+    print(f"Fixtures written to {FIXTURES_DIR}")
+
+
+def _read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as file:
+        return file.read()
+
+
+# ----- cases -----
+
+def _run_sync(coroutine):
+    """Result of a coroutine that never suspends, without an event loop."""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError("coroutine suspended")
+
+
+def cases() -> dict:
+    requests = json.loads(_read_fixture("hot_path_requests.json"))
+    init_text = _read_fixture("project_init_response.json")
+    init_data = json.loads(init_text)
+    challenges_text = _read_fixture("challenges_truncated.json")
+
+    init = requests["project_init"]
+    review = requests["code_review"]
+    chat = requests["chat"]
+    context = review["project_context"]
+    oversized = {**review, "code": review["code"] + "#" * 10}
+    http_request = Request({"type": "http", "method": "POST", "path": "/api/project/review", "headers": []})
+
+    def review_422() -> bytes:
+        try:
+            CodeReviewRequest.model_validate(oversized)
+        except ValidationError as e:
+            error = RequestValidationError(e.errors(include_url=False), body=oversized)
+            return _run_sync(validation_exception_handler(http_request, error)).body
+        raise AssertionError("oversized code was accepted")
+
+    def chat_prompt() -> str:
+        return get_chat_prompt(
+            message=chat["message"],
+            language=chat["language"],
+            project_title=chat["project_title"],
+            history=chat["history"],
+            current_code=chat["current_code"],
+            current_task=context["tasks"][context["current_task_index"]]
+        )
+
+    def chat_prompt_new_code() -> str:
+        # First prompt for a version of the file: its layout is not cached yet
+        _layout_cache.clear()
+        return chat_prompt()
+
+    def truncated_init() -> None:
+        try:
+            json.loads(init_text[:-200])
+        except json.JSONDecodeError:
+            return
+        raise AssertionError("truncated JSON parsed")
+
+    return {
+        "prompt.project_init": lambda: get_project_init_prompt(init["idea"], init["language"], init["level"]),
+        "prompt.code_review": lambda: get_code_review_prompt(
+            code=review["code"],
+            language=review["language"],
+            project_title=context["title"],
+            tasks=context["tasks"],
+            current_task_index=context["current_task_index"]
+        ),
+        "prompt.chat": chat_prompt,
+        "prompt.chat_new_code": chat_prompt_new_code,
+        "prompt.challenges": lambda: get_challenges_prompt(**{
+            key: requests["challenge_generate"][key] for key in ("count", "difficulty", "language", "existing_titles")
+        }),
+        "validate.code_review": lambda: CodeReviewRequest.model_validate(review),
+        "validate.chat": lambda: ChatRequest.model_validate(chat),
+        "validate.challenge_generate": lambda: ChallengeGenerateRequest.model_validate(requests["challenge_generate"]),
+        "parse.project_init_json": lambda: json.loads(init_text),
+        "model.project_init": lambda: ProjectInitResponse.model_validate(init_data),
+        "error.review_422": review_422,
+        "error.truncated_init_json": truncated_init,
+        "error.salvage_challenges": lambda: parse_json_array_prefix(challenges_text)
+    }
+
+
+def reference_workload() -> None:
+    """Interpreter-bound work unrelated to the app, the yardstick for the cases."""
+    words = {}
+    for i in range(2000):
+        key = f"word{i % 97}"
+        words[key] = words.get(key, 0) + i * i
+    sorted(words.items(), key=lambda item: item[1])
+
+
+def measure(fn, rounds: int) -> tuple:
+    """(calls per round, best and median microseconds per call)."""
+    fn()
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= _ROUND_SECONDS or loops >= 1_000_000:
+            break
+        loops *= 2
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        timings.append((time.perf_counter() - start) / loops * 1e6)
+    timings.sort()
+    return loops, timings[0], timings[len(timings) // 2]
+
+
+# ----- history -----
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def baseline(path: str, label: str, python: str, runs: int) -> dict:
+    """Case -> median best time, in reference units, over the last `runs` comparable runs that timed it."""
+    history = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("label") != label or record.get("python") != python:
+                    continue
+                reference = record.get("reference_us")
+                if not reference:
+                    continue
+                for name, result in record.get("results", {}).items():
+                    history.setdefault(name, []).append(result["best_us"] / reference)
+    return {name: statistics.median(values[-runs:]) for name, values in history.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--filter", default="", help="only cases whose name contains this")
+    parser.add_argument("--history", default=os.path.join(BACKEND_DIR, "benchmarks", "results", "hot_path.jsonl"))
+    parser.add_argument("--label", default=platform.node(), help="machine the results are compared within")
+    parser.add_argument("--baseline-runs", type=int, default=5, help="recent runs the baseline is taken from")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed slowdown vs. the baseline")
+    parser.add_argument("--min-delta-us", type=float, default=2.0, help="smaller slowdowns are never regressions")
+    parser.add_argument("--no-save", action="store_true", help="compare without appending to the history")
+    parser.add_argument("--write-fixtures", action="store_true", help="regenerate the fixtures and exit")
+    args = parser.parse_args()
+
+    if args.write_fixtures:
+        write_fixtures()
+        return
+
+    # The 422 handler logs every validation error; time the formatting, not the I/O
+    logging.disable(logging.CRITICAL)
+    python = platform.python_version()
+    previous = baseline(args.history, args.label, python, args.baseline_runs)
+    results = {}
+    regressions = []
+    _, reference, _ = measure(reference_workload, args.rounds)
+    print(f"reference workload: {reference:.1f} µs\n")
+
+    print(f"{'case':<30}{'calls':>9}{'best µs':>11}{'median µs':>11}{'baseline':>11}{'change':>9}")
+    for name, fn in cases().items():
+        if args.filter not in name:
+            continue
+        loops, best, median = measure(fn, args.rounds)
+        results[name] = {"best_us": round(best, 2), "median_us": round(median, 2)}
+        # Baseline in this run's µs
+        before = previous[name] * reference if name in previous else None
+        change = (best - before) / before if before else None
+        if change is not None and change > args.max_regression and best - before >= args.min_delta_us:
+            regressions.append(name)
+        print(f"{name:<30}{loops:>9}{best:>11.1f}{median:>11.1f}"
+              f"{f'{before:.1f}' if before is not None else '-':>11}"
+              f"{f'{change:+.0%}' if change is not None else '-':>9}")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as file:
+            file.write(json.dumps({
+                "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "commit": _commit(),
+                "label": args.label,
+                "python": python,
+                "platform": platform.platform(),
+                "reference_us": round(reference, 2),
+                "results": results
+            }, ensure_ascii=False) + "\n")
+
+    if regressions:
+        print(f"\nSlower than the baseline by more than {args.max_regression:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
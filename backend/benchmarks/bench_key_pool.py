@@ -0,0 +1,107 @@
+"""API-key pool behaviour against the Gemini stub.
+
+Starts the stub with a per-key quota and one forbidden key, then sends
+concurrent calls through GeminiService with several pooled keys. Prints how
+calls spread over the keys, which keys were ejected, and the success rate.
+
+Usage (from backend/):
+    python benchmarks/bench_key_pool.py --keys 3 --key-rpm 20 --calls 80
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_PORT = 9101
+
+
+def _wait_until_up(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def _drive(calls: int, concurrency: int) -> tuple:
+    from app.services.gemini_service import GeminiService, GeminiServiceError
+    from app.services.key_pool import key_pool
+    from app.services.metrics import metrics
+
+    gemini = GeminiService()
+    slots = asyncio.Semaphore(concurrency)
+    outcomes = {"ok": 0, "failed": 0}
+
+    async def call(n: int):
+        async with slots:
+            try:
+                await gemini.generate_text(f"call {n}", max_output_tokens=16, operation="bench")
+                outcomes["ok"] += 1
+            except GeminiServiceError:
+                outcomes["failed"] += 1
+
+    started = time.monotonic()
+    try:
+        await asyncio.gather(*(call(n) for n in range(calls)))
+    finally:
+        await gemini.aclose()
+    return outcomes, time.monotonic() - started, key_pool.snapshot(), metrics.snapshot()["counters"]
+
+
+def run(keys: int, key_rpm: int, calls: int, concurrency: int) -> None:
+    names = [f"bench-key-{i}" for i in range(1, keys + 1)]
+    env = dict(
+        os.environ,
+        STUB_LATENCY_MS="50",
+        STUB_KEY_RPM=str(key_rpm),
+        STUB_FORBIDDEN_KEYS="bench-key-forbidden"
+    )
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.stub_gemini:app", "--port", str(STUB_PORT), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    try:
+        _wait_until_up(f"http://127.0.0.1:{STUB_PORT}/docs")
+        # Configure the backend in-process before importing it
+        os.environ.update(
+            GOOGLE_API_KEY=names[0],
+            GOOGLE_API_KEYS=",".join(names[1:] + ["bench-key-forbidden"]),
+            GEMINI_BASE_URL=f"http://127.0.0.1:{STUB_PORT}",
+            RATE_LIMIT_PER_MINUTE=str(key_rpm * 2),  # looser than the real quota, so 429s happen
+            MAX_RETRIES="5"
+        )
+        sys.path.insert(0, BACKEND_DIR)
+        outcomes, elapsed, pool, counters = asyncio.run(_drive(calls, concurrency))
+        stats = httpx.get(f"http://127.0.0.1:{STUB_PORT}/stats").json()
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print(f"{outcomes['ok']}/{calls} calls succeeded in {elapsed:.1f}s "
+          f"({keys} keys x {key_rpm} rpm + 1 forbidden key)")
+    print(f"{'key':>6} {'calls':>6} {'429':>5} {'403':>5} {'ejections':>9} {'ejected for':>11}")
+    for entry in pool:
+        label = entry["label"]
+        def count(name):
+            return int(counters.get(f"gemini.keys.{label}.{name}", 0))
+        print(f"{label:>6} {count('calls'):>6} {count('rate_limited'):>5} {count('forbidden'):>5} "
+              f"{count('ejections'):>9} {entry['ejected_for_seconds']:>10.0f}s")
+    print(f"stub view: {stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=3)
+    parser.add_argument("--key-rpm", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=80)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    run(args.keys, args.key_rpm, args.calls, args.concurrency)
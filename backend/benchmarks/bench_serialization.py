@@ -0,0 +1,137 @@
+"""Response serialization cost per endpoint, before and after ModelResponse.
+
+"before" is what the routes used to do: build the model with `Model(**data)`,
+return it, and let FastAPI re-validate it against `response_model`, run
+`jsonable_encoder` and render it with the stdlib `json` module. "after" is
+`ModelResponse(Model.model_validate(data))`: one validation and one
+serialization pass in pydantic-core. Compressed sizes and the time to
+compress are listed for the "after" body.
+
+No server or Gemini stub is needed; payloads are synthetic but sized like
+real responses (Arabic text, long solution code).
+
+Usage (from backend/):
+    python benchmarks/bench_serialization.py --repeat 200
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import APIRoute, serialize_response  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.middleware import brotli  # noqa: E402
+from app.models.responses import (  # noqa: E402
+    ProjectInitResponse,
+    ProjectPlanResponse,
+    CodeReviewResponse,
+    ChatResponse,
+    ChallengeGenerateResponse,
+    ChallengeCatalogPage
+)
+from app.responses import ModelResponse  # noqa: E402
+
+ARABIC = "اكتب دالة تحسب مجموع الأرقام في القائمة ثم اطبع النتيجة للمستخدم بشكل واضح"
+
+
+def _challenge(n: int, with_id: bool = False) -> dict:
+    challenge = {
+        "title": f"تحدي رقم {n}: مجموع القائمة",
+        "description": f"{ARABIC}. " * 4,
+        "function_signature": f"def solve_{n}(numbers: list) -> int:",
+        "test_cases": [
+            {"input": f"solve_{n}([{i}, {i + 1}, {i + 2}])", "expected": str(3 * i + 3), "hidden": i > 2}
+            for i in range(6)
+        ]
+    }
+    if with_id:
+        challenge["id"] = n
+    return challenge
+
+
+def payloads() -> dict:
+    code = "\n".join(
+        f"def step_{i}(values):\n    # {ARABIC}\n    return [v * {i} for v in values if v > {i}]\n"
+        for i in range(400)
+    )
+    chart = "flowchart TD\n" + "\n".join(f'    S{i}["{ARABIC[:30]} {i}"] --> S{i + 1}' for i in range(40))
+    tasks = [f"المهمة {i}: {ARABIC}" for i in range(12)]
+    return {
+        "project_init": (ProjectInitResponse, {
+            "project_title": "نظام إدارة المكتبة",
+            "mermaid_chart": chart,
+            "tasks": tasks,
+            "starter_filename": "main.py",
+            "full_solution_code": code
+        }),
+        "project_plan": (ProjectPlanResponse, {
+            "project_id": "0" * 32,
+            "project_title": "نظام إدارة المكتبة",
+            "mermaid_chart": chart,
+            "tasks": tasks,
+            "starter_filename": "main.py"
+        }),
+        "review": (CodeReviewResponse, {
+            "review_comment": f"{ARABIC}؟ " * 3,
+            "highlight_line": 12,
+            "severity": "warning",
+            "code_version": 3
+        }),
+        "chat": (ChatResponse, {"response": f"{ARABIC}. " * 20, "suggested_reading": None}),
+        "challenges": (ChallengeGenerateResponse, {"challenges": [_challenge(n) for n in range(5)]}),
+        "catalog_page": (ChallengeCatalogPage, {
+            "challenges": [_challenge(n, with_id=True) for n in range(20)],
+            "next_cursor": "WzEwMF0="
+        })
+    }
+
+
+def _per_call_us(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+async def _before_us(model_cls, data: dict, repeat: int) -> float:
+    field = APIRoute("/bench", lambda: None, response_model=model_cls).response_field
+    start = time.perf_counter()
+    for _ in range(repeat):
+        content = await serialize_response(field=field, response_content=model_cls(**data), is_coroutine=True)
+        JSONResponse(content).body
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<14}{'bytes':>9}{'before µs':>12}{'after µs':>11}{'speedup':>9}"
+          f"{'gzip B':>9}{'gzip µs':>10}{'br B':>9}{'br µs':>9}")
+    for name, (model_cls, data) in payloads().items():
+        before = asyncio.run(_before_us(model_cls, data, args.repeat))
+        after = _per_call_us(lambda: ModelResponse(model_cls.model_validate(data)).body, args.repeat)
+        body = ModelResponse(model_cls.model_validate(data)).body
+        gzip_size = len(gzip.compress(body, compresslevel=settings.gzip_level, mtime=0))
+        gzip_us = _per_call_us(lambda: gzip.compress(body, compresslevel=settings.gzip_level, mtime=0), args.repeat)
+        if brotli is not None:
+            br_size = str(len(brotli.compress(body, quality=settings.brotli_quality)))
+            br_us = f"{_per_call_us(lambda: brotli.compress(body, quality=settings.brotli_quality), args.repeat):.0f}"
+        else:
+            br_size = br_us = "-"
+        print(f"{name:<14}{len(body):>9}{before:>12.0f}{after:>11.0f}{before / after:>8.1f}x"
+              f"{gzip_size:>9}{gzip_us:>10.0f}{br_size:>9}{br_us:>9}")
+    if brotli is None:
+        print("\nbrotli is not installed; responses are gzip-only")
+
+
+if __name__ == "__main__":
+    main()
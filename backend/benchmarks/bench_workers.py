@@ -0,0 +1,112 @@
+"""Throughput of /api/project/review vs. production worker count.
+
+Starts the Gemini stub and the backend (`run.py` in production mode) for each
+worker count, drives concurrent review requests with unique code (so caches
+never hit) and prints requests/second and latency percentiles.
+
+Usage (from backend/):
+    python benchmarks/bench_workers.py --workers 1 2 4 --concurrency 64 --duration 15
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_PORT = 9100
+SERVER_PORT = 8100
+
+
+def _review_payload(n: int) -> dict:
+    body = "\n".join(f"    total_{i} = value * {i} + {n}  # step {i}" for i in range(80))
+    code = f"def compute(value):\n{body}\n    return total_1\n\nprint(compute(int(input('n: '))))\n"
+    return {
+        "code": code,
+        "language": "python",
+        "project_context": {"title": "حاسبة", "tasks": ["اطلب رقماً", "احسب النتيجة", "اطبع النتيجة"], "current_task_index": 1}
+    }
+
+
+def _wait_until_up(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def _drive(concurrency: int, duration: float) -> list:
+    latencies = []
+    counter = iter(range(10 ** 9))
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{SERVER_PORT}", limits=limits, timeout=60) as client:
+        async def worker():
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                response = await client.post("/api/project/review", json=_review_payload(next(counter)))
+                if response.status_code == 200:
+                    latencies.append(time.monotonic() - started)
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def run(workers_list, concurrency: int, duration: float, stub_latency_ms: int) -> None:
+    env = dict(
+        os.environ,
+        GOOGLE_API_KEY="benchmark",
+        GEMINI_BASE_URL=f"http://127.0.0.1:{STUB_PORT}",
+        ENVIRONMENT="production",
+        PORT=str(SERVER_PORT),
+        HOST="127.0.0.1",
+        RATE_LIMIT_PER_MINUTE="0",
+        REVIEW_DEBOUNCE_SECONDS="0",
+        STUB_LATENCY_MS=str(stub_latency_ms)
+    )
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.stub_gemini:app", "--port", str(STUB_PORT), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    try:
+        _wait_until_up(f"http://127.0.0.1:{STUB_PORT}/docs")
+        print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'ok':>7}")
+        for workers in workers_list:
+            server = subprocess.Popen(
+                [sys.executable, "run.py"], cwd=BACKEND_DIR,
+                env=dict(env, WORKERS=str(workers)),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                _wait_until_up(f"http://127.0.0.1:{SERVER_PORT}/health")
+                latencies = asyncio.run(_drive(concurrency, duration))
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+            if not latencies:
+                print(f"{workers:>7} no successful requests")
+                continue
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{workers:>7} {len(latencies) / duration:>8.1f} "
+                  f"{statistics.median(latencies) * 1000:>8.1f} {p95 * 1000:>8.1f} {len(latencies):>7}")
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--stub-latency-ms", type=int, default=200)
+    args = parser.parse_args()
+    run(args.workers, args.concurrency, args.duration, args.stub_latency_ms)
@@ -0,0 +1,101 @@
+"""Local stand-in for the Gemini REST API, for benchmarks and offline testing.
+
+Run: uvicorn benchmarks.stub_gemini:app --port 9000
+Then point the backend at it with GEMINI_BASE_URL=http://127.0.0.1:9000
+
+Environment:
+    STUB_LATENCY_MS       simulated generation time per call (default 200)
+    STUB_KEY_RPM          per-API-key requests per minute before 429 (default 0 = unlimited)
+    STUB_FORBIDDEN_KEYS   comma-separated API keys answered with 403
+    STUB_CHUNKS           events per streamed answer (default 8)
+
+`:streamGenerateContent?alt=sse` streams the text answer in STUB_CHUNKS
+server-sent events spread over the simulated generation time.
+
+GET /stats returns calls and 429/403 responses per API key.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Gemini stub")
+
+LATENCY_SECONDS = int(os.getenv("STUB_LATENCY_MS", "200")) / 1000
+KEY_RPM = int(os.getenv("STUB_KEY_RPM", "0"))
+FORBIDDEN_KEYS = {k for k in os.getenv("STUB_FORBIDDEN_KEYS", "").split(",") if k}
+CHUNKS = int(os.getenv("STUB_CHUNKS", "8"))
+
+calls = Counter()
+rejected = Counter()
+windows = Counter()
+
+REVIEW = {
+    "review_comment": "✓ أحسنت! الكود يعمل بشكل صحيح.\n✗ لا توجد أخطاء.\nالخطوة التالية: أكمل المهمة التالية.",
+    "highlight_line": None,
+    "severity": "info"
+}
+
+CHAT = "سؤال جيد! ما الذي تتوقع أن يحدث لو غيّرت قيمة المتغير داخل الحلقة؟ جرّب ذلك ثم أخبرني بما لاحظته."
+
+
+def _response(text: str, finished: bool = True) -> dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}}
+    if not finished:
+        return {"candidates": [candidate]}
+    return {
+        "candidates": [{**candidate, "finishReason": "STOP"}],
+        "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": max(1, len(text) // 4)}
+    }
+
+
+async def _sse(text: str):
+    size = -(-len(text) // CHUNKS)
+    pieces = [text[i:i + size] for i in range(0, len(text), size)]
+    for n, piece in enumerate(pieces):
+        await asyncio.sleep(LATENCY_SECONDS / len(pieces))
+        event = _response(piece, finished=n == len(pieces) - 1)
+        yield f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n"
+
+
+def _error(code: int, status: str, message: str, retry_delay: float = None) -> JSONResponse:
+    details = [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{retry_delay:.0f}s"}] if retry_delay else []
+    return JSONResponse(
+        {"error": {"code": code, "message": message, "status": status, "details": details}},
+        status_code=code
+    )
+
+
+@app.get("/stats")
+async def stats():
+    """Calls and rejections per API key."""
+    return {"calls": dict(calls), "rejected": dict(rejected)}
+
+
+@app.post("/v1beta/models/{model_action}")
+async def generate_content(model_action: str, request: Request):
+    """models/{model}:generateContent and :streamGenerateContent"""
+    api_key = request.headers.get("x-goog-api-key", "")
+    calls[api_key] += 1
+    if api_key in FORBIDDEN_KEYS:
+        rejected[f"{api_key}:403"] += 1
+        return _error(403, "PERMISSION_DENIED", "API key not valid.")
+    if KEY_RPM:
+        window = int(time.time() // 60)
+        windows[(api_key, window)] += 1
+        if windows[(api_key, window)] > KEY_RPM:
+            rejected[f"{api_key}:429"] += 1
+            retry_delay = (window + 1) * 60 - time.time()
+            return _error(429, "RESOURCE_EXHAUSTED", "Quota exceeded.", retry_delay)
+
+    body = await request.json()
+    if model_action.endswith(":streamGenerateContent"):
+        return StreamingResponse(_sse(CHAT), media_type="text/event-stream")
+    await asyncio.sleep(LATENCY_SECONDS)
+    config = body.get("generationConfig", {})
+    if config.get("responseMimeType") == "application/json":
+        return _response(json.dumps(REVIEW, ensure_ascii=False))
+    return _response("OK")
@@ -1,12 +1,77 @@
 """Entry point for running the backend server."""
+import os
+import tempfile
 import uvicorn
 from app.config import settings
 
+
+def available_cores() -> int:
+    """CPU cores this process may run on (respects affinity/cgroup pinning)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def configure_shared_state(workers: int) -> None:
+    """Point every worker at one SQLite store so caches and limits are not per-process."""
+    if workers > 1 and not settings.shared_state_path:
+        # The store holds pickles: keep it (and its WAL files) in a 0700
+        # directory, never at a predictable path other local users could create
+        path = os.path.join(tempfile.mkdtemp(prefix="cobuild-shared-"), "state.sqlite3")
+        os.environ["SHARED_STATE_PATH"] = path
+        settings.shared_state_path = path
+
+
+def run_production() -> None:
+    """N workers with uvloop/httptools, preloaded app and graceful draining."""
+    workers = settings.workers or available_cores()
+    configure_shared_state(workers)
+
+    try:
+        from gunicorn.app.base import BaseApplication
+        from uvicorn.workers import UvicornWorker
+    except ImportError:
+        # No gunicorn (e.g. Windows): uvicorn's own process manager
+        import app.main  # noqa: F401 - fail fast on import/config errors before spawning
+        uvicorn.run(
+            "app.main:app",
+            host=settings.host,
+            port=settings.port,
+            workers=workers,
+            timeout_graceful_shutdown=settings.graceful_shutdown_timeout,
+            log_level="info",
+            access_log=False  # RequestLoggingMiddleware logs requests
+        )
+        return
+
+    class ProductionWorker(UvicornWorker):
+        CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on", "access_log": False}
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{settings.host}:{settings.port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", ProductionWorker)
+            self.cfg.set("preload_app", True)  # import once, fork copy-on-write workers
+            self.cfg.set("graceful_timeout", settings.graceful_shutdown_timeout)
+            self.cfg.set("loglevel", "info")
+
+        def load(self):
+            from app.main import app
+            return app
+
+    ProductionServer().run()
+
+
 if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host=settings.host,
-        port=settings.port,
-        reload=not settings.is_production,
-        log_level="info" if settings.is_production else "debug"
-    )
+    if settings.is_production:
+        run_production()
+    else:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.host,
+            port=settings.port,
+            reload=True,
+            log_level="debug",
+            access_log=False
+        )
@@ -0,0 +1,7 @@
+"""Settings for the unit tests: no real key, no snapshot or metrics files."""
+import os
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ["STATE_SNAPSHOT_PATH"] = ""
+os.environ["METRICS_LOG_PATH"] = ""
+os.environ["CHALLENGE_CATALOG_PATH"] = ""
@@ -0,0 +1,120 @@
+import ast
+
+import pytest
+
+from app.prompts.budget import (
+    _brace_layout_blocks,
+    _python_layout_blocks,
+    estimate_tokens,
+    fit_code,
+    fit_history,
+    truncate_to_tokens,
+)
+
+PYTHON_SAMPLE = '''# Todo app
+import os
+
+TASKS = [
+    "a (",
+    "b",
+]
+
+
+@dataclass
+@total_ordering
+class Task:
+    """A task.
+
+def not_a_function():
+    """
+    title: str  # (unbalanced in a comment
+
+
+def add(tasks, title):
+    if not title:
+        return tasks
+    else:
+        return tasks + [Task(title)]
+# a comment at the margin
+total = 1 + \\
+2
+query = """
+SELECT *
+"""
+
+
+def main():
+    print(add([], 'x)'))
+'''
+
+
+def ast_blocks(code: str):
+    """Reference: top-level statements with decorators, as the AST sees them."""
+    tree = ast.parse(code)
+    starts = [min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]) for node in tree.body]
+    starts[0] = 1
+    line_count = len(code.split("\n"))
+    return [[start, end - 1] for start, end in zip(starts, starts[1:] + [line_count + 1])]
+
+
+def test_python_layout_matches_the_ast():
+    assert _python_layout_blocks(PYTHON_SAMPLE.split("\n")) == ast_blocks(PYTHON_SAMPLE)
+
+
+def test_python_layout_survives_code_that_does_not_parse():
+    code = "def broken(:\n    pass\n\ndef fine():\n    return 1\n"
+    assert _python_layout_blocks(code.split("\n")) == [[1, 3], [4, 6]]
+
+
+def test_brace_layout_keeps_else_with_its_if():
+    code = "int f() {\n  return 1;\n}\nif (x) {\n}\nelse {\n}\nint g;"
+    assert _brace_layout_blocks(code.split("\n")) == [[1, 3], [4, 7], [8, 8]]
+
+
+def make_code(functions: int) -> str:
+    return "\n\n".join(f"def step_{i}(value):\n    return value + {i}" for i in range(functions))
+
+
+def test_fitting_code_is_returned_as_is():
+    code = make_code(3)
+    assert fit_code(code, "python", budget=1000) == code
+
+
+def test_excerpt_keeps_the_focused_block_and_numbers_lines():
+    code = make_code(40)
+    excerpt = fit_code(code, "python", budget=60, focus_text="why does step_7 fail?")
+    assert excerpt.startswith("(excerpt:")
+    assert "  22| def step_7(value):" in excerpt
+    assert "omitted" in excerpt
+    assert estimate_tokens(excerpt) < estimate_tokens(code)
+
+
+def test_anchor_line_beats_the_end_of_the_file():
+    code = make_code(40)
+    excerpt = fit_code(code, "python", budget=40, anchor_lines=[2])
+    assert "   2|     return value + 0" in excerpt
+    assert "step_39" not in excerpt
+
+
+def test_without_focus_the_end_of_the_file_is_kept():
+    excerpt = fit_code(make_code(40), "python", budget=40)
+    assert "step_39" in excerpt and "step_0(" not in excerpt
+
+
+@pytest.mark.parametrize("budget, expected", [(1000, ["q1", "a1", "q2", "a2"]), (12, ["q2", "a2"])])
+def test_fit_history_keeps_the_latest_turns(budget, expected):
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": text}
+               for i, text in enumerate(["q1 " * 5, "a1 " * 5, "q2", "a2"])]
+    assert [turn["content"].split()[0] for turn in fit_history(history, budget, max_turns=10)] == expected
+
+
+def test_fit_history_shortens_an_oversized_latest_turn():
+    fitted = fit_history([{"role": "user", "content": "word " * 200}], budget=20, max_turns=10)
+    assert len(fitted) == 1 and fitted[0]["content"].endswith("…")
+    assert fit_history([{"role": "user", "content": "x"}], budget=100, max_turns=0) == []
+
+
+def test_truncate_to_tokens_cuts_at_a_word():
+    text = "alpha beta gamma delta " * 20
+    cut = truncate_to_tokens(text, 10)
+    assert estimate_tokens(cut) <= 11 and cut.endswith(" …") and text.startswith(cut[:-2])
@@ -0,0 +1,91 @@
+import pytest
+
+from app.models.responses import Challenge, TestCase as ChallengeTestCase
+from app.services.challenge_catalog import ChallengeCatalog, decode_cursor, encode_cursor, fts_query
+
+
+def make_challenge(title: str, description: str) -> Challenge:
+    return Challenge(
+        title=title,
+        description=description,
+        function_signature="def solve(values):",
+        test_cases=[ChallengeTestCase(input="[1]", expected="1", hidden=False)]
+    )
+
+
+@pytest.fixture
+def catalog(tmp_path) -> ChallengeCatalog:
+    return ChallengeCatalog(str(tmp_path / "nested" / "challenges.sqlite3"))
+
+
+def titles(challenges) -> list:
+    return [challenge.title for challenge in challenges]
+
+
+def test_cursor_round_trip_and_malformed_cursor():
+    assert decode_cursor(encode_cursor(1, 42)) == [1, 42]
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+
+
+def test_fts_query_is_normalized_prefix_match():
+    assert fts_query("Sum of Lists") == '"sum"* "of"* "lists"*'
+    assert fts_query("!!") is None
+
+
+def test_add_ignores_repeated_titles_and_creates_the_directory(catalog):
+    catalog.add(make_challenge("Sum", "Add numbers"), "python", "easy")
+    catalog.add(make_challenge("Sum", "Another text"), "python", "easy")
+    page, cursor = catalog.browse("python", None, 10)
+    assert titles(page) == ["Sum"] and cursor is None
+
+
+def test_browse_is_newest_first_and_paginated(catalog):
+    for index in range(5):
+        catalog.add(make_challenge(f"Challenge {index}", "text"), "python", "easy")
+    catalog.add(make_challenge("Other language", "text"), "cpp", "easy")
+    first, cursor = catalog.browse("python", "easy", 3)
+    second, last = catalog.browse("python", "easy", 3, cursor)
+    assert titles(first) == ["Challenge 4", "Challenge 3", "Challenge 2"]
+    assert titles(second) == ["Challenge 1", "Challenge 0"] and last is None
+
+
+def test_search_puts_title_matches_first(catalog):
+    catalog.add(make_challenge("Reverse words", "Sum each list first"), "python", "easy")
+    catalog.add(make_challenge("Sum of a list", "Add all numbers"), "python", "easy")
+    catalog.add(make_challenge("Count vowels", "Nothing to see"), "python", "easy")
+    page, _ = catalog.search("sum list", None, None, 10)
+    assert titles(page) == ["Sum of a list", "Reverse words"]
+
+
+def test_search_filters_language_and_difficulty(catalog):
+    catalog.add(make_challenge("Sum list", "numbers"), "python", "easy")
+    catalog.add(make_challenge("Sum list", "numbers"), "cpp", "hard")
+    page, _ = catalog.search("sum", "cpp", "hard", 10)
+    assert len(page) == 1
+    assert catalog.search("sum", "javascript", None, 10) == ([], None)
+
+
+def test_search_pages_never_skip_or_repeat_while_rows_are_added(catalog):
+    for index in range(12):
+        catalog.add(make_challenge(f"Sum {index}", "add the numbers of a list " * (index % 3 + 1)), "python", "easy")
+    seen, cursor = [], None
+    for _ in range(10):
+        page, cursor = catalog.search("sum numbers", None, None, 4, cursor)
+        seen.extend(titles(page))
+        # New matches between pages shift every bm25 score
+        catalog.add(make_challenge(f"Late sum {len(seen)}", "numbers " * 5), "python", "easy")
+        if cursor is None:
+            break
+    assert cursor is None
+    originals = [title for title in seen if not title.startswith("Late")]
+    assert len(seen) == len(set(seen))
+    assert sorted(originals) == sorted(f"Sum {index}" for index in range(12))
+
+
+def test_pick_excludes_known_titles(catalog):
+    for index in range(6):
+        catalog.add(make_challenge(f"Challenge {index}", "text"), "python", "easy")
+    picked = catalog.pick("python", "easy", 10, ["challenge 2", "Challenge 3"])
+    assert sorted(titles(picked)) == ["Challenge 0", "Challenge 1", "Challenge 4", "Challenge 5"]
+    assert catalog.pick("cpp", "easy", 3, []) == []
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import shutil
+
+import pytest
+
+from app.models.responses import Challenge, TestCase as ChallengeTestCase
+from app.services import challenge_converter as converter
+from app.services.challenge_converter import (
+    ConversionError,
+    analyze_challenge,
+    convert_challenge,
+    parse_call,
+    parse_expected,
+    parse_signature,
+    render_value,
+)
+
+
+def make_challenge(signature: str, cases) -> Challenge:
+    return Challenge(
+        title="Sum of a List",
+        description="Return the sum of the numbers.",
+        function_signature=signature,
+        test_cases=[
+            ChallengeTestCase(input=call, expected=expected, hidden=index > 0)
+            for index, (call, expected) in enumerate(cases)
+        ]
+    )
+
+
+PYTHON_SUM = make_challenge("def total(numbers):", [("total([1, 2, 3])", "6"), ("total([])", "0")])
+
+
+def test_parse_call_reads_literals_per_language():
+    assert parse_call("f(1, [2.5, -3], 'a\\n', True)", "python") == ("f", [1, [2.5, -3], "a\n", True])
+    assert parse_call("f({1, 2}, 3LL, false);", "cpp") == ("f", [[1, 2], 3, False])
+    with pytest.raises(ConversionError):
+        parse_call("f(x)", "python")
+    with pytest.raises(ConversionError):
+        parse_call("f(1) + 1", "javascript")
+
+
+def test_parse_expected_uses_the_return_type():
+    assert parse_expected("5", "python", "str") == "5"
+    assert parse_expected("'hi'", "python", None) == "hi"
+    assert parse_expected("1", "cpp", "bool") is True
+    assert parse_expected("[1, 2]", "javascript", None) == [1, 2]
+
+
+def test_parse_signature_reads_declared_types():
+    spec = parse_signature("vector<int> evens(const vector<int>& xs, int limit) {", "cpp")
+    assert spec.name == "evens" and spec.params == ["xs", "limit"]
+    assert spec.param_types == [("list", "int"), "int"] and spec.return_type == ("list", "int")
+    assert parse_signature("def f(a: list[float]) -> bool:", "python").param_types == [("list", "float")]
+    with pytest.raises(ConversionError):
+        parse_signature("def f(*args):", "python")
+
+
+def test_analyze_infers_types_from_the_tests():
+    spec, args, expected = analyze_challenge(PYTHON_SUM, "python")
+    assert spec.param_types == [("list", "int")] and spec.return_type == "int"
+    assert args == [[[1, 2, 3]], [[]]] and expected == [6, 0]
+
+
+def test_render_value_per_language():
+    assert render_value([1.0, 2.5], ("list", "float"), "cpp") == "{1.0, 2.5}"
+    assert render_value("é", "str", "javascript") == '"é"'
+    assert render_value(True, "bool", "python") == "True"
+    assert render_value(2 ** 40, "int", "cpp") == f"{2 ** 40}LL"
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_python_challenge_converts_to_javascript():
+    derived = asyncio.run(convert_challenge(PYTHON_SUM, "python", "javascript"))
+    assert derived.function_signature == "function total(numbers) {"
+    assert [(t.input, t.expected, t.hidden) for t in derived.test_cases] == [
+        ("total([1, 2, 3])", "6", False), ("total([])", "0", True)
+    ]
+
+
+@pytest.mark.skipif(shutil.which("g++") is None, reason="g++ is not installed")
+def test_python_challenge_converts_to_cpp():
+    derived = asyncio.run(convert_challenge(PYTHON_SUM, "python", "cpp"))
+    assert derived.function_signature == "int total(vector<int> numbers) {"
+    assert derived.test_cases[0].input == "total({1, 2, 3})"
+
+
+def test_unconvertible_challenge_is_skipped():
+    challenge = make_challenge("def f(x):", [("f(None)", "1")])
+    assert asyncio.run(convert_challenge(challenge, "python", "javascript")) is None
+
+
+def test_unexpected_toolchain_output_skips_only_that_language(monkeypatch):
+    async def printed_outputs(language, signature, calls, expected_literals):
+        if language == "javascript":
+            return json.loads("Segmentation fault")
+        return [str(value) for value in (6, 0)]
+    monkeypatch.setattr(converter, "_printed_outputs", printed_outputs)
+
+    assert asyncio.run(convert_challenge(PYTHON_SUM, "python", "javascript")) is None
+    derived = asyncio.run(convert_challenge(PYTHON_SUM, "python", "cpp"))
+    assert derived is not None and [t.expected for t in derived.test_cases] == ["6", "0"]
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.models.requests import ChallengeGenerateRequest
+from app.models.responses import Challenge, TestCase as ChallengeTestCase
+from app.routers import challenges as challenges_router
+from app.services.challenge_index import ChallengeIndex, find_duplicate, similar_title
+
+
+def make_challenge(title: str, description: str, name: str = "solve") -> Challenge:
+    return Challenge(
+        title=title,
+        description=description,
+        function_signature=f"def {name}(values):",
+        test_cases=[ChallengeTestCase(input="[1, 2]", expected="3", hidden=False)]
+    )
+
+
+SUM_LIST = make_challenge("Sum of a List", "Return the sum of all numbers in the list.", "sum_list")
+SUM_LIST_AGAIN = make_challenge("Sum Of A List!", "Return the sum of all the numbers in a list.", "sum_list")
+REVERSE = make_challenge("Reverse a String", "Return the characters of the string in reverse order.", "reverse")
+
+
+def test_similar_titles_are_duplicates():
+    assert similar_title("Sum of a list", ["Reverse a String", "Sum of a List"]) == "Sum of a List"
+    assert similar_title("Reverse a String", ["Sum of a List"]) is None
+
+
+def test_duplicates_are_checked_against_the_clients_titles():
+    assert find_duplicate(SUM_LIST_AGAIN, ["Sum of a List"]) == "Sum of a List"
+    assert find_duplicate(REVERSE, ["Sum of a List"]) is None
+
+
+def test_duplicates_within_the_batch_are_checked_on_full_text():
+    renamed = make_challenge("Total of the Numbers", SUM_LIST.description, "sum_list")
+    assert find_duplicate(renamed, [], [SUM_LIST]) == "Sum of a List"
+    assert find_duplicate(REVERSE, [], [SUM_LIST]) is None
+
+
+def test_index_finds_challenges_issued_to_anyone():
+    index = ChallengeIndex()
+    index.add(SUM_LIST, "python", "easy")
+    assert index.find_issued(SUM_LIST_AGAIN, "python", "easy") == "Sum of a List"
+    assert index.find_issued(SUM_LIST_AGAIN, "python", "hard") is None
+    assert index.find_issued(REVERSE, "python", "easy") is None
+    assert index.recent_titles("python", "easy", 5) == ["Sum of a List"]
+
+
+@pytest.fixture
+def fresh_index(monkeypatch) -> ChallengeIndex:
+    index = ChallengeIndex()
+    monkeypatch.setattr(challenges_router, "challenge_index", index)
+    monkeypatch.setattr(challenges_router, "challenge_catalog", None)
+    return index
+
+
+def fake_model(monkeypatch, *responses):
+    calls = []
+
+    async def generate_json(prompt, **kwargs):
+        calls.append(prompt)
+        return [challenge.model_dump() for challenge in responses[min(len(calls), len(responses)) - 1]]
+
+    monkeypatch.setattr(challenges_router.gemini, "generate_json", generate_json)
+    return calls
+
+
+def request(count: int, existing_titles=()) -> ChallengeGenerateRequest:
+    return ChallengeGenerateRequest(count=count, difficulty="easy", language="python", existing_titles=list(existing_titles))
+
+
+def test_challenge_given_to_another_client_is_still_served(monkeypatch, fresh_index):
+    calls = fake_model(monkeypatch, [SUM_LIST])
+    first = asyncio.run(challenges_router.fill_challenges(request(1), []))
+    second = asyncio.run(challenges_router.fill_challenges(request(1), []))
+    assert [c.title for c in first] == [c.title for c in second] == ["Sum of a List"]
+    assert len(calls) == 2
+
+
+def test_challenge_the_client_already_has_is_dropped(monkeypatch, fresh_index):
+    calls = fake_model(monkeypatch, [SUM_LIST_AGAIN], [REVERSE])
+    served = asyncio.run(challenges_router.fill_challenges(request(1, ["Sum of a List"]), []))
+    assert [c.title for c in served] == ["Reverse a String"]
+    assert len(calls) == 2
+
+
+def test_batch_repeats_are_dropped(monkeypatch, fresh_index):
+    fake_model(monkeypatch, [SUM_LIST, SUM_LIST_AGAIN], [REVERSE])
+    served = asyncio.run(challenges_router.fill_challenges(request(2), []))
+    assert [c.title for c in served] == ["Sum of a List", "Reverse a String"]
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app.routers import project
+from app.services.ide_channel import ChannelError
+
+
+class FakeChannel:
+    def __init__(self):
+        self.session_id = "s1"
+        self.state = {}
+        self.results = {}
+
+    async def send_chunk(self, message_id, text):
+        pass
+
+    async def send_result(self, message_id, data):
+        self.results[message_id] = data
+
+
+def chat_frame(message: str, history=()) -> dict:
+    return {"message": message, "language": "python", "project_title": "Todo",
+            "history": list(history), "current_code": "x = 1"}
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    """Replace the model: answers echo the question and record the history they saw."""
+    seen = {}
+
+    async def stream_chat_answer(channel, message_id, message, *args, **kwargs):
+        seen[message] = [turn["content"] for turn in channel.state["history"]]
+        await asyncio.sleep(0.05 if message == "first" else 0)
+        if message == "fail":
+            raise ChannelError("chat_failed", "upstream failed", True)
+        return f"answer to {message}"
+
+    monkeypatch.setattr(project, "stream_chat_answer", stream_chat_answer)
+    monkeypatch.setattr(project.chat_answers, "terms", lambda question, code=None: None)
+    return seen
+
+
+def test_concurrent_chats_are_answered_in_order(answers):
+    async def scenario():
+        channel = FakeChannel()
+        await asyncio.gather(
+            project.channel_chat(channel, "m1", chat_frame("first")),
+            project.channel_chat(channel, "m2", chat_frame("second"))
+        )
+        return channel
+    channel = asyncio.run(scenario())
+    assert answers["second"] == ["first", "answer to first"]
+    assert [turn["content"] for turn in channel.state["history"]] == [
+        "first", "answer to first", "second", "answer to second"
+    ]
+
+
+def test_failed_first_chat_does_not_keep_the_seed(answers):
+    seed = [{"role": "user", "content": "earlier"}, {"role": "assistant", "content": "reply"}]
+
+    async def scenario():
+        channel = FakeChannel()
+        with pytest.raises(ChannelError):
+            await project.channel_chat(channel, "m1", chat_frame("fail", seed))
+        assert "history" not in channel.state
+        await project.channel_chat(channel, "m2", chat_frame("again", seed))
+        return channel
+    channel = asyncio.run(scenario())
+    assert answers["again"] == ["earlier", "reply"]
+    assert len(channel.state["history"]) == 4
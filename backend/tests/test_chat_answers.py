@@ -0,0 +1,107 @@
+from app.services.chat_answers import ChatAnswerCache
+
+
+def make_cache(**overrides) -> ChatAnswerCache:
+    options = {"maxsize": 100, "min_similarity": 0.8, "min_terms": 2}
+    options.update(overrides)
+    return ChatAnswerCache(**options)
+
+
+def stored(cache: ChatAnswerCache, question: str, answer: str, language: str = "python") -> None:
+    cache.store(cache.terms(question), language, answer)
+
+
+def ask(cache: ChatAnswerCache, question: str, language: str = "python"):
+    return cache.lookup(cache.terms(question), language)
+
+
+def test_same_question_in_other_words_is_served():
+    cache = make_cache()
+    stored(cache, "how do I convert a string to an int in python", "use int()")
+    assert ask(cache, "How can I convert a string to an int in Python?") == "use int()"
+
+
+def test_arabic_question_with_and_without_article_is_served():
+    cache = make_cache()
+    stored(cache, "ما هي الحلقة for في بايثون", "loop answer")
+    assert ask(cache, "اشرح حلقة for في بايثون") == "loop answer"
+
+
+def test_reversed_question_is_not_served():
+    cache = make_cache()
+    stored(cache, "how do I convert a string to an int in python", "use int()")
+    assert ask(cache, "how do I convert an int to a string in python") is None
+
+
+def test_reversed_question_is_stored_separately():
+    cache = make_cache()
+    stored(cache, "how do I convert a string to an int in python", "use int()")
+    stored(cache, "how do I convert an int to a string in python", "use str()")
+    assert ask(cache, "convert an int to a string in python") == "use str()"
+    assert ask(cache, "convert a string to an int in python") == "use int()"
+
+
+def test_negated_question_is_not_served():
+    cache = make_cache()
+    stored(cache, "why should I use global variables", "positive answer")
+    assert ask(cache, "why should I not use global variables") is None
+    assert ask(cache, "why shouldn't I use global variables") is None
+
+
+def test_negations_are_folded_together():
+    cache = make_cache()
+    stored(cache, "why should I not use global variables", "negative answer")
+    assert ask(cache, "why shouldn't I use global variables") == "negative answer"
+
+
+def test_arabic_negated_question_is_not_served():
+    cache = make_cache()
+    stored(cache, "متى نستخدم المتغيرات العامة", "positive answer")
+    assert ask(cache, "متى لا نستخدم المتغيرات العامة") is None
+
+
+def test_extra_content_word_is_not_served():
+    cache = make_cache()
+    stored(cache, "how do I sort a list", "sorted()")
+    assert ask(cache, "how do I sort a list in reverse") is None
+
+
+def test_questions_about_the_students_code_are_not_cacheable():
+    cache = make_cache()
+    code = "total_price = 0\nfor item in items:\n    total_price += item"
+    assert cache.terms("why is my loop wrong") is None
+    assert cache.terms("what does total_price do", code) is None
+    assert cache.terms("what is x = [1, 2]") is None
+    assert cache.terms("لماذا هذا الكود لا يعمل") is None
+
+
+def test_too_short_questions_are_not_cacheable():
+    assert make_cache().terms("loops?") is None
+
+
+def test_languages_are_separate():
+    cache = make_cache()
+    stored(cache, "how do I read input from the user", "input()")
+    assert ask(cache, "how do I read input from the user", language="cpp") is None
+
+
+def test_project_specific_answers_are_not_stored():
+    cache = make_cache()
+    cache.store(cache.terms("how do I read input from the user"), "python", "In Guess Game use input()", "Guess Game")
+    assert ask(cache, "how do I read input from the user") is None
+
+
+def test_least_recently_used_answers_are_evicted():
+    cache = make_cache(maxsize=1)
+    stored(cache, "how do I read input from the user", "input()")
+    stored(cache, "how do I sort a list", "sorted()")
+    assert ask(cache, "how do I read input from the user") is None
+    assert ask(cache, "how do I sort a list") == "sorted()"
+
+
+def test_export_and_restore_keep_answers():
+    cache = make_cache()
+    stored(cache, "how do I sort a list", "sorted()")
+    copy = make_cache()
+    copy.restore(cache.export())
+    assert ask(copy, "how do I sort a list") == "sorted()"
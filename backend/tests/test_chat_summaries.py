@@ -0,0 +1,144 @@
+import asyncio
+
+from app.services.chat_summaries import ChatSummaries, chain_hash
+
+
+def turns(count: int, start: int = 0) -> list:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i}"}
+        for i in range(start, start + count)
+    ]
+
+
+class FakeSummarizer:
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+
+    async def __call__(self, previous, folded):
+        self.calls.append((previous, [turn["content"] for turn in folded]))
+        if self.fail:
+            raise RuntimeError("model down")
+        return f"summary of {folded[-1]['content']}"
+
+
+async def settle() -> None:
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def make(keep: int = 2, batch: int = 2, max_fold: int = 10) -> ChatSummaries:
+    return ChatSummaries(maxsize=32, ttl_seconds=60, keep=keep, batch=batch, max_fold=max_fold)
+
+
+def test_short_history_is_sent_verbatim():
+    async def scenario():
+        summaries, summarize = make(), FakeSummarizer()
+        context = summaries.prepare(turns(3), summarize)
+        await settle()
+        return context, summarize.calls
+
+    context, calls = asyncio.run(scenario())
+    assert context.summary is None
+    assert context.covered == 0
+    assert context.covered_hash == ""
+    assert len(context.recent) == 3
+    assert calls == []
+
+
+def test_older_turns_are_summarised_in_the_background():
+    async def scenario():
+        summaries, summarize = make(), FakeSummarizer()
+        history = turns(6)
+        first = summaries.prepare(history, summarize)
+        await settle()
+        second = summaries.prepare(history, summarize)
+        return first, second, summarize.calls
+
+    first, second, calls = asyncio.run(scenario())
+    # The request that triggers the summary does not wait for it
+    assert first.summary is None and len(first.recent) == 6
+    assert calls == [(None, ["turn 0", "turn 1", "turn 2", "turn 3"])]
+    assert second.summary == "summary of turn 3"
+    assert second.covered == 4
+    assert [turn["content"] for turn in second.recent] == ["turn 4", "turn 5"]
+
+
+def test_same_prefix_is_summarised_once():
+    async def scenario():
+        summaries, summarize = make(), FakeSummarizer()
+        summaries.prepare(turns(6), summarize)
+        summaries.prepare(turns(6), summarize)
+        await settle()
+        return summarize.calls
+
+    assert len(asyncio.run(scenario())) == 1
+
+
+def test_long_history_is_folded_in_steps_of_max_fold():
+    async def scenario():
+        summaries, summarize = make(max_fold=3), FakeSummarizer()
+        history = turns(10)
+        summaries.prepare(history, summarize)
+        await settle()
+        context = summaries.prepare(history, summarize)
+        await settle()
+        return context, summarize.calls
+
+    context, calls = asyncio.run(scenario())
+    assert context.covered == 3
+    assert calls == [
+        (None, ["turn 0", "turn 1", "turn 2"]),
+        ("summary of turn 2", ["turn 3", "turn 4", "turn 5"]),
+    ]
+
+
+def test_failed_summary_keeps_turns_verbatim_and_retries():
+    async def scenario():
+        summaries, summarize = make(), FakeSummarizer(fail=True)
+        first = summaries.prepare(turns(6), summarize)
+        await settle()
+        second = summaries.prepare(turns(6), summarize)
+        await settle()
+        return first, second, summarize.calls
+
+    first, second, calls = asyncio.run(scenario())
+    assert first.covered == second.covered == 0
+    assert len(calls) == 2
+
+
+def test_base_hash_resumes_from_a_summary_the_client_kept():
+    async def scenario():
+        summaries, summarize = make(), FakeSummarizer()
+        history = turns(6)
+        summaries.prepare(history, summarize)
+        await settle()
+        covered = summaries.prepare(history, summarize)
+        # The client drops the covered turns and sends the rest plus new ones
+        resumed = summaries.prepare(covered.recent + turns(1, start=6), summarize, base_hash=covered.covered_hash)
+        return covered, resumed
+
+    covered, resumed = asyncio.run(scenario())
+    assert resumed.summary == covered.summary
+    assert resumed.covered == 0
+    assert resumed.covered_hash == covered.covered_hash
+
+
+def test_expired_base_uses_the_callers_summary_under_its_own_key():
+    async def scenario():
+        summaries, summarize = make(), FakeSummarizer()
+        return summaries.prepare(turns(5), summarize, base_hash="gone", base_summary="client copy"), summarize.calls
+
+    context, calls = asyncio.run(scenario())
+    assert context.summary == "client copy"
+    assert context.covered_hash == chain_hash("gone", {"role": "summary", "content": "client copy"})
+    assert calls[0][0] == "client copy"
+
+
+def test_unknown_base_without_a_summary_is_ignored():
+    async def scenario():
+        return make().prepare(turns(2), FakeSummarizer(), base_hash="gone")
+
+    context = asyncio.run(scenario())
+    assert context.summary is None
+    assert context.covered_hash == ""
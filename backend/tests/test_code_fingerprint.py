@@ -0,0 +1,81 @@
+from app.models.responses import CodeReviewResponse
+from app.services.code_fingerprint import (
+    fingerprint_tokens,
+    line_for_token_index,
+    normalize_code,
+    token_index_for_line
+)
+from app.services.review_cache import ReviewCache, review_cache_key
+
+
+def fingerprint(code: str, language: str) -> str:
+    return fingerprint_tokens(normalize_code(code, language))
+
+
+def test_python_ignores_comments_and_blank_lines():
+    a = "def f(x):\n    return x + 1\n"
+    b = "# helper\ndef f( x ):  # doc\n\n    return x+1\n"
+    assert fingerprint(a, "python") == fingerprint(b, "python")
+
+
+def test_python_indentation_is_significant():
+    a = "if x:\n    y()\nz()\n"
+    b = "if x:\n    y()\n    z()\n"
+    assert fingerprint(a, "python") != fingerprint(b, "python")
+
+
+def test_python_that_does_not_tokenize_falls_back_to_the_c_like_lexer():
+    tokens = normalize_code('s = """open', "python")
+    assert [token.text for token in tokens][:2] == ["s", "="]
+
+
+def test_c_like_ignores_comments_and_layout():
+    a = "int main() { return a>>=2; }"
+    b = "/* entry */\nint main()\n{\n  // shift\n  return a >>= 2;\n}\n"
+    assert fingerprint(a, "cpp") == fingerprint(b, "cpp")
+    assert [token.text for token in normalize_code(b, "cpp")][-4:] == [">>=", "2", ";", "}"]
+
+
+def test_c_like_strings_and_code_differ():
+    assert fingerprint('f("a b")', "javascript") != fingerprint('f("ab")', "javascript")
+    assert fingerprint("a === b", "javascript") != fingerprint("a == b", "javascript")
+
+
+def test_preprocessor_spacing_is_normalized():
+    assert fingerprint("#include <x>", "cpp") == fingerprint("#  include <x>", "cpp")
+
+
+def test_token_lines_follow_the_source():
+    tokens = normalize_code("let a = 1;\n/* two\nlines */\nlet b = `x\ny`;\n", "javascript")
+    assert [(token.text, token.line) for token in tokens if token.text in ("a", "b")] == [("a", 1), ("b", 4)]
+
+
+def test_line_anchor_round_trips_across_formatting():
+    compact = normalize_code("int a;\nint b;\n", "cpp")
+    spaced = normalize_code("// header\n\nint a;\n\n\nint b;\n", "cpp")
+    index = token_index_for_line(compact, 2)
+    assert line_for_token_index(spaced, index) == 6
+    assert token_index_for_line(compact, None) is None
+    assert token_index_for_line(compact, 99) is None
+    assert line_for_token_index(spaced, None) is None
+    assert line_for_token_index(spaced, len(spaced)) is None
+
+
+def test_cache_key_depends_on_the_task_context():
+    key, _ = review_cache_key("x = 1", "python", ["t1"], 0)
+    assert review_cache_key("x = 1  # c", "python", ["t1"], 0)[0] == key
+    assert review_cache_key("x = 1", "python", ["t1"], 1)[0] != key
+    assert review_cache_key("x = 1", "python", ["t2"], 0)[0] != key
+    assert review_cache_key("x = 1", "javascript", ["t1"], 0)[0] != key
+
+
+def test_review_cache_reanchors_the_highlight():
+    cache = ReviewCache(maxsize=8, ttl_seconds=60)
+    key, tokens = review_cache_key("int a;\nint b;\n", "cpp", ["t"], 0)
+    cache.set(key, tokens, CodeReviewResponse(review_comment="b", highlight_line=2, severity="info"))
+
+    key2, tokens2 = review_cache_key("\n\nint a;\n\nint b;\n", "cpp", ["t"], 0)
+    assert key2 == key
+    assert cache.get(key2, tokens2).highlight_line == 5
+    cache.clear()
+    assert cache.get(key2, tokens2) is None
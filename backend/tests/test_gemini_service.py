@@ -0,0 +1,176 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services import gemini_service as module
+from app.services.gemini_service import GeminiService, GeminiServiceError, retry_after_seconds
+from app.services.key_pool import ApiKey, KeyPool
+from app.services.rate_limiter import TokenBucket
+from app.services.retry_policy import RetryBudget, RetryPolicy
+
+
+def candidate(text: str, finish_reason: str = "STOP") -> dict:
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": finish_reason}],
+        "usageMetadata": {"candidatesTokenCount": 5}
+    }
+
+
+def make_service(monkeypatch, handler, keys: int = 1) -> GeminiService:
+    """A service whose keys, retries and transport are all local to the test."""
+    pool = KeyPool([
+        ApiKey(f"key{i}", f"secret{i}", "gemini-test", TokenBucket(f"test.gemini.key{i}", 0))
+        for i in range(1, keys + 1)
+    ])
+    monkeypatch.setattr(module, "key_pool", pool)
+    monkeypatch.setattr(module, "retry_policy", RetryPolicy(
+        max_retries=2, base_delay=0.0, max_delay=0.0, max_hint_seconds=30.0,
+        budget=RetryBudget(ratio=1.0, window_seconds=60.0, min_retries=10)
+    ))
+
+    async def no_sleep(self, wait_time, operation, max_output_tokens):
+        return None
+    monkeypatch.setattr(GeminiService, "_sleep_before_retry", no_sleep)
+
+    service = GeminiService()
+    service.clients = {
+        key.label: httpx.AsyncClient(
+            base_url="https://gemini.test",
+            headers={"x-goog-api-key": key.api_key},
+            transport=httpx.MockTransport(handler)
+        )
+        for key in pool.keys
+    }
+    return service
+
+
+def error_body(status_code: int, status: str, message: str, details=None) -> dict:
+    return {"error": {"code": status_code, "status": status, "message": message, "details": details or []}}
+
+
+def test_generate_text_sends_the_rest_payload(monkeypatch):
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json=candidate("Hello"))
+
+    service = make_service(monkeypatch, handler)
+    text = asyncio.run(service.generate_text("Say hi", temperature=0.2, max_output_tokens=50))
+    assert text == "Hello"
+    request = seen[0]
+    assert request.method == "POST"
+    assert request.url.path == "/v1beta/models/gemini-test:generateContent"
+    assert request.headers["x-goog-api-key"] == "secret1"
+    assert json.loads(request.content) == {
+        "contents": [{"role": "user", "parts": [{"text": "Say hi"}]}],
+        "generationConfig": {"temperature": 0.2, "maxOutputTokens": 50}
+    }
+
+
+def test_generate_json_asks_for_json_and_parses_it(monkeypatch):
+    configs = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        configs.append(json.loads(request.content)["generationConfig"])
+        return httpx.Response(200, json=candidate('{"ok": true}'))
+
+    service = make_service(monkeypatch, handler)
+    assert asyncio.run(service.generate_json("prompt")) == {"ok": True}
+    assert configs[0]["responseMimeType"] == "application/json"
+
+
+def test_stream_text_reads_server_sent_events(monkeypatch):
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        events = "".join(
+            f"data: {json.dumps(candidate(text, reason))}\r\n\r\n"
+            for text, reason in (("Hel", None), ("lo", "STOP"))
+        )
+        return httpx.Response(200, text=events, headers={"content-type": "text/event-stream"})
+
+    service = make_service(monkeypatch, handler)
+
+    async def collect():
+        return [chunk async for chunk in service.stream_text("Say hi")]
+    assert asyncio.run(collect()) == ["Hel", "lo"]
+    assert seen[0].url.path == "/v1beta/models/gemini-test:streamGenerateContent"
+    assert seen[0].url.params["alt"] == "sse"
+
+
+def test_rate_limit_maps_to_a_retryable_busy_error(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(429, json=error_body(429, "RESOURCE_EXHAUSTED", "quota"), headers={"retry-after": "2"})
+
+    service = make_service(monkeypatch, handler)
+    with pytest.raises(GeminiServiceError) as raised:
+        asyncio.run(service.generate_text("prompt"))
+    error = raised.value
+    assert error.retryable
+    assert error.message == module._ERROR_MESSAGES["rate_limited"][0]
+    assert error.original_error.status_code == 429
+    assert error.original_error.status == "RESOURCE_EXHAUSTED"
+    # A single key is not ejected; the retry policy backs off with the hint
+    assert error.original_error.retry_after == 2.0
+    assert len(calls) == 3
+
+
+def test_forbidden_key_fails_over_to_the_next_key(monkeypatch):
+    used = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        used.append(request.headers["x-goog-api-key"])
+        if request.headers["x-goog-api-key"] == "secret1":
+            return httpx.Response(403, json=error_body(403, "PERMISSION_DENIED", "key revoked"))
+        return httpx.Response(200, json=candidate("from key2"))
+
+    service = make_service(monkeypatch, handler, keys=2)
+    assert asyncio.run(service.generate_text("prompt")) == "from key2"
+    assert used == ["secret1", "secret2"]
+
+
+def test_forbidden_last_key_surfaces_an_auth_error(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(401, json=error_body(401, "UNAUTHENTICATED", "bad key"))
+
+    service = make_service(monkeypatch, handler)
+    with pytest.raises(GeminiServiceError) as raised:
+        asyncio.run(service.generate_text("prompt"))
+    assert not raised.value.retryable
+    assert raised.value.message == module._ERROR_MESSAGES["auth"][0]
+    assert raised.value.original_error.message == "bad key"
+
+
+def test_invalid_json_gives_an_arabic_message(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=candidate("not json"))
+
+    service = make_service(monkeypatch, handler)
+    with pytest.raises(GeminiServiceError) as raised:
+        asyncio.run(service.generate_json("prompt"))
+    assert raised.value.message == module._ERROR_MESSAGES["invalid_json"][0]
+
+
+def test_error_messages_are_arabic():
+    for message, _ in module._ERROR_MESSAGES.values():
+        assert any("؀" <= char <= "ۿ" for char in message), message
+
+
+def test_retry_after_prefers_the_header():
+    response = httpx.Response(429, headers={"retry-after": "7"})
+    assert retry_after_seconds(response, {}) == 7.0
+
+
+def test_retry_after_reads_the_retry_info_detail():
+    response = httpx.Response(429)
+    error = {"details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "12s"}]}
+    assert retry_after_seconds(response, error) == 12.0
+    assert retry_after_seconds(response, {"details": [{"@type": "x.RetryInfo", "retryDelay": "soon"}]}) is None
+    assert retry_after_seconds(response, {}) is None
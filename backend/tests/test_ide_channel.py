@@ -0,0 +1,102 @@
+import asyncio
+
+import orjson
+
+from app.config import settings
+from app.services.ide_channel import CLOSE_POLICY_VIOLATION, IdeChannel
+
+
+class FakeSocket:
+    """A WebSocket whose client reads only once `reading` is set."""
+
+    def __init__(self):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.reading = asyncio.Event()
+        self.sent = []
+        self.closed_with = None
+
+    def push(self, frame: dict) -> None:
+        self.incoming.put_nowait({"type": "websocket.receive", "text": orjson.dumps(frame).decode()})
+
+    def disconnect(self) -> None:
+        self.incoming.put_nowait({"type": "websocket.disconnect"})
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_text(self, text: str) -> None:
+        await self.reading.wait()
+        self.sent.append(orjson.loads(text))
+
+    async def close(self, code: int = 1000, reason=None) -> None:
+        self.closed_with = code
+
+
+async def settle() -> None:
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+def test_cancel_is_read_while_the_outbox_is_full(monkeypatch):
+    monkeypatch.setattr(settings, "ws_send_queue_size", 2)
+
+    async def scenario():
+        cancelled = asyncio.Event()
+
+        async def chatty(channel, message_id, frame):
+            try:
+                while True:
+                    await channel.send_chunk(message_id, "x")
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        socket = FakeSocket()
+        channel = IdeChannel(socket, "s1", {"chat": chatty})
+        running = asyncio.create_task(channel.run())
+        socket.push({"type": "chat", "id": "c1"})
+        await settle()
+        socket.push({"type": "ping"})
+        socket.push({"type": "cancel", "id": "c1"})
+        await asyncio.wait_for(cancelled.wait(), 1)
+        socket.reading.set()
+        await settle()
+        socket.disconnect()
+        await asyncio.wait_for(running, 1)
+        return socket.sent
+    sent = asyncio.run(scenario())
+    kinds = [frame["type"] for frame in sent]
+    # The pong overtakes the queued chunks
+    assert kinds.index("pong") <= 1
+    assert "cancelled" in kinds
+
+
+def test_client_that_never_reads_is_disconnected(monkeypatch):
+    monkeypatch.setattr(settings, "ws_send_queue_size", 2)
+
+    async def scenario():
+        socket = FakeSocket()
+        channel = IdeChannel(socket, "s1", {})
+        running = asyncio.create_task(channel.run())
+        for _ in range(5):
+            socket.push({"type": "ping"})
+        await asyncio.wait_for(running, 1)
+        return socket.closed_with
+    assert asyncio.run(scenario()) == CLOSE_POLICY_VIOLATION
+
+
+def test_invalid_frames_get_an_error_reply():
+    async def scenario():
+        socket = FakeSocket()
+        socket.reading.set()
+        channel = IdeChannel(socket, "s1", {})
+        running = asyncio.create_task(channel.run())
+        socket.incoming.put_nowait({"type": "websocket.receive", "text": "not json"})
+        socket.push({"type": "review", "id": "r1"})
+        await settle()
+        socket.disconnect()
+        await asyncio.wait_for(running, 1)
+        return socket.sent
+    assert [(frame["type"], frame["error"]) for frame in asyncio.run(scenario())] == [
+        ("error", "invalid_message"), ("error", "invalid_message")
+    ]
@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+
+from app.services import gemini_service as module
+from app.services.gemini_service import GeminiService, parse_json_array_prefix
+from app.services.key_pool import ApiKey, KeyPool
+from app.services.rate_limiter import TokenBucket
+from app.services.retry_policy import RetryBudget, RetryPolicy
+
+
+def test_complete_array_is_returned_whole():
+    assert parse_json_array_prefix('[{"a": 1}, {"b": [2, 3]}]') == [{"a": 1}, {"b": [2, 3]}]
+
+
+def test_truncated_array_keeps_the_closed_items():
+    assert parse_json_array_prefix('[{"a": 1}, {"b": "cut') == [{"a": 1}]
+    assert parse_json_array_prefix('  [\n  {"a": 1},\n  {"b": 2}\n') == [{"a": 1}, {"b": 2}]
+
+
+def test_scalar_at_the_cut_is_dropped():
+    # "12" may have been "123" before the cut
+    assert parse_json_array_prefix("[1, 12") == [1]
+    assert parse_json_array_prefix("[1, 12]") == [1, 12]
+
+
+def test_not_an_array():
+    assert parse_json_array_prefix('{"a": 1}') == []
+    assert parse_json_array_prefix("") == []
+    assert parse_json_array_prefix("[") == []
+
+
+def test_generate_json_salvages_a_truncated_array(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={"candidates": [{
+            "content": {"role": "model", "parts": [{"text": '[{"title": "A"}, {"title": "B'}]},
+            "finishReason": "MAX_TOKENS"
+        }]})
+
+    pool = KeyPool([ApiKey("key1", "secret", "gemini-test", TokenBucket("test.salvage", 0))])
+    monkeypatch.setattr(module, "key_pool", pool)
+    monkeypatch.setattr(module, "retry_policy", RetryPolicy(
+        max_retries=2, base_delay=0.0, max_delay=0.0, max_hint_seconds=30.0,
+        budget=RetryBudget(ratio=1.0, window_seconds=60.0, min_retries=10)
+    ))
+    service = GeminiService()
+    service.clients = {"key1": httpx.AsyncClient(base_url="https://gemini.test", transport=httpx.MockTransport(handler))}
+
+    items = asyncio.run(service.generate_json("prompt", salvage_array=True))
+    assert items == [{"title": "A"}] and len(calls) == 1
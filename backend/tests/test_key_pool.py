@@ -0,0 +1,106 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+from app.services.key_pool import ApiKey, KeyPool, NoHealthyKeys
+from app.services.rate_limiter import TokenBucket
+
+
+def make_pool(count: int, rate_per_minute: int = 0) -> KeyPool:
+    return KeyPool([
+        ApiKey(f"key{i}", f"secret{i}", "gemini-test", TokenBucket(f"test.key{i}", rate_per_minute))
+        for i in range(1, count + 1)
+    ])
+
+
+def acquire(pool: KeyPool) -> ApiKey:
+    return asyncio.run(pool.acquire())
+
+
+def test_unlimited_keys_take_turns():
+    pool = make_pool(3)
+    used = []
+    for _ in range(6):
+        key = acquire(pool)
+        pool.release(key)
+        used.append(key.label)
+    assert used == ["key1", "key2", "key3", "key1", "key2", "key3"]
+
+
+def test_key_with_fewest_calls_in_flight_is_preferred():
+    pool = make_pool(3)
+    busy = [acquire(pool) for _ in range(3)]
+    pool.release(busy[1])
+    assert acquire(pool).label == "key2"
+
+
+def test_concurrent_calls_spread_over_keys():
+    pool = make_pool(3)
+    in_flight = [acquire(pool) for _ in range(9)]
+    assert Counter(key.label for key in in_flight) == {"key1": 3, "key2": 3, "key3": 3}
+
+
+def test_limited_keys_prefer_the_most_remaining_budget():
+    pool = make_pool(2, rate_per_minute=10)
+    for _ in range(3):
+        pool.keys[0].bucket.try_acquire()
+    assert acquire(pool).label == "key2"
+
+
+def test_rate_limited_key_is_ejected():
+    pool = make_pool(2)
+    pool.record(pool.keys[0], 429, retry_after=30)
+    assert {acquire(pool).label for _ in range(4)} == {"key2"}
+
+
+def test_forbidden_key_is_ejected_while_another_is_healthy():
+    pool = make_pool(2)
+    assert pool.can_fail_over(pool.keys[0])
+    pool.record(pool.keys[0], 403)
+    assert acquire(pool).label == "key2"
+    assert pool.snapshot()[0]["ejected_for_seconds"] > 0
+
+
+def test_last_healthy_key_is_not_ejected_for_auth_errors():
+    pool = make_pool(1)
+    pool.record(pool.keys[0], 401)
+    assert acquire(pool).label == "key1"
+    assert not pool.can_fail_over(pool.keys[0])
+
+    pool = make_pool(2)
+    pool.record(pool.keys[0], 403)
+    pool.record(pool.keys[1], 403)
+    assert acquire(pool).label == "key2"
+
+
+def test_single_key_is_not_ejected_for_rate_limits():
+    pool = make_pool(1)
+    pool.record(pool.keys[0], 429, retry_after=30)
+    assert acquire(pool).label == "key1"
+    assert pool.retry_hint(pool.keys[0], 30) == 30
+
+
+def test_no_healthy_keys_reports_the_shortest_cooldown():
+    pool = make_pool(2)
+    pool.record(pool.keys[0], 429, retry_after=50)
+    pool.record(pool.keys[1], 429, retry_after=20)
+    with pytest.raises(NoHealthyKeys) as raised:
+        acquire(pool)
+    assert 0 < raised.value.retry_after <= 20
+
+
+def test_retry_hint_is_dropped_while_another_key_can_take_the_call():
+    pool = make_pool(2)
+    pool.record(pool.keys[0], 429, retry_after=30)
+    assert pool.retry_hint(pool.keys[0], 30) is None
+
+
+def test_in_flight_counts_acquired_and_released_calls():
+    pool = make_pool(2)
+    first, second = acquire(pool), acquire(pool)
+    assert pool.in_flight() == 2
+    pool.release(first)
+    pool.release(second)
+    pool.release(second)
+    assert pool.in_flight() == 0
@@ -0,0 +1,58 @@
+import pytest
+
+from app.services.mermaid import ChartError, quote_label, repair_flowchart
+
+
+def test_valid_chart_is_kept_verbatim():
+    chart = "flowchart TD\n    A[Start] --> B{Done}\n    B -->|yes| C[End]"
+    assert repair_flowchart(chart) == (chart, [])
+
+
+def test_fence_and_missing_header_are_repaired():
+    result = repair_flowchart("```mermaid\nA --> B\n```")
+    assert result.chart == "flowchart TD\nA --> B"
+    assert result.fixes == ["code_fence", "header"]
+
+
+def test_arabic_labels_are_quoted():
+    result = repair_flowchart("graph TD\n    A[ابدأ المشروع] --> B(أضف مهمة)")
+    assert result.chart == 'graph TD\n    A["ابدأ المشروع"] --> B("أضف مهمة")'
+    assert result.fixes == ["unquoted_label"]
+
+
+def test_text_links_become_labelled_arrows():
+    result = repair_flowchart("flowchart LR\n    A -- save file --> B")
+    assert result.chart == 'flowchart LR\n    A -->|"save file"| B'
+    assert result.fixes == ["link_text"]
+
+
+def test_non_ascii_node_ids_get_generated_ids():
+    result = repair_flowchart("flowchart TD\n    بداية --> نهاية\n    بداية --> A")
+    assert result.chart == 'flowchart TD\n    n1["بداية"] --> n2["نهاية"]\n    n1 --> A'
+    assert result.fixes == ["node_id"]
+
+
+def test_one_line_header_with_statements():
+    assert repair_flowchart("graph TD; A --> B") == ("graph TD; A --> B", [])
+    assert repair_flowchart("graph TD; A[مرحبا] --> B").chart == 'graph TD\nA["مرحبا"] --> B'
+
+
+def test_labels_with_quotes_use_the_entity():
+    assert quote_label(' say "hi" ') == '"say #quot;hi#quot;"'
+
+
+def test_subgraphs_and_passthrough_lines():
+    chart = "flowchart TD\n  subgraph Core\n    A --> B\n  end\n  classDef hot fill:#f00\n  class A hot"
+    assert repair_flowchart(chart) == (chart, [])
+
+
+@pytest.mark.parametrize("chart, line", [
+    ("", 1),
+    ("flowchart TD\n    A[unclosed --> B", 2),
+    ("flowchart TD\n  subgraph S\n    A --> B", 3),
+    ("flowchart TD\n    end", 2),
+])
+def test_unrepairable_charts_raise(chart, line):
+    with pytest.raises(ChartError) as raised:
+        repair_flowchart(chart)
+    assert raised.value.line == line
@@ -0,0 +1,18 @@
+import math
+
+from app.services.rate_limiter import TokenBucket
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket("test.unlimited", 0)
+    assert bucket.try_acquire() == 0.0 and bucket.available() == math.inf
+
+
+def test_bucket_holds_one_minute_of_tokens():
+    bucket = TokenBucket("test.limited", 60)
+    assert all(bucket.try_acquire() == 0.0 for _ in range(60))
+    assert bucket.available() < 1
+    wait = bucket.try_acquire()
+    assert 0.9 < wait <= 1.0
+    # A refused claim takes nothing
+    assert 0.9 < bucket.try_acquire() <= 1.0
@@ -0,0 +1,136 @@
+import asyncio
+import random
+
+import httpx
+import pytest
+
+from app.services.retry_policy import OutputError, RetryBudget, RetryPolicy, classify
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int, retry_after=None, failover: bool = False):
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.failover = failover
+        super().__init__(f"HTTP {status_code}")
+
+
+def make_policy(max_retries: int = 3, budget: RetryBudget = None, **overrides) -> RetryPolicy:
+    options = dict(base_delay=1.0, max_delay=8.0, max_hint_seconds=30.0)
+    options.update(overrides)
+    return RetryPolicy(
+        max_retries=max_retries,
+        budget=budget or RetryBudget(ratio=1.0, window_seconds=60.0, min_retries=100),
+        **options
+    )
+
+
+def run(policy: RetryPolicy, outcomes: list):
+    """Run `policy` over attempts that raise or return `outcomes` in turn."""
+    attempts, sleeps = [], []
+
+    async def attempt(n):
+        attempts.append(n)
+        outcome = outcomes[min(n, len(outcomes) - 1)]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+
+    async def go():
+        return await policy.run("test", attempt, sleep=sleep)
+    try:
+        return asyncio.run(go()), attempts, sleeps
+    except Exception as error:
+        return error, attempts, sleeps
+
+
+@pytest.mark.parametrize("status_code, kind, retryable", [
+    (400, "bad_request", False),
+    (401, "auth", False),
+    (404, "not_found", False),
+    (418, "client_error", False),
+    (429, "rate_limited", True),
+    (503, "unavailable", True),
+    (599, "server_error", True),
+])
+def test_classify_by_status(status_code, kind, retryable):
+    assert classify(StatusError(status_code)) == (kind, retryable, None)
+
+
+def test_classify_keeps_the_retry_hint_and_key_failover():
+    assert classify(StatusError(429, retry_after=4.0)).retry_after == 4.0
+    assert classify(StatusError(403, failover=True)) == ("auth", True, None)
+
+
+def test_classify_transport_and_output_errors():
+    assert classify(httpx.ReadTimeout("slow")) == ("timeout", True, None)
+    assert classify(httpx.ConnectError("down")) == ("network", True, None)
+    assert classify(OutputError("invalid_json", "bad", retryable=False)) == ("invalid_json", False, None)
+    assert classify(ValueError("bug")) == ("unexpected", False, None)
+
+
+def test_backoff_is_full_jitter_capped_at_max_delay():
+    policy = make_policy()
+    random.seed(7)
+    for retry, ceiling in ((0, 1.0), (2, 4.0), (5, 8.0)):
+        delays = [policy.backoff(retry, None) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert max(delays) > ceiling / 2
+
+
+def test_backoff_honours_a_hint_unless_it_is_too_long():
+    policy = make_policy()
+    assert policy.backoff(0, 5.0) == 5.0
+    assert policy.backoff(0, 31.0) is None
+
+
+def test_retries_until_success():
+    result, attempts, sleeps = run(make_policy(), [StatusError(503), httpx.ConnectError("down"), "ok"])
+    assert result == "ok"
+    assert attempts == [0, 1, 2]
+    assert len(sleeps) == 2
+
+
+def test_non_retryable_error_is_raised_at_once():
+    error, attempts, sleeps = run(make_policy(), [StatusError(400), "ok"])
+    assert isinstance(error, StatusError) and error.status_code == 400
+    assert attempts == [0]
+    assert sleeps == []
+
+
+def test_gives_up_after_max_retries_with_the_last_error():
+    error, attempts, _ = run(make_policy(max_retries=2), [StatusError(500), StatusError(502), StatusError(503)])
+    assert error.status_code == 503
+    assert attempts == [0, 1, 2]
+
+
+def test_too_long_hint_is_not_waited_for():
+    error, attempts, sleeps = run(make_policy(), [StatusError(429, retry_after=120.0), "ok"])
+    assert error.status_code == 429
+    assert attempts == [0]
+    assert sleeps == []
+
+
+def test_hint_is_the_minimum_wait():
+    _, _, sleeps = run(make_policy(base_delay=0.0), [StatusError(429, retry_after=3.0), "ok"])
+    assert sleeps == [3.0]
+
+
+def test_budget_allows_the_floor_plus_a_ratio_of_requests():
+    budget = RetryBudget(ratio=0.5, window_seconds=60.0, min_retries=1)
+    for _ in range(4):
+        budget.record_request()
+    assert [budget.try_spend() for _ in range(4)] == [True, True, True, False]
+
+
+def test_exhausted_budget_stops_retries():
+    budget = RetryBudget(ratio=0.0, window_seconds=60.0, min_retries=1)
+    policy = make_policy(budget=budget)
+    result, attempts, _ = run(policy, [StatusError(503), "ok"])
+    assert result == "ok" and attempts == [0, 1]
+    error, attempts, _ = run(policy, [StatusError(503), "ok"])
+    assert error.status_code == 503
+    assert attempts == [0]
@@ -0,0 +1,110 @@
+import asyncio
+import itertools
+import time
+
+import pytest
+
+from app.services.review_coalescer import LatestWinsCoalescer, _poll_intervals
+
+DEBOUNCE = 0.2
+
+
+def recording_factory(calls: list, value: str, seconds: float = 0.05):
+    def factory():
+        async def work():
+            calls.append(value)
+            await asyncio.sleep(seconds)
+            return value
+        return work()
+    return factory
+
+
+def test_isolated_submission_starts_without_debounce():
+    async def scenario():
+        coalescer = LatestWinsCoalescer(debounce_seconds=DEBOUNCE)
+        calls = []
+        started = time.monotonic()
+        result = await coalescer.submit("s1", recording_factory(calls, "v1"))
+        return result, time.monotonic() - started, calls, coalescer.active_sessions
+    result, elapsed, calls, active = asyncio.run(scenario())
+    assert result == "v1" and calls == ["v1"] and active == 0
+    assert elapsed < DEBOUNCE
+
+
+def test_burst_collapses_to_the_newest_submission():
+    async def scenario():
+        coalescer = LatestWinsCoalescer(debounce_seconds=DEBOUNCE)
+        calls = []
+        first = asyncio.ensure_future(coalescer.submit("s1", recording_factory(calls, "v1", 1.0)))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(coalescer.submit("s1", recording_factory(calls, "v2")))
+        await asyncio.sleep(0.01)
+        third = asyncio.ensure_future(coalescer.submit("s1", recording_factory(calls, "v3")))
+        return await asyncio.gather(first, second, third), calls
+    results, calls = asyncio.run(scenario())
+    assert results == ["v3", "v3", "v3"]
+    # v1 started at once and was cancelled; v2 was superseded during its debounce
+    assert calls == ["v1", "v3"]
+
+
+def test_sessions_do_not_interfere():
+    async def scenario():
+        coalescer = LatestWinsCoalescer(debounce_seconds=DEBOUNCE)
+        calls = []
+        return await asyncio.gather(
+            coalescer.submit("a", recording_factory(calls, "a1")),
+            coalescer.submit("b", recording_factory(calls, "b1"))
+        ), calls
+    results, calls = asyncio.run(scenario())
+    assert results == ["a1", "b1"] and sorted(calls) == ["a1", "b1"]
+
+
+def test_next_submission_after_a_finished_one_starts_at_once():
+    async def scenario():
+        coalescer = LatestWinsCoalescer(debounce_seconds=DEBOUNCE)
+        calls = []
+        await coalescer.submit("s1", recording_factory(calls, "v1"))
+        started = time.monotonic()
+        await coalescer.submit("s1", recording_factory(calls, "v2"))
+        return time.monotonic() - started
+    assert asyncio.run(scenario()) < DEBOUNCE
+
+
+def test_last_waiter_leaving_cancels_the_call():
+    async def scenario():
+        coalescer = LatestWinsCoalescer(debounce_seconds=DEBOUNCE)
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.ensure_future(coalescer.submit("s1", work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return coalescer.active_sessions
+    assert asyncio.run(scenario()) == 0
+
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        coalescer = LatestWinsCoalescer(debounce_seconds=0)
+
+        async def failing():
+            raise RuntimeError("upstream failed")
+
+        return await coalescer.submit("s1", failing)
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
+
+
+def test_shared_store_polls_back_off():
+    intervals = list(itertools.islice(_poll_intervals(), 8))
+    assert intervals[0] == 0.05
+    assert intervals == sorted(intervals) and intervals[-1] == 1.0
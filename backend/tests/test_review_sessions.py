@@ -0,0 +1,52 @@
+import pytest
+from pydantic import ValidationError
+
+from app.models.requests import CodeEdit
+from app.services.review_sessions import ReviewSessionError, apply_code_edits, build_review_diff
+
+CODE = "a\nb\nc"
+
+
+def edit(start: int, end: int, text):
+    return CodeEdit(start_line=start, end_line=end, text=text)
+
+
+def test_replace_a_range():
+    assert apply_code_edits(CODE, [edit(2, 2, "B1\nB2")]) == "a\nB1\nB2\nc"
+
+
+def test_null_deletes_the_range():
+    assert apply_code_edits(CODE, [edit(2, 3, None)]) == "a"
+
+
+def test_empty_text_sets_a_blank_line():
+    assert apply_code_edits(CODE, [edit(2, 2, "")]) == "a\n\nc"
+
+
+def test_insert_before_a_line_and_at_the_end():
+    assert apply_code_edits(CODE, [edit(2, 1, "")]) == "a\n\nb\nc"
+    assert apply_code_edits(CODE, [edit(4, 3, "d")]) == "a\nb\nc\nd"
+
+
+def test_edits_apply_in_order():
+    assert apply_code_edits(CODE, [edit(1, 1, None), edit(1, 1, "x")]) == "x\nc"
+
+
+def test_out_of_range_edit_is_rejected():
+    with pytest.raises(ReviewSessionError) as raised:
+        apply_code_edits(CODE, [edit(5, 5, "x")])
+    assert raised.value.status_code == 422
+
+
+def test_text_is_required_but_may_be_null():
+    with pytest.raises(ValidationError):
+        CodeEdit(start_line=1, end_line=1)
+    assert CodeEdit.model_validate({"start_line": 1, "end_line": 1, "text": None}).text is None
+
+
+def test_review_diff_numbers_new_lines():
+    code = "\n".join(f"line {i}" for i in range(40))
+    changed = code.replace("line 20", "line twenty")
+    diff = build_review_diff(code, changed)
+    assert "-      | line 20" in diff and "+   21 | line twenty" in diff
+    assert build_review_diff(code, code) == "(no changes)"
@@ -0,0 +1,46 @@
+import sqlite3
+import time
+
+import pytest
+
+from app.services.shared_store import SharedStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SharedStore(str(tmp_path / "shared.sqlite3"), busy_timeout=0.05)
+
+
+def test_values_and_counters(store):
+    store.set("a", {"x": 1}, ttl_seconds=60)
+    assert store.get("a") == {"x": 1}
+    store.set("gone", 1, ttl_seconds=-1)
+    assert store.get("gone") is None
+    assert store.incr("n") == 1 and store.incr("n", 2) == 3 and store.counter("n") == 3
+    store.delete_prefix("a")
+    assert store.get("a") is None
+
+
+def test_token_bucket(store):
+    assert store.take_token("b", interval=1.0, capacity=2) == 0.0
+    assert store.take_token("b", interval=1.0, capacity=2) == 0.0
+    assert 0.9 < store.take_token("b", interval=1.0, capacity=2) <= 1.0
+    assert 1.9 < store.bucket_backlog("b") <= 2.0
+
+
+def test_locked_store_falls_back_quickly_then_is_bypassed(store):
+    store.set("a", 1, ttl_seconds=60)
+    other = sqlite3.connect(store.path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.monotonic()
+        assert store.incr("n") is None
+        assert store.take_token("b", interval=2.0, capacity=1) == 2.0
+        assert time.monotonic() - started < 0.5
+        # Even reads skip the store for a moment after it was busy
+        assert store.get("a") is None
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    store._bypass_until = 0.0
+    assert store.get("a") == 1 and store.incr("n") == 1
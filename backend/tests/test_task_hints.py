@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from app.services import task_hints as task_hints_module
+from app.services.key_pool import ApiKey, KeyPool
+from app.services.rate_limiter import TokenBucket
+from app.services.task_hints import TaskHints
+
+
+@pytest.fixture
+def pool(monkeypatch) -> KeyPool:
+    pool = KeyPool([ApiKey("key1", "secret", "gemini-test", TokenBucket("test.hints", 0))])
+    monkeypatch.setattr(task_hints_module, "key_pool", pool)
+    return pool
+
+
+def make_hints(**overrides) -> TaskHints:
+    options = {"maxsize": 100, "ttl_seconds": 600, "concurrency": 1, "min_spare_calls": 3}
+    options.update(overrides)
+    return TaskHints(**options)
+
+
+def register(hints: TaskHints, project_id: str, tasks=("read input", "print result")) -> None:
+    hints.register(project_id, "Calculator", list(tasks), "python", "beginner")
+
+
+async def all_hints(record):
+    return [f"hint for {task}" for task in record["tasks"]]
+
+
+async def cold(record, index):
+    return f"cold hint {index}"
+
+
+async def settle(hints: TaskHints) -> None:
+    while hints._background:
+        await asyncio.gather(*hints._background)
+
+
+def test_prefetched_hint_is_served_without_a_call(pool):
+    async def scenario():
+        hints = make_hints()
+        register(hints, "p1")
+        hints.prefetch("p1", all_hints)
+        await settle(hints)
+        return await hints.get("p1", 1, cold, wait_seconds=0)
+    assert asyncio.run(scenario()) == "hint for print result"
+
+
+def test_request_waits_for_a_running_prefetch(pool):
+    async def scenario():
+        hints = make_hints()
+        register(hints, "p1")
+
+        async def slow(record):
+            await asyncio.sleep(0.05)
+            return await all_hints(record)
+
+        hints.prefetch("p1", slow)
+        return await hints.get("p1", 0, cold, wait_seconds=1)
+    assert asyncio.run(scenario()) == "hint for read input"
+
+
+def test_hint_is_generated_cold_without_a_prefetch(pool):
+    async def scenario():
+        hints = make_hints()
+        register(hints, "p1")
+        return await hints.get("p1", 0, cold, wait_seconds=1)
+    assert asyncio.run(scenario()) == "cold hint 0"
+
+
+def test_unknown_project_and_task(pool):
+    async def scenario():
+        hints = make_hints()
+        register(hints, "p1")
+        assert await hints.get("missing", 0, cold, wait_seconds=0) is None
+        with pytest.raises(IndexError):
+            await hints.get("p1", 5, cold, wait_seconds=0)
+    asyncio.run(scenario())
+
+
+def test_prefetch_is_skipped_after_a_rate_limit(pool):
+    async def scenario():
+        hints = make_hints()
+        register(hints, "p1")
+        pool.record(pool.keys[0], 429, retry_after=1)
+        calls = []
+
+        async def work(record):
+            calls.append(record)
+            return await all_hints(record)
+
+        hints.prefetch("p1", work)
+        await settle(hints)
+        return calls
+    assert asyncio.run(scenario()) == []
+
+
+def test_prefetch_is_skipped_while_interactive_calls_are_in_flight(pool):
+    async def scenario():
+        hints = make_hints(max_calls_per_key=2)
+        register(hints, "p1")
+        busy = [await pool.acquire(), await pool.acquire()]
+        calls = []
+
+        async def work(record):
+            calls.append(record)
+            return await all_hints(record)
+
+        hints.prefetch("p1", work)
+        await settle(hints)
+        skipped = list(calls)
+        for key in busy:
+            pool.release(key)
+        hints.prefetch("p1", work)
+        await settle(hints)
+        return skipped, calls
+    skipped, calls = asyncio.run(scenario())
+    assert skipped == [] and len(calls) == 1
+
+
+def test_waiting_prefetches_are_bounded(pool):
+    async def scenario():
+        hints = make_hints(concurrency=1, max_queued=3)
+        release = asyncio.Event()
+        calls = []
+
+        async def work(record):
+            calls.append(record["title"])
+            await release.wait()
+            return await all_hints(record)
+
+        for index in range(10):
+            register(hints, f"p{index}")
+            hints.prefetch(f"p{index}", work)
+        await asyncio.sleep(0.01)
+        release.set()
+        await settle(hints)
+        return len(calls)
+    assert asyncio.run(scenario()) == 3
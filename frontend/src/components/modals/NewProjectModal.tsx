@@ -53,20 +53,20 @@ const NewProjectModal = ({ open, onOpenChange }: NewProjectModalProps) => {
       };
 
       console.log("🔍 Project Init Request:", requestPayload);
-      console.log("🔍 About to call projectsApi.initializeProject...");
-      const response = await projectsApi.initializeProject(requestPayload);
+      console.log("🔍 About to call projectsApi.planProject...");
+      const response = await projectsApi.planProject(requestPayload);
       console.log("🔍 Received response:", response);
       console.log("🔍 Response keys:", Object.keys(response));
       console.log("🔍 Response validation:", {
         hasTitle: !!response.project_title,
         hasMermaid: !!response.mermaid_chart,
         hasTasks: Array.isArray(response.tasks) && response.tasks.length > 0,
-        hasCode: !!response.full_solution_code,
+        projectId: response.project_id,
         hasFilename: !!response.starter_filename,
       });
 
       // Validate response before creating project
-      if (!response.project_title || !response.mermaid_chart || !response.tasks || !response.full_solution_code || !response.starter_filename) {
+      if (!response.project_title || !response.mermaid_chart || !response.tasks || !response.project_id || !response.starter_filename) {
         throw new Error("الاستجابة من الخادم غير مكتملة. بعض البيانات مفقودة.");
       }
 
@@ -87,7 +87,10 @@ const NewProjectModal = ({ open, onOpenChange }: NewProjectModalProps) => {
           text: taskText,
           completed: false,
         })),
-        hiddenSolution: response.full_solution_code,
+        hiddenSolution: "", // Fetched from the backend in the IDE once generated
+        solutionId: response.project_id,
+        idea: requestPayload.idea,
+        level: requestPayload.level,
         chatHistory: [
           {
             role: "assistant",
@@ -104,7 +107,7 @@ const NewProjectModal = ({ open, onOpenChange }: NewProjectModalProps) => {
         title: newProject.title,
         tasksCount: newProject.tasks.length,
         hasMermaid: !!newProject.mermaidChart,
-        hasCode: !!newProject.hiddenSolution,
+        solutionId: newProject.solutionId,
       });
 
       // Save to localStorage
@@ -1,5 +1,6 @@
 import { clsx, type ClassValue } from "clsx";
 import { twMerge } from "tailwind-merge";
+import type { CodeEdit } from "@/types";
 
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs));
@@ -25,3 +26,30 @@ export function containsArabic(text: string): boolean {
 export function getTextDirection(text: string): "rtl" | "ltr" {
   return containsArabic(text) ? "rtl" : "ltr";
 }
+
+/**
+ * Line edits that turn `oldCode` into `newCode` (one edit spanning the changed lines)
+ * @param oldCode The code the server holds
+ * @param newCode The current code
+ * @returns Edits in the format of CodeReviewRequest.code_edits
+ */
+export function lineEdits(oldCode: string, newCode: string): CodeEdit[] {
+  const oldLines = oldCode.split("\n");
+  const newLines = newCode.split("\n");
+  const shortest = Math.min(oldLines.length, newLines.length);
+  let prefix = 0;
+  while (prefix < shortest && oldLines[prefix] === newLines[prefix]) prefix++;
+  if (prefix === oldLines.length && prefix === newLines.length) return [];
+  let suffix = 0;
+  while (
+    suffix < shortest - prefix &&
+    oldLines[oldLines.length - 1 - suffix] === newLines[newLines.length - 1 - suffix]
+  ) suffix++;
+  const inserted = newLines.slice(prefix, newLines.length - suffix);
+  return [{
+    start_line: prefix + 1,
+    end_line: oldLines.length - suffix,
+    // null deletes the range; "" would leave one blank line
+    text: inserted.length ? inserted.join("\n") : null,
+  }];
+}
@@ -1,8 +1,9 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { useParams, useNavigate } from "react-router-dom";
 import { storageService } from "@/services/storage";
 import { projectsApi } from "@/services/projectsApi";
-import { Project, ChatMessage } from "@/types";
+import { IdeChannel } from "@/services/ideChannel";
+import { Project, ChatMessage, ChatResponse, ChatSummary, CodeReviewRequest, CodeReviewResponse, ProjectSolutionResponse } from "@/types";
 import { Button } from "@/components/ui/button";
 import { ArrowLeft, Play, Plus, Trash2, Lightbulb, Send, Loader2 } from "lucide-react";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
@@ -14,9 +15,51 @@ import { toast } from "sonner";
 import Editor from "@monaco-editor/react";
 import MermaidChart from "@/components/ide/MermaidChart";
 import { pistonService } from "@/services/piston";
-import { containsArabic } from "@/lib/utils";
+import { containsArabic, lineEdits } from "@/lib/utils";
 import MarkdownRenderer from "@/components/MarkdownRenderer";
 
+// Rounds of waiting (up to 30s each) for a background-generated solution
+const SOLUTION_POLL_ROUNDS = 10;
+// Chat messages the backend accepts per request
+const MAX_SENT_HISTORY = 200;
+
+/**
+ * Fetch the project's solution from the backend, generating it again (once)
+ * from the saved plan if it failed or the backend no longer has it.
+ * Returns null while it is still being generated after `rounds` attempts.
+ */
+const fetchSolution = async (
+  project: Project,
+  rounds: number,
+  isActive: () => boolean = () => true
+): Promise<string | null> => {
+  let regenerated = false;
+  for (let round = 0; round < rounds && isActive(); round++) {
+    let solution: ProjectSolutionResponse | null = null;
+    try {
+      solution = await projectsApi.getProjectSolution(project.solutionId!);
+    } catch (error: any) {
+      if (error.status !== 404) throw error;
+    }
+    if (solution?.status === "ready" && solution.full_solution_code) {
+      return solution.full_solution_code;
+    }
+    if (!solution || solution.status === "failed") {
+      if (regenerated) throw new Error(solution?.message || "فشل في توليد الحل.");
+      regenerated = true;
+      await projectsApi.regenerateProjectSolution(project.solutionId!, {
+        idea: project.idea,
+        language: project.language,
+        level: project.level || "beginner",
+        project_title: project.title,
+        tasks: project.tasks.map((t) => t.text),
+        starter_filename: project.filename,
+      });
+    }
+  }
+  return null;
+};
+
 const ProjectIDENew = () => {
   const { id } = useParams<{ id: string }>();
   const navigate = useNavigate();
@@ -31,6 +74,11 @@ const ProjectIDENew = () => {
   const [chatHistory, setChatHistory] = useState<ChatMessage[]>([]);
   const [isChatLoading, setIsChatLoading] = useState(false);
   const [isReviewLoading, setIsReviewLoading] = useState(false);
+  const [isSolutionLoading, setIsSolutionLoading] = useState(false);
+  const [hintTaskId, setHintTaskId] = useState<string | null>(null);
+  const channelRef = useRef<IdeChannel | null>(null);
+  // Code and server version of the last review, the base for code_edits
+  const reviewBaseRef = useRef<{ version: number; code: string } | null>(null);
 
   useEffect(() => {
     if (!id) {
@@ -54,6 +102,33 @@ const ProjectIDENew = () => {
     setChatHistory(validChatHistory);
   }, [id, navigate]);
 
+  // One WebSocket per IDE session for chat and review; closed on leave
+  useEffect(() => {
+    if (!id) return;
+    const channel = new IdeChannel(id);
+    channelRef.current = channel;
+    reviewBaseRef.current = null;
+    return () => {
+      channel.close();
+      channelRef.current = null;
+    };
+  }, [id]);
+
+  // The backend keeps a generated solution only for a while: save it into
+  // the project as soon as it is ready
+  useEffect(() => {
+    if (!project?.solutionId || project.hiddenSolution) return;
+    let active = true;
+    fetchSolution(project, SOLUTION_POLL_ROUNDS, () => active)
+      .then((solution) => {
+        if (active && solution) saveSolution(project, solution);
+      })
+      .catch((error) => console.error("Solution fetch error:", error));
+    return () => {
+      active = false;
+    };
+  }, [project?.id]);
+
   // Auto-save code every 2 seconds
   useEffect(() => {
     if (!project || !code) return;
@@ -127,21 +202,43 @@ const ProjectIDENew = () => {
     try {
       // Call AI mentor API
       // Filter out messages without content and ensure all required fields are present
-      const validHistory = chatHistory
+      const allHistory = chatHistory
         .filter((msg) => msg.content && msg.content.trim().length > 0)
         .map((msg) => ({
           role: msg.role,
           content: msg.content.trim(),
-        }))
-        .slice(-10); // Only send last 10 messages to avoid token limits
+        }));
+
+      // Turns the server already summarised are sent as that summary, so the
+      // summary stays anchored to the same turns however long the chat gets
+      const saved = project.chatSummary;
+      const anchored =
+        !!saved && saved.turns <= allHistory.length && allHistory.length - saved.turns <= MAX_SENT_HISTORY;
+      const historyStart = anchored ? saved!.turns : Math.max(0, allHistory.length - MAX_SENT_HISTORY);
+      const validHistory = allHistory.slice(historyStart);
 
-      const response = await projectsApi.chatWithMentor({
+      const request = {
         message: messageText, // Use saved message, not chatMessage (which is now empty)
         language: project.language,
         project_title: project.title,
         history: validHistory,
         current_code: code,
-      });
+        ...(anchored ? { summary_hash: saved!.hash, summary: saved!.summary } : {}),
+      };
+
+      // Stream the answer over the IDE channel; plain HTTP if it cannot connect
+      let response: ChatResponse;
+      let streamed = "";
+      const startedAt = Date.now();
+      try {
+        response = await channelRef.current!.chat(request, (text) => {
+          streamed += text;
+          setChatHistory([...tempHistory, { role: "assistant", content: streamed, timestamp: startedAt }]);
+        }, historyStart);
+      } catch (channelError: any) {
+        if (channelError.error) throw channelError;
+        response = await projectsApi.chatWithMentor(request);
+      }
 
       // Add AI response
       if (!response.response || !response.response.trim()) {
@@ -157,8 +254,18 @@ const ProjectIDENew = () => {
       const updatedHistory = [...tempHistory, aiMessage];
       setChatHistory(updatedHistory);
 
+      let chatSummary: ChatSummary | undefined = anchored ? saved : undefined;
+      if (response.summary_hash && response.summary && response.summary_turns && response.summary_turns > 0) {
+        chatSummary = {
+          hash: response.summary_hash,
+          summary: response.summary,
+          turns: historyStart + response.summary_turns,
+        };
+      }
+      setProject((prev) => (prev ? { ...prev, chatSummary } : prev));
+
       // Save to localStorage
-      const updatedProject = { ...project, chatHistory: updatedHistory };
+      const updatedProject = { ...project, chatHistory: updatedHistory, chatSummary };
       storageService.saveProject(updatedProject);
     } catch (error: any) {
       console.error("Chat error:", error);
@@ -182,6 +289,58 @@ const ProjectIDENew = () => {
     }
   };
 
+  const handleTaskHint = async (taskIndex: number) => {
+    if (!project?.solutionId || hintTaskId) return;
+    const task = project.tasks[taskIndex];
+    setHintTaskId(task.id);
+    try {
+      const { hint } = await projectsApi.getTaskHint(project.solutionId, taskIndex);
+      const hintMessage: ChatMessage = {
+        role: "assistant",
+        content: `💡 **${task.text}**\n\n${hint}`,
+        timestamp: Date.now(),
+      };
+      const updatedHistory = [...chatHistory, hintMessage];
+      setChatHistory(updatedHistory);
+      storageService.saveProject({ ...project, chatHistory: updatedHistory });
+    } catch (error: any) {
+      toast.error(error.message || "تعذر تحميل التلميح. حاول مرة أخرى.");
+    } finally {
+      setHintTaskId(null);
+    }
+  };
+
+  const saveSolution = (current: Project, solution: string) => {
+    // Merge into the stored project: autosave may have written it meanwhile
+    const saved = storageService.getProject(current.id) || current;
+    storageService.saveProject({ ...saved, hiddenSolution: solution });
+    setProject((prev) => (prev ? { ...prev, hiddenSolution: solution } : prev));
+  };
+
+  const handleShowSolution = async () => {
+    if (!project) return;
+    if (project.hiddenSolution || !project.solutionId) {
+      setShowSolutionModal(true);
+      return;
+    }
+
+    setIsSolutionLoading(true);
+    try {
+      const solution = await fetchSolution(project, 1);
+      if (!solution) {
+        toast.error("الحل قيد التحضير، حاول بعد لحظات.");
+        return;
+      }
+      saveSolution(project, solution);
+      setShowSolutionModal(true);
+    } catch (error: any) {
+      console.error("Solution fetch error:", error);
+      toast.error(error.message || "فشل في تحميل الحل.");
+    } finally {
+      setIsSolutionLoading(false);
+    }
+  };
+
   const handleReviewCode = async () => {
     if (!code.trim() || !project || isReviewLoading) {
       toast.error("اكتب بعض الكود أولاً!");
@@ -195,15 +354,46 @@ const ProjectIDENew = () => {
       const currentTaskIndex = project.tasks.findIndex((t) => !t.completed);
 
       // Call code review API
-      const response = await projectsApi.reviewCode({
-        code: code.trim(),
+      const reviewedCode = code.trim();
+      const taskIndex = currentTaskIndex >= 0 ? currentTaskIndex : 0;
+      const fullRequest: CodeReviewRequest = {
+        code: reviewedCode,
         language: project.language,
         project_context: {
           title: project.title,
           tasks: project.tasks.map((t) => t.text),
-          current_task_index: currentTaskIndex >= 0 ? currentTaskIndex : 0,
+          current_task_index: taskIndex,
         },
-      });
+      };
+      // The server keeps the session's code and context: after the first
+      // review only the changed lines are sent, against its code version
+      const base = reviewBaseRef.current;
+      const edits = base ? lineEdits(base.code, reviewedCode) : [];
+      const request: CodeReviewRequest = base && edits.every((edit) => edit.text.length < reviewedCode.length)
+        ? { code_edits: edits, base_version: base.version, language: project.language, current_task_index: taskIndex }
+        : fullRequest;
+      const send = async (request: CodeReviewRequest): Promise<CodeReviewResponse> => {
+        try {
+          return await channelRef.current!.review(request);
+        } catch (channelError: any) {
+          if (channelError.error) throw channelError;
+          return await projectsApi.reviewCode({ ...request, session_id: project.id });
+        }
+      };
+      let response: CodeReviewResponse;
+      try {
+        response = await send(request);
+      } catch (reviewError: any) {
+        // Session expired, restarted or out of sync: resend everything
+        const outOfSync = ['review_session_out_of_sync', 'invalid_code_edits'].includes(reviewError.error)
+          || reviewError.status === 409 || reviewError.status === 422;
+        if (request === fullRequest || !outOfSync) throw reviewError;
+        reviewBaseRef.current = null;
+        response = await send(fullRequest);
+      }
+      reviewBaseRef.current = response.code_version != null
+        ? { version: response.code_version, code: reviewedCode }
+        : null;
 
       // Add review message to chat
       if (!response.review_comment || !response.review_comment.trim()) {
@@ -272,7 +462,7 @@ const ProjectIDENew = () => {
             </TabsContent>
 
             <TabsContent value="tasks" className="flex-1 overflow-y-auto m-0 p-4 space-y-3">
-              {project.tasks.map((task) => (
+              {project.tasks.map((task, taskIndex) => (
                 <div
                   key={task.id}
                   className={`flex items-start gap-3 p-3 rounded-lg hover:bg-secondary/50 transition-colors ${containsArabic(task.text) ? "flex-row-reverse" : ""}`}
@@ -289,6 +479,18 @@ const ProjectIDENew = () => {
                   >
                     {task.text}
                   </span>
+                  {project.solutionId && !task.completed && (
+                    <Button
+                      variant="ghost"
+                      size="icon"
+                      className="h-6 w-6 shrink-0"
+                      title="تلميح للبدء"
+                      onClick={() => handleTaskHint(taskIndex)}
+                      disabled={hintTaskId !== null}
+                    >
+                      {hintTaskId === task.id ? <Loader2 className="h-3 w-3 animate-spin" /> : <Lightbulb className="h-3 w-3" />}
+                    </Button>
+                  )}
                 </div>
               ))}
 
@@ -361,8 +563,8 @@ const ProjectIDENew = () => {
         {/* Column 3: Mentor (25%) */}
         <div className="w-1/4 border-l border-border bg-card flex flex-col">
           <div className="p-4 border-b border-border shrink-0">
-            <Button className="w-full" variant="outline" onClick={() => setShowSolutionModal(true)}>
-              <Lightbulb className="h-4 w-4 mr-2" />
+            <Button className="w-full" variant="outline" onClick={handleShowSolution} disabled={isSolutionLoading}>
+              {isSolutionLoading ? <Loader2 className="h-4 w-4 mr-2 animate-spin" /> : <Lightbulb className="h-4 w-4 mr-2" />}
               عرض الحل
             </Button>
           </div>
@@ -0,0 +1,166 @@
+/**
+ * WebSocket channel to the backend for one IDE session (chat + review)
+ * WS /api/project/session/{sessionId}
+ *
+ * Messages are multiplexed by id: chat answers stream as `chunk` frames and
+ * end with `result`, `error` or `cancelled`. The server keeps the session
+ * context, so follow-up messages only carry what changed.
+ */
+import apiClient from './api';
+import {
+    ChannelChatRequest,
+    ChatResponse,
+    CodeReviewRequest,
+    CodeReviewResponse,
+} from '@/types';
+
+/** `error` is set for failures reported by the server, unset for connection failures */
+export interface ChannelError {
+    message: string;
+    retryable: boolean;
+    error?: string;
+}
+
+interface Pending {
+    resolve: (data: any) => void;
+    reject: (error: ChannelError) => void;
+    onChunk?: (text: string) => void;
+}
+
+const CONNECT_TIMEOUT_MS = 5000;
+
+const channelURL = (sessionId: string): string => {
+    const base = apiClient.defaults.baseURL || window.location.origin;
+    const url = new URL(`/api/project/session/${encodeURIComponent(sessionId)}`, base);
+    url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+    return url.toString();
+};
+
+export class IdeChannel {
+    private socket: WebSocket | null = null;
+    private opening: Promise<WebSocket> | null = null;
+    private pending = new Map<string, Pending>();
+    private nextId = 0;
+    private chattedOnSocket = false;
+    private seedStart = 0;
+
+    constructor(private readonly sessionId: string) {}
+
+    /** Open (or reuse) the socket; rejects if it cannot connect. */
+    private connect(): Promise<WebSocket> {
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+            return Promise.resolve(this.socket);
+        }
+        if (this.opening) return this.opening;
+
+        this.opening = new Promise<WebSocket>((resolve, reject) => {
+            const socket = new WebSocket(channelURL(this.sessionId));
+            const timer = window.setTimeout(() => {
+                socket.close();
+                reject({ message: 'انتهت مهلة الاتصال.', retryable: true });
+            }, CONNECT_TIMEOUT_MS);
+
+            socket.onopen = () => {
+                window.clearTimeout(timer);
+                this.socket = socket;
+                this.chattedOnSocket = false;
+                resolve(socket);
+            };
+            socket.onmessage = (event) => this.handleFrame(JSON.parse(event.data));
+            socket.onclose = (event) => {
+                window.clearTimeout(timer);
+                if (this.socket === socket) this.socket = null;
+                reject({ message: 'تعذر فتح الاتصال بالخادم.', retryable: true });
+                // In-flight messages fail; the next call reconnects
+                const error = {
+                    message: event.code === 1013 ? 'الخادم مشغول. حاول مرة أخرى.' : 'انقطع الاتصال بالخادم.',
+                    retryable: true,
+                };
+                this.pending.forEach((pending) => pending.reject(error));
+                this.pending.clear();
+            };
+        }).finally(() => {
+            this.opening = null;
+        });
+        return this.opening;
+    }
+
+    private handleFrame(frame: any) {
+        if (frame.type === 'ping') {
+            this.socket?.send(JSON.stringify({ type: 'pong' }));
+            return;
+        }
+        const pending = frame.id ? this.pending.get(frame.id) : undefined;
+        if (!pending) return;
+        switch (frame.type) {
+            case 'chunk':
+                pending.onChunk?.(frame.text);
+                return;
+            case 'result':
+                this.pending.delete(frame.id);
+                pending.resolve(frame.data);
+                return;
+            case 'cancelled':
+                this.pending.delete(frame.id);
+                pending.reject({ message: 'تم الإلغاء.', retryable: false, error: 'cancelled' });
+                return;
+            case 'error':
+                this.pending.delete(frame.id);
+                pending.reject({ message: frame.message, retryable: frame.retryable, error: frame.error });
+                return;
+        }
+    }
+
+    private async request<T>(type: string, payload: object, onChunk?: (text: string) => void): Promise<T> {
+        const socket = await this.connect();
+        const id = `${type}-${++this.nextId}`;
+        return new Promise<T>((resolve, reject) => {
+            this.pending.set(id, { resolve, reject, onChunk });
+            socket.send(JSON.stringify({ type, id, ...payload }));
+        });
+    }
+
+    /**
+     * Stream a mentor answer; `onChunk` receives text as it is generated.
+     * `historyStart` is where `request.history` begins in the caller's
+     * history; `summary_turns` in the result counts from there too.
+     */
+    async chat(
+        request: ChannelChatRequest,
+        onChunk: (text: string) => void,
+        historyStart = 0
+    ): Promise<ChatResponse> {
+        const socket = await this.connect();
+        // The server keeps the history per connection and takes the seed of
+        // the first chat that succeeds on it; until one has, send the seed
+        let payload: ChannelChatRequest = request;
+        if (this.chattedOnSocket) {
+            payload = { ...request, history: [], summary_hash: undefined, summary: undefined };
+        }
+        const response = await this.request<ChatResponse>('chat', payload, onChunk);
+        if (!this.chattedOnSocket && this.socket === socket) {
+            this.chattedOnSocket = true;
+            this.seedStart = historyStart;
+        }
+        // The server counts summarised turns from the start of the seed
+        if (response.summary_turns != null) {
+            return { ...response, summary_turns: response.summary_turns + this.seedStart - historyStart };
+        }
+        return response;
+    }
+
+    review(request: Omit<CodeReviewRequest, 'session_id'>): Promise<CodeReviewResponse> {
+        return this.request<CodeReviewResponse>('review', request);
+    }
+
+    /** Cancel every in-flight message (e.g. when leaving the page). */
+    cancelAll() {
+        this.pending.forEach((_, id) => this.socket?.send(JSON.stringify({ type: 'cancel', id })));
+    }
+
+    close() {
+        this.cancelAll();
+        this.socket?.close();
+        this.socket = null;
+    }
+}
@@ -5,6 +5,10 @@ import apiClient from './api';
 import {
     ProjectInitRequest,
     ProjectInitResponse,
+    ProjectPlanResponse,
+    ProjectSolutionRequest,
+    ProjectSolutionResponse,
+    TaskHintResponse,
     CodeReviewRequest,
     CodeReviewResponse,
     ChatRequest,
@@ -28,6 +32,45 @@ export const projectsApi = {
         }
     },
 
+    /**
+     * Fast project plan; the solution is generated in the background
+     * POST /api/project/plan
+     */
+    async planProject(request: ProjectInitRequest): Promise<ProjectPlanResponse> {
+        const response = await apiClient.post<ProjectPlanResponse>('/api/project/plan', request);
+        return response.data;
+    },
+
+    /**
+     * Fetch the background-generated solution, waiting up to `wait` seconds
+     * GET /api/project/{projectId}/solution
+     */
+    async getProjectSolution(projectId: string, wait = 30): Promise<ProjectSolutionResponse> {
+        const response = await apiClient.get<ProjectSolutionResponse>(
+            `/api/project/${projectId}/solution`,
+            { params: { wait } }
+        );
+        return response.data;
+    },
+
+    /**
+     * Generate a failed or lost solution again from the saved plan
+     * POST /api/project/{projectId}/solution
+     */
+    async regenerateProjectSolution(projectId: string, request: ProjectSolutionRequest): Promise<ProjectSolutionResponse> {
+        const response = await apiClient.post<ProjectSolutionResponse>(`/api/project/${projectId}/solution`, request);
+        return response.data;
+    },
+
+    /**
+     * Hint for starting a task (usually prefetched after planning)
+     * GET /api/project/{projectId}/hints/{taskIndex}
+     */
+    async getTaskHint(projectId: string, taskIndex: number): Promise<TaskHintResponse> {
+        const response = await apiClient.get<TaskHintResponse>(`/api/project/${projectId}/hints/${taskIndex}`);
+        return response.data;
+    },
+
     /**
      * Get Socratic code review from AI mentor
      * POST /api/project/review
@@ -23,6 +23,12 @@ export interface ChatMessage {
   timestamp: number;
 }
 
+export interface ChatSummary {
+  hash: string;
+  summary: string;
+  turns: number;
+}
+
 export interface Project {
   id: string;
   title: string;
@@ -31,8 +37,12 @@ export interface Project {
   code: string;
   mermaidChart: string;
   tasks: Task[];
-  hiddenSolution: string;
+  hiddenSolution: string;        // Saved once the backend has generated it
+  solutionId?: string;           // Backend project id (lazily generated solution, task hints)
+  idea?: string;                 // Kept to generate the solution again if the backend lost it
+  level?: Level;
   chatHistory: ChatMessage[];
+  chatSummary?: ChatSummary;     // Server summary of the first `turns` sent chat messages
   lastModified: number;
   createdAt: number;
 }
@@ -102,23 +112,65 @@ export interface ProjectInitResponse {
   tasks: string[];               // Task descriptions
   full_solution_code: string;    // Complete solution
   starter_filename: string;      // e.g., "game.py"
+  project_id?: string;           // Key for task hints
+}
+
+export interface ProjectPlanResponse {
+  project_id: string;            // Used to fetch the solution later
+  project_title: string;
+  mermaid_chart: string;
+  tasks: string[];
+  starter_filename: string;
+}
+
+export interface TaskHintResponse {
+  project_id: string;
+  task_index: number;            // 0-based
+  hint: string;
+}
+
+export interface ProjectSolutionRequest {
+  idea?: string;
+  language: Language;
+  level: Level;
+  project_title: string;
+  tasks: string[];
+  starter_filename: string;
+}
+
+export interface ProjectSolutionResponse {
+  project_id: string;
+  status: "pending" | "ready" | "failed";
+  full_solution_code: string | null;
+  message: string | null;
+}
+
+export interface CodeEdit {
+  start_line: number;            // 1-based
+  end_line: number;              // Inclusive; start_line - 1 inserts without deleting
+  text: string | null;           // Replacement lines joined with "\n" ("" is one blank line); null deletes
 }
 
 export interface CodeReviewRequest {
-  code: string;
+  code?: string;                 // Full code, or code_edits against the session's code
+  code_edits?: CodeEdit[];
+  base_version?: number;         // code_version of the last review the edits are based on
   language: Language;
-  project_context: {
+  project_context?: {            // Optional once the session holds it
     title: string;
     tasks: string[];
     current_task_index: number;
   };
+  current_task_index?: number;
   previous_review?: string;
+  session_id?: string;           // Project id; newer reviews supersede in-flight ones
 }
 
 export interface CodeReviewResponse {
   review_comment: string;        // Socratic questions/hints
   highlight_line?: number | null; // Optional line number to highlight
   severity: "info" | "warning" | "error"; // Severity level
+  code_version?: number | null;  // Session code version this review is for
 }
 
 export interface ChatRequest {
@@ -127,10 +179,25 @@ export interface ChatRequest {
   project_title: string;
   history: Array<{ role: string; content: string }>;
   current_code: string;
+  summary_hash?: string;         // Summary of the turns before `history`, as returned earlier
+  summary?: string;
+}
+
+export interface ChannelChatRequest {
+  message: string;
+  language?: Language;
+  project_title?: string;
+  history?: Array<{ role: string; content: string }>; // Seeds the server-side history once per connection
+  current_code?: string;
+  summary_hash?: string;
+  summary?: string;
 }
 
 export interface ChatResponse {
   response: string;
   suggested_reading: string | null;
+  summary_hash?: string | null;  // The summary covers the first `summary_turns` messages sent
+  summary?: string | null;
+  summary_turns?: number | null;
 }
 